@@ -5,8 +5,6 @@ from operator import itemgetter
 import pydantic
 import random
 
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import Runnable, RunnableLambda, RunnablePassthrough
 from langchain_core.language_models.chat_models import BaseChatModel
 from loguru import logger
@@ -29,6 +27,14 @@ _SYSTEM_PROMPT_PERSONA = (
     "You read instructions carefully and follow them precisely. You give concise and clear answers."
 )
 
+# static system prompt for the "static_prefix" prompt layout, in which the persona
+# is moved to the end of the prompt (see `BaseChainBuilder.set_prompt_layout`)
+_SYSTEM_PROMPT_EXPERT = (
+    "You have been chosen to assist a collaborative debating project as an external expert, "
+    "given your outstanding critical thinking and argumentation skills.\n"
+    "You read instructions carefully and follow them precisely. You give concise and clear answers."
+)
+
 _ARGUMENT_BASIC_INFO = """A crucial part of critical thinking is to identify, construct, and \
 evaluate arguments.
 
@@ -97,6 +103,8 @@ class IdentifyPremisesChain(BaseChainBuilder):
 
     # TODO: 👔 Add step that checks and discards any "global balancing" premises
 
+    _max_premises = 5  # as requested in the draft prompt
+
     # Chat prompts
 
     _prompt_explicate_prems_msgs = [
@@ -113,31 +121,31 @@ class IdentifyPremisesChain(BaseChainBuilder):
                     "[[A]] {argument}\n"
                     "which they've advanced as a reason {valence_text}:\n"
                     "[[B]] {conclusion}\n"
-                    "Can you please identify the major explicit and implicit premises (up to 5) "
+                    f"Can you please identify the major explicit and implicit premises (up to {_max_premises}) "
                     "of the argument [[A]]? State each premise as a single, concise sentence. "
                     "Don't include any conclusions."
                 )
             )
         ]
 
+    _json_format = (
+        '```json\n'
+        '[\n'
+        '    {{"idx": "1", "premise": "<Insert first premise here.>"}},\n'
+        '    {{"idx": "2", "premise": "<Insert second premise here.>"}},\n'
+        '    ...\n'
+        ']\n'
+        '```\n'
+        'Just return the JSON code.\n'
+    )
+
+    _json_schema = utils.json_array_schema("idx", "premise")
+
     _formatting_prompt_msgs = [
             ("system", _SYSTEM_PROMPT),
             ("user", "Can you please identify the premises of the previously discussed argument?"),
             ("assistant", "{premises}"),
-            (
-                "user",
-                (
-                    'Please format the concise premises you\'ve identified as follows:\n'
-                    '```json\n'
-                    '[\n'
-                    '    {{"idx": "1", "premise": "<Insert first premise here.>"}},\n'
-                    '    {{"idx": "2", "premise": "<Insert second premise here.>"}},\n'
-                    '    ...\n'
-                    ']\n'
-                    '```\n'
-                    'Just return the JSON code.\n'
-                )
-            )
+            ("user", 'Please format the concise premises you\'ve identified as follows:\n' + _json_format)
         ]
 
     # Preprocessing methods
@@ -146,6 +154,10 @@ class IdentifyPremisesChain(BaseChainBuilder):
 
     # Postprocessing methods
 
+    @classmethod
+    def extract_premises(cls, draft: str) -> list[dict]:
+        return utils.extract_numbered_items(draft, key="premise", max_items=cls._max_premises)
+
     @staticmethod
     def postprocess_premises(input_: list) -> list:
         return [record["premise"] for record in input_ if "premise" in record]
@@ -155,27 +167,27 @@ class IdentifyPremisesChain(BaseChainBuilder):
     @classmethod
     def build(cls, llm: BaseChatModel, llm_formatting: BaseChatModel) -> Runnable:
 
-        chain_explicate_prems = (
+        subchain_premises = cls.build_draft_and_format(
+            llm,
+            llm_formatting,
+            draft_prompt_msgs=cls.get_prompt_msgs("_prompt_explicate_prems_msgs"),
+            formatting_prompt_msgs=cls._formatting_prompt_msgs,
+            draft_key="premises",
+            json_instruction="\nFormat the premises you've identified as follows:\n" + cls._json_format,
+            json_schema=cls._json_schema,
+            max_tokens=512,
+            temperature=0.3,
+            extract_draft=cls.extract_premises,
+        )
+
+        main_chain = (
             RunnablePassthrough().assign(
                 valence_text=(itemgetter("valence") | RunnableLambda(lambda x: str(x.value)))
             )
-            | ChatPromptTemplate.from_messages(cls._prompt_explicate_prems_msgs)
-            | llm.bind(max_tokens=512, temperature=0.3)
-            | StrOutputParser()
-        )
-
-        chain_format = (
-            ChatPromptTemplate.from_messages(cls._formatting_prompt_msgs)
-            | llm_formatting.bind(max_tokens=512, temperature=0, response_format={"type": "json_object"})
-            | utils.TolerantJsonOutputParser()
+            | subchain_premises
             | RunnableLambda(cls.postprocess_premises)
         )
 
-        main_chain = (
-            {"premises": chain_explicate_prems}
-            | chain_format
-        )
-
         return main_chain
 
 
@@ -204,6 +216,45 @@ class RankPropsByPlausibilityChain(BaseChainBuilder):
             )
         ]
 
+    _assess_prompt_msgs_static_prefix = [
+            ("system", _SYSTEM_PROMPT_EXPERT),
+            (
+                "user",
+                (
+                    "Read the following background information carefully before answering!\n"
+                    "/// background_information\n"
+                    ) + _ARGUMENT_BASIC_INFO + (
+                    "\n///\n"
+                    "Task: Rank the premises in an argument according to plausibility\n"
+                    "How plausible and convincing are the propositions below? More specifically: "
+                    "Provide, for each proposition, a brief plausibility assessment (in a single "
+                    "sentence) and rate its plausibility on a qualitative scale from highly-plausible to "
+                    "most-implausible.\n"
+                    "You are: {persona}.\n"
+                    "Domain: {taglist}\n"
+                    "Now, an opponent has previously maintained in a debate that:\n\n"
+                    "{proplist}"
+                )
+            )
+        ]
+
+    _json_format = (
+        "Rigourously format your plausibility ranking, beginning with the most "
+        "plausible proposition, as follows:\n"
+        '```json\n'
+        '[\n'
+        '    {{"label": "<Label of this proposition>", '
+        '"proposition": "<Insert most plausible proposition here.>"}},\n'
+        '    {{"label": "<Label of this proposition>", '
+        '"proposition": "<Insert second most plausible proposition here.>"}},\n'
+        '    ...\n'
+        ']\n'
+        '```\n'
+        'No comments or explanations. Just return the valid JSON code.\n'
+    )
+
+    _json_schema = utils.json_array_schema("label", "proposition")
+
     _rank_prompt_msgs = [
             ("system", _SYSTEM_PROMPT),
             ("user", "Can you please assess the plausibility of the following propositions?\n {proplist}"),
@@ -212,19 +263,8 @@ class RankPropsByPlausibilityChain(BaseChainBuilder):
                 "user",
                 (
                     "Thanks for this! Now, please use your assessment to compare and order the propositions "
-                    "in terms of plausibility. Rigourously format your plausibility ranking, beginning with the most "
-                    "plausible proposition, as follows:\n"
-                    '```json\n'
-                    '[\n'
-                    '    {{"label": "<Label of this proposition>", '
-                    '"proposition": "<Insert most plausible proposition here.>"}},\n'
-                    '    {{"label": "<Label of this proposition>", '
-                    '"proposition": "<Insert second most plausible proposition here.>"}},\n'
-                    '    ...\n'
-                    ']\n'
-                    '```\n'
-                    'No comments or explanations. Just return the valid JSON code.\n'
-                )
+                    "in terms of plausibility. "
+                ) + _json_format
             )
         ]
 
@@ -258,22 +298,35 @@ class RankPropsByPlausibilityChain(BaseChainBuilder):
 
         return int_ranking
 
+    @staticmethod
+    def aggregate_rankings(rankings: list[list[int]], n: int) -> list[int]:
+        """Combine several rankings of n propositions into one (Borda count).
+        Propositions missing in a ranking share its last place."""
+        scores = [0] * n
+        for ranking in rankings:
+            ranking = [idx for idx in ranking if 0 <= idx < n]
+            for idx in range(n):
+                scores[idx] += ranking.index(idx) if idx in ranking else len(ranking)
+        return sorted(range(n), key=lambda idx: scores[idx])
+
     # Chain builder
 
     @classmethod
     def build(cls, llm: BaseChatModel, llm_formatting: BaseChatModel) -> Runnable:
 
-        chain_assess_prems = (
-            ChatPromptTemplate.from_messages(cls._assess_prompt_msgs)
-            | llm.bind(max_tokens=512, temperature=0.3)
-            | StrOutputParser()
-        )
-
-        chain_rank = (
-            ChatPromptTemplate.from_messages(cls._rank_prompt_msgs)
-            | llm_formatting.bind(max_tokens=512, temperature=0, response_format={"type": "json_object"})
-            | utils.TolerantJsonOutputParser()
-            | RunnableLambda(cls.postprocess_ranking)
+        subchain_rank = cls.build_draft_and_format(
+            llm,
+            llm_formatting,
+            draft_prompt_msgs=cls.get_prompt_msgs("_assess_prompt_msgs"),
+            formatting_prompt_msgs=cls._rank_prompt_msgs,
+            draft_key="assessment",
+            json_instruction=(
+                "\nThen, use your assessment to compare and order the propositions in terms of plausibility. "
+                "Skip your assessment in your answer and only return the ranking. "
+            ) + cls._json_format,
+            json_schema=cls._json_schema,
+            max_tokens=512,
+            temperature=0.3,
         )
 
         main_chain = (
@@ -281,8 +334,8 @@ class RankPropsByPlausibilityChain(BaseChainBuilder):
                 taglist=(itemgetter("tags") | RunnableLambda(lambda x: ' - '.join(x))),
                 proplist=(itemgetter("premises") | RunnableLambda(cls.format_premises))
             )
-            | RunnablePassthrough().assign(assessment=chain_assess_prems)
-            | chain_rank
+            | subchain_rank
+            | RunnableLambda(cls.postprocess_ranking)
         )
 
         return main_chain
@@ -290,6 +343,25 @@ class RankPropsByPlausibilityChain(BaseChainBuilder):
 
 class AbstractGenArgumentChain(BaseChainBuilder):
 
+    # Chat prompts
+
+    _json_format = (
+        '```json\n'
+        '[\n'
+        '    {{"label": "<Insert title of first argument here>", '
+        '"claim": "<Insert first argument here>"}},\n'
+        '    {{"label": "<Insert title of first argument here>", '
+        '"claim": "<Insert second argument here>"}},\n'
+        '    ...\n'
+        ']\n'
+        '```\n'
+        'Just return the JSON code.\n'
+    )
+
+    _json_schema = utils.json_array_schema("label", "claim")
+
+    _json_instruction = "\nInstead of '**name:** statement', format your arguments as follows:\n" + _json_format
+
     # Preprocessing methods
 
     @staticmethod
@@ -365,23 +437,36 @@ class GenSupportingArgumentChain(AbstractGenArgumentChain):
          )
     ]
 
+    _instruction_prompt_msgs_static_prefix = [
+        ("system", _SYSTEM_PROMPT_EXPERT),
+        ("user",
+            (
+                "Read the following background information carefully before answering!\n"
+                "/// background_information\n"
+            ) + _ARGUMENT_BASIC_INFO + "\n\n" + _WRITING_ARGUMENTS_INFO + (
+                "\n///\n"
+                "Task: Provide additional supporting arguments for a given claim\n"
+                "Provide different and independent PRO arguments -- each consisting in a catchy name "
+                "and a single concise statement, formatted as '**name:** statement' -- that back up "
+                "the target proposition. Make sure your arguments argue for the target proposition in "
+                "specific and plausible ways without merely repeating that proposition. Keep your "
+                "arguments short and direct. Be inspired by the domain tags below.\n"
+                "You are: {persona}.\n"
+                "Domain tags: {taglist}\n"
+                "Now, a participant has previously maintained in a debate that:\n\n"
+                "{premiselist}\n\n"
+                "Can you provide up to {n} PRO arguments that back up the {nth} proposition "
+                "{target_label}? Just provide your supporting arguments below."
+            )
+         )
+    ]
+
     _formatting_prompt_msgs = [
             ("system", _SYSTEM_PROMPT),
             ("user", "Please provide up to {n} different and independent arguments - each "
                 "consisting in a catchy title and a single concise statement."),
             ("assistant", "{drafts}"),
-            ("user", "Good. Now, please format these arguments as follows:\n"
-                '```json\n'
-                '[\n'
-                '    {{"label": "<Insert title of first argument here>", '
-                '"claim": "<Insert first argument here>"}},\n'
-                '    {{"label": "<Insert title of first argument here>", '
-                '"claim": "<Insert second argument here>"}},\n'
-                '    ...\n'
-                ']\n'
-                '```\n'
-                'Just return the JSON code.\n'
-             )
+            ("user", "Good. Now, please format these arguments as follows:\n" + AbstractGenArgumentChain._json_format)
     ]
 
     # Preprocessing methods
@@ -406,16 +491,17 @@ class GenSupportingArgumentChain(AbstractGenArgumentChain):
     @classmethod
     def build(cls, llm: BaseChatModel, llm_formatting: BaseChatModel) -> Runnable:
 
-        subchain_draft = (
-            ChatPromptTemplate.from_messages(cls._instruction_prompt_msgs)
-            | llm.bind(max_tokens=1024, temperature=0.7)
-            | StrOutputParser()
-        )
-
-        subchain_format = (
-            ChatPromptTemplate.from_messages(cls._formatting_prompt_msgs)
-            | llm_formatting.bind(max_tokens=1024, temperature=0, response_format={"type": "json_object"})
-            | utils.TolerantJsonOutputParser()
+        subchain_draft_and_format = cls.build_draft_and_format(
+            llm,
+            llm_formatting,
+            draft_prompt_msgs=cls.get_prompt_msgs("_instruction_prompt_msgs"),
+            formatting_prompt_msgs=cls._formatting_prompt_msgs,
+            draft_key="drafts",
+            json_instruction=cls._json_instruction,
+            json_schema=cls._json_schema,
+            extract_draft=utils.extract_labelled_items,
+            max_tokens=1024,
+            temperature=0.7,
         )
 
         main_chain = (
@@ -430,10 +516,7 @@ class GenSupportingArgumentChain(AbstractGenArgumentChain):
                 target_label=(itemgetter("target_idx") | RunnableLambda(cls.format_target_label))
             )
             | RunnablePassthrough().assign(
-                drafts=subchain_draft
-            )
-            | RunnablePassthrough().assign(
-                json=subchain_format
+                json=subchain_draft_and_format
             )
             | RunnableLambda(cls.parse_json_arguments)
         )
@@ -477,23 +560,37 @@ class GenAttackingArgumentChain(AbstractGenArgumentChain):
          )
     ]
 
+    _instruction_prompt_msgs_static_prefix = [
+        ("system", _SYSTEM_PROMPT_EXPERT),
+        ("user",
+            (
+                "Read the following background information carefully before answering!\n"
+                "/// background_information\n"
+            ) + _ARGUMENT_BASIC_INFO + "\n\n" + _WRITING_ARGUMENTS_INFO + (
+                "\n///\n"
+                "Task: Provide objections against a given claim\n"
+                "Provide different and independent CON arguments -- each consisting in a catchy name "
+                "and a single concise statement, formatted as '**name:** statement' -- that object to "
+                "the target proposition. Make sure each CON argument demonstrates in a specific and "
+                "plausible way why the target proposition is false. Just denying the proposition won't "
+                "do. However, keep your arguments short and direct (single sentence). Be inspired by "
+                "the domain tags below.\n"
+                "You are: {persona}.\n"
+                "Domain tags: {taglist}\n"
+                "Now, back to your task. An opponent in a debate has previously maintained that:\n\n"
+                "{premiselist}\n\n"
+                "Can you provide up to {n} CON arguments that object to the {nth} proposition "
+                "{target_label}? Just provide your CON arguments below (no explanations needed)."
+            )
+         )
+    ]
+
     _formatting_prompt_msgs = [
             ("system", _SYSTEM_PROMPT),
             ("user", "Please provide up to {n} different and independent arguments - each "
                 "consisting in a catchy title and a single concise statement."),
             ("assistant", "{drafts}"),
-            ("user", "Good. Now, please format these arguments as follows:\n"
-                '```json\n'
-                '[\n'
-                '    {{"label": "<Insert title of first argument here>", '
-                '"claim": "<Insert first argument here>"}},\n'
-                '    {{"label": "<Insert title of first argument here>", '
-                '"claim": "<Insert second argument here>"}},\n'
-                '    ...\n'
-                ']\n'
-                '```\n'
-                'Just return the JSON code.\n'
-             )
+            ("user", "Good. Now, please format these arguments as follows:\n" + AbstractGenArgumentChain._json_format)
     ]
 
     # Preprocessing methods
@@ -517,16 +614,17 @@ class GenAttackingArgumentChain(AbstractGenArgumentChain):
     @classmethod
     def build(cls, llm: BaseChatModel, llm_formatting: BaseChatModel) -> Runnable:
 
-        subchain_draft = (
-            ChatPromptTemplate.from_messages(cls._instruction_prompt_msgs)
-            | llm.bind(max_tokens=512, temperature=0.7)
-            | StrOutputParser()
-        )
-
-        subchain_format = (
-            ChatPromptTemplate.from_messages(cls._formatting_prompt_msgs)
-            | llm_formatting.bind(max_tokens=512, temperature=0, response_format={"type": "json_object"})
-            | utils.TolerantJsonOutputParser()
+        subchain_draft_and_format = cls.build_draft_and_format(
+            llm,
+            llm_formatting,
+            draft_prompt_msgs=cls.get_prompt_msgs("_instruction_prompt_msgs"),
+            formatting_prompt_msgs=cls._formatting_prompt_msgs,
+            draft_key="drafts",
+            json_instruction=cls._json_instruction,
+            json_schema=cls._json_schema,
+            extract_draft=utils.extract_labelled_items,
+            max_tokens=512,
+            temperature=0.7,
         )
 
         main_chain = (
@@ -541,10 +639,7 @@ class GenAttackingArgumentChain(AbstractGenArgumentChain):
                 target_label=(itemgetter("target_idx") | RunnableLambda(cls.format_target_label))
             )
             | RunnablePassthrough().assign(
-                drafts=subchain_draft
-            )
-            | RunnablePassthrough().assign(
-                json=subchain_format
+                json=subchain_draft_and_format
             )
             | RunnableLambda(cls.parse_json_arguments)
         )
@@ -564,10 +659,23 @@ class GenerateProAndConChain(BaseChainBuilder):
     - tags_universal: universal tags for the assistant persona
     - tags_per_cluster: number of tags to sample per cluster
     - n: number of arguments to generate per valence
+    - ranking: plausibility ranking of the premises (only if built with rank_premises=False)
     """
 
+    # Preprocessing methods
+
+    @staticmethod
+    def reformat_persona(persona: str) -> str:
+        return persona[0].lower() + persona[1:]
+
+    # Chain builder
+
     @classmethod
-    def build(cls, llm: BaseChatModel, llm_formatting: BaseChatModel) -> Runnable:
+    def build(cls, llm: BaseChatModel, llm_formatting: BaseChatModel, rank_premises: bool = True) -> Runnable:
+        """
+        If `rank_premises` is False, the chain doesn't rank the premises itself but expects
+        a ranking in its input, e.g. one that is shared by all personas expanding a node.
+        """
 
         rank_by_plausibility = RankPropsByPlausibilityChain.build(llm, llm_formatting)
         gen_supporting_argument = GenSupportingArgumentChain.build(llm, llm_formatting)
@@ -575,9 +683,6 @@ class GenerateProAndConChain(BaseChainBuilder):
 
         # preprocessing methods
 
-        def reformat_persona(persona: str) -> str:
-            return persona[0].lower() + persona[1:]
-
         def sample_tags(input_: dict) -> list:
             tags_universal = input_["tags_universal"]
             tags_per_cluster = input_["tags_per_cluster"]
@@ -585,14 +690,21 @@ class GenerateProAndConChain(BaseChainBuilder):
 
         chain_generate_pro_and_con = (
             RunnablePassthrough().assign(
-                persona=(itemgetter("persona") | RunnableLambda(reformat_persona)),
+                persona=(itemgetter("persona") | RunnableLambda(cls.reformat_persona)),
                 # resample tags for more diversity
                 tags_pro=RunnableLambda(sample_tags),
                 tags_con=RunnableLambda(sample_tags)
             )
-            | RunnablePassthrough().assign(
-                ranking=rank_by_plausibility
+        )
+        if rank_premises:
+            chain_generate_pro_and_con = (
+                chain_generate_pro_and_con
+                | RunnablePassthrough().assign(
+                    ranking=rank_by_plausibility
+                )
             )
+        chain_generate_pro_and_con = (
+            chain_generate_pro_and_con
             | {
                 "new_pros": gen_supporting_argument,
                 "new_cons": gen_attacking_argument
@@ -632,26 +744,44 @@ class SelectMostSalientChain(BaseChainBuilder):
              )
         ]
 
+    _prompt_select_salient_msgs_static_prefix = [
+            ("system", _SYSTEM_PROMPT),
+            ("user", (
+                    "Read the following background information carefully before answering!\n"
+                    "/// background_information\n"
+                ) + _ARGUMENT_BASIC_INFO + (
+                    "\n///\n"
+                    "Task: Identify the most salient arguments.\n"
+                    "Please ensure that you identify diverse and mutually independent arguments.\n"
+                    "Now, the participants of a debate have previously brainstormed the following arguments:\n\n"
+                    "{argumentlist}\n\n"
+                    "which they've proposed as reasons {valence_text}:\n"
+                    "[[B]] {conclusion}\n"
+                    "Can you please select the {k} most salient arguments of these?"
+                )
+             )
+        ]
+
+    _json_format = (
+        '```json\n'
+        '[\n'
+        '    {{"idx": "1", "label": "<Insert argument label here.>", '
+        '"claim": "<Insert argument gist here.>"}},\n'
+        '    {{"idx": "2", "label": "<Insert argument label here.>", '
+        '"claim": "<Insert argument gist here.>"}},\n'
+        '    ...\n'
+        ']\n'
+        '```\n'
+        'Just return the JSON code.\n'
+    )
+
+    _json_schema = utils.json_array_schema("idx", "label", "claim")
+
     _formatting_prompt_msgs = [
             ("system", _SYSTEM_PROMPT),
             ("user", "Please select the {k} most salient arguments from the list below.\n\n{argumentlist}"),
             ("assistant", "{salient_args}"),
-            (
-                "user",
-                (
-                    'Please format the salient arguments you\'ve identified as follows:\n'
-                    '```json\n'
-                    '[\n'
-                    '    {{"idx": "1", "label": "<Insert argument label here.>", '
-                    '"claim": "<Insert argument gist here.>"}},\n'
-                    '    {{"idx": "2", "label": "<Insert argument label here.>", '
-                    '"claim": "<Insert argument gist here.>"}},\n'
-                    '    ...\n'
-                    ']\n'
-                    '```\n'
-                    'Just return the JSON code.\n'
-                )
-            )
+            ("user", 'Please format the salient arguments you\'ve identified as follows:\n' + _json_format)
         ]
 
     # Preprocessing methods
@@ -699,16 +829,16 @@ class SelectMostSalientChain(BaseChainBuilder):
     @classmethod
     def build(cls, llm: BaseChatModel, llm_formatting: BaseChatModel, **kwargs) -> Runnable:
 
-        subchain_select_salient = (
-            ChatPromptTemplate.from_messages(cls._prompt_select_salient_msgs)
-            | llm.bind(max_tokens=512, temperature=0.3)
-            | StrOutputParser()
-        )
-
-        subchain_format = (
-            ChatPromptTemplate.from_messages(cls._formatting_prompt_msgs)
-            | llm_formatting.bind(max_tokens=512, temperature=0, response_format={"type": "json_object"})
-            | utils.TolerantJsonOutputParser()
+        subchain_select_salient = cls.build_draft_and_format(
+            llm,
+            llm_formatting,
+            draft_prompt_msgs=cls.get_prompt_msgs("_prompt_select_salient_msgs"),
+            formatting_prompt_msgs=cls._formatting_prompt_msgs,
+            draft_key="salient_args",
+            json_instruction="\nFormat the salient arguments you've identified as follows:\n" + cls._json_format,
+            json_schema=cls._json_schema,
+            max_tokens=512,
+            temperature=0.3,
         )
 
         main_chain = (
@@ -719,9 +849,6 @@ class SelectMostSalientChain(BaseChainBuilder):
             | RunnablePassthrough().assign(
                 salient_args=subchain_select_salient
             )
-            | RunnablePassthrough().assign(
-                salient_args=subchain_format
-            )
             | RunnableLambda(cls.postprocess_salient_args)
         )
 
@@ -1,14 +1,41 @@
 """Abstract Base Class for syncialo chains based on langchain"""
 
 import abc
+from collections import Counter
+from collections.abc import Callable
+import threading
+from typing import Any
 
-from langchain_core.runnables import Runnable
+from langchain_core.caches import BaseCache
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable, RunnableLambda, RunnablePassthrough
 from langchain_core.language_models.chat_models import BaseChatModel
 
+from . import utils
+
+OUTPUT_MODES = ["two_pass", "json_object", "json_schema"]
+PROMPT_LAYOUTS = ["default", "static_prefix"]
+
 
 class BaseChainBuilder(abc.ABC):
     """Abstract Base Class for chain builders based on langchain"""
 
+    # response cache shared by all chains built (opt-in, see `set_response_cache`)
+    _response_cache: BaseCache | None = None
+    _cache_nondeterministic: bool = False
+
+    # how chains obtain json output (see `set_output_mode`)
+    _output_mode: str = "two_pass"
+
+    # order of static and variable prompt content (see `set_prompt_layout`)
+    _prompt_layout: str = "default"
+
+    # formatter calls made and avoided, per chain (see `formatter_stats`)
+    _formatter_stats: dict[str, Counter] = {}
+    _formatter_stats_lock = threading.Lock()
+
     @classmethod
     @abc.abstractmethod
     def build(cls, llm: BaseChatModel, **kwargs) -> Runnable:
@@ -18,3 +45,168 @@ class BaseChainBuilder(abc.ABC):
             Runnable: Chain
         """
         pass
+
+    @staticmethod
+    def set_response_cache(cache: BaseCache | None, cache_nondeterministic: bool = False):
+        """Set response cache for all chains built hereafter
+
+        Args:
+            cache: Response cache, or None to disable caching
+            cache_nondeterministic: Whether to cache calls with temperature > 0, too.
+                Calls with temperature = 0 are always cached.
+        """
+        BaseChainBuilder._response_cache = cache
+        BaseChainBuilder._cache_nondeterministic = cache_nondeterministic
+
+    @staticmethod
+    def set_output_mode(mode: str):
+        """Set output mode for all chains built hereafter
+
+        Args:
+            mode: One of
+                "two_pass": the model drafts free text, which the formatter model turns into json (default);
+                "json_object": the model answers in json right away (json mode), and the formatter model
+                    is only called if the answer cannot be parsed;
+                "json_schema": like "json_object", but decoding is constrained by the json schema of the
+                    expected output (requires an endpoint that supports guided decoding, e.g. vLLM).
+        """
+        if mode not in OUTPUT_MODES:
+            raise ValueError(f"Output mode must be one of {OUTPUT_MODES}, got {mode}.")
+        BaseChainBuilder._output_mode = mode
+
+    @staticmethod
+    def set_prompt_layout(layout: str):
+        """Set prompt layout for all chains built hereafter
+
+        Args:
+            layout: One of
+                "default": the original prompts;
+                "static_prefix": prompts that begin with static instructions and background
+                    information, and end with variable content (e.g., personas, tags, claims),
+                    so that servers with prefix caching (vLLM, TGI) can reuse the shared prefix.
+        """
+        if layout not in PROMPT_LAYOUTS:
+            raise ValueError(f"Prompt layout must be one of {PROMPT_LAYOUTS}, got {layout}.")
+        BaseChainBuilder._prompt_layout = layout
+
+    @classmethod
+    def get_prompt_msgs(cls, name: str) -> list:
+        """Returns the chat prompt `name` of this chain in the current prompt layout,
+        i.e. `<name>_static_prefix` if defined and the layout is "static_prefix"."""
+        if BaseChainBuilder._prompt_layout == "static_prefix":
+            return getattr(cls, f"{name}_static_prefix", getattr(cls, name))
+        return getattr(cls, name)
+
+    @staticmethod
+    def formatter_stats() -> dict[str, dict[str, int]]:
+        """Number of formatter calls made ("called") and avoided by parsing drafts locally ("avoided"), per chain"""
+        with BaseChainBuilder._formatter_stats_lock:
+            return {name: dict(counter) for name, counter in BaseChainBuilder._formatter_stats.items()}
+
+    @classmethod
+    def _count_formatter_call(cls, avoided: bool):
+        with BaseChainBuilder._formatter_stats_lock:
+            counter = BaseChainBuilder._formatter_stats.setdefault(cls.__name__, Counter(called=0, avoided=0))
+            counter["avoided" if avoided else "called"] += 1
+
+    @staticmethod
+    def bind_llm(llm: BaseChatModel, **kwargs) -> Runnable:
+        """Bind call parameters to llm, using the shared response cache if configured
+
+        Returns:
+            Runnable: llm with bound parameters
+        """
+        cache = BaseChainBuilder._response_cache
+        deterministic = kwargs.get("temperature") == 0
+        if cache is not None and (deterministic or BaseChainBuilder._cache_nondeterministic):
+            llm = llm.model_copy(update={"cache": cache})
+        return llm.bind(**kwargs)
+
+    @classmethod
+    def build_draft_and_format(
+        cls,
+        llm: BaseChatModel,
+        llm_formatting: BaseChatModel,
+        *,
+        draft_prompt_msgs: list,
+        formatting_prompt_msgs: list,
+        draft_key: str,
+        json_instruction: str,
+        json_schema: dict,
+        max_tokens: int,
+        temperature: float,
+        extract_draft: Callable[[str], Any] | None = None,
+    ) -> Runnable:
+        """Build subchain that drafts an answer with `llm` and returns it as parsed json
+
+        In "two_pass" output mode, the free-text draft is passed as `draft_key` to the
+        formatting prompt, and the formatter model returns json. Otherwise, `json_instruction`
+        is appended to the last draft prompt message, and the model answers in json directly;
+        the raw answer is passed on to the formatter model only if it fails to parse.
+
+        If given, `extract_draft` is tried (in any output mode) to turn the draft into json
+        locally before falling back to the formatter model. It must raise an
+        OutputParserException if it rejects the draft.
+
+        Returns:
+            Runnable: Subchain that maps the chain input to the parsed json output
+        """
+        def count_formatter_call(input_: dict) -> dict:
+            cls._count_formatter_call(avoided=False)
+            return input_
+
+        chain_format = (
+            RunnableLambda(count_formatter_call)
+            | ChatPromptTemplate.from_messages(formatting_prompt_msgs)
+            | cls.bind_llm(
+                llm_formatting, max_tokens=max_tokens, temperature=0, response_format={"type": "json_object"}
+            )
+            | utils.TolerantJsonOutputParser()
+        )
+
+        output_mode = BaseChainBuilder._output_mode
+
+        parsers: list[Callable[[str], Any]] = []
+
+        if output_mode == "two_pass":
+            chain_draft = (
+                ChatPromptTemplate.from_messages(draft_prompt_msgs)
+                | cls.bind_llm(llm, max_tokens=max_tokens, temperature=temperature)
+                | StrOutputParser()
+            )
+        else:
+            if output_mode == "json_schema":
+                response_format = {
+                    "type": "json_schema",
+                    "json_schema": {"name": f"{cls.__name__}_output", "schema": json_schema},
+                }
+            else:
+                response_format = {"type": "json_object"}
+
+            role, content = draft_prompt_msgs[-1]
+            chain_draft = (
+                ChatPromptTemplate.from_messages(draft_prompt_msgs[:-1] + [(role, content + json_instruction)])
+                | cls.bind_llm(llm, max_tokens=max_tokens, temperature=temperature, response_format=response_format)
+                | StrOutputParser()
+            )
+            parsers.append(lambda draft: utils.parse_structured_output(draft, json_schema))
+
+        if extract_draft is not None:
+            parsers.append(extract_draft)
+
+        if not parsers:
+            return RunnablePassthrough.assign(**{draft_key: chain_draft}) | chain_format
+
+        def parse_draft(input_: dict) -> Any:
+            for parse in parsers:
+                try:
+                    parsed = parse(input_[draft_key])
+                except OutputParserException:
+                    continue
+                cls._count_formatter_call(avoided=True)
+                return parsed
+            raise OutputParserException(f"Failed to parse draft locally: {input_[draft_key]}")
+
+        return RunnablePassthrough.assign(**{draft_key: chain_draft}) | RunnableLambda(parse_draft).with_fallbacks(
+            [chain_format], exceptions_to_handle=(OutputParserException,)
+        )
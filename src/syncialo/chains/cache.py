@@ -0,0 +1,113 @@
+"""Persistent, disk-backed response cache for chat models"""
+
+import hashlib
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Any
+import warnings
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+from loguru import logger
+
+
+class SQLiteResponseCache(BaseCache):
+    """
+    LLM response cache stored in a single SQLite file.
+
+    Entries are keyed on a hash of the llm string (model and bound call parameters)
+    and the rendered prompt messages. Entries older than `ttl` seconds are ignored
+    and purged; if the cache grows beyond `max_entries`, least recently used
+    entries are evicted. Hits and misses are counted.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        ttl: float | None = None,
+        max_entries: int | None = None,
+    ):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, generations TEXT, created REAL, accessed REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT generations, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        try:
+            with warnings.catch_warnings():
+                # langchain's (de)serialization is flagged as beta
+                warnings.simplefilter("ignore")
+                return loads(row[0])
+        except Exception as e:
+            logger.warning(f"Failed to load cached response, ignoring cache entry: {e}")
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        generations = dumps(return_val)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, generations, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, generations, now, now),
+            )
+            if self.ttl is not None:
+                self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            if self.max_entries is not None:
+                (size,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+                if size > self.max_entries:
+                    self._conn.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                        (size - self.max_entries,),
+                    )
+            self._conn.execute("COMMIT")
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    async def alookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        return self.lookup(prompt, llm_string)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self.update(prompt, llm_string, return_val)
+
+    async def aclear(self, **kwargs: Any) -> None:
+        self.clear(**kwargs)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": size}
@@ -1,13 +1,22 @@
 """Zeroshot classifier via Huggingface's inference API."""
 
-import aiohttp
+import asyncio
+from collections import defaultdict
 import os
 
+import aiohttp
 from loguru import logger
 from pydantic import BaseModel
 import tenacity
 
+from syncialo.ratelimit import EndpointOverloadedError, get_endpoint_limiter
+
 _DEFAULT_API_URL = "https://api-inference.huggingface.co/models/MoritzLaurer/deberta-v3-large-zeroshot-v2.0"
+_MAX_CONNECTIONS = 16
+_KEEPALIVE_TIMEOUT = 60  # seconds
+_BATCH_WINDOW = 0.01  # seconds to wait for further classify calls to coalesce
+_MAX_BATCH_SIZE = 32  # max number of sequences per request
+_MAX_ATTEMPTS = 8
 
 
 class ClassificationResult(BaseModel):
@@ -16,18 +25,159 @@ class ClassificationResult(BaseModel):
     scores: list[float]
 
 
-async def _aquery(payload):
-    api_url = os.getenv(
-        "SYNCIALO_CLASSIFIER_URL",
-        _DEFAULT_API_URL,
+class ClassifierClient:
+    """
+    Client for a zero-shot classification endpoint.
+
+    All requests go through one pooled, keep-alive aiohttp session, with at most
+    `max_connections` connections, and through the shared limiter of the endpoint
+    (see `syncialo.ratelimit`), which adapts the number of requests in flight to
+    the server's capacity. Concurrent `classify` calls with the
+    same labels and hypothesis template are coalesced into a single request
+    (of up to `max_batch_size` sequences), whose results are split up again.
+    """
+
+    def __init__(
+        self,
+        api_url: str | None = None,
+        api_token: str | None = None,
+        max_connections: int = _MAX_CONNECTIONS,
+        batch_window: float = _BATCH_WINDOW,
+        max_batch_size: int = _MAX_BATCH_SIZE,
+    ):
+        self.api_url = api_url or os.getenv("SYNCIALO_CLASSIFIER_URL", _DEFAULT_API_URL)
+        self.api_token = api_token or os.getenv("HUGGINGFACEHUB_API_TOKEN")
+        self.max_connections = max_connections
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._session: aiohttp.ClientSession | None = None
+        self._session_loop: asyncio.AbstractEventLoop | None = None
+        self._queues: dict[tuple, list[tuple[list[str], asyncio.Future]]] = defaultdict(list)
+        self._flush_tasks: dict[tuple, asyncio.Task] = {}
+        self._running_flushes: set[asyncio.Task] = set()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # sessions are bound to an event loop, so we create a new one if the loop changed
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections, keepalive_timeout=_KEEPALIVE_TIMEOUT
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"Authorization": f"Bearer {self.api_token}"},
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def aclose(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    @tenacity.retry(
+        wait=tenacity.wait_random_exponential(multiplier=1, max=60),
+        stop=tenacity.stop_after_attempt(_MAX_ATTEMPTS),
+        reraise=True,
     )
-    headers = {"Authorization": f"Bearer {os.getenv('HUGGINGFACEHUB_API_TOKEN')}"}
-    async with aiohttp.ClientSession() as session:
-        async with session.post(api_url, headers=headers, json=payload) as response:
-            return await response.json()
+    async def _request(self, sequences: list[str], parameters: dict) -> list[ClassificationResult]:
+        session = self._get_session()
+        async with get_endpoint_limiter(self.api_url).slot():
+            async with session.post(
+                self.api_url, json={"inputs": sequences, "parameters": parameters}
+            ) as response:
+                if response.status == 429 or response.status >= 500:
+                    retry_after = response.headers.get("Retry-After")
+                    msg = f"Classifier overloaded (status {response.status})."
+                    logger.warning(msg)
+                    raise EndpointOverloadedError(
+                        msg,
+                        status=response.status,
+                        retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+                    )
+                outputs = await response.json()
+
+        if isinstance(outputs, dict) and "error" in outputs:
+            msg = f"Error from classifier: {outputs['error']}"
+            logger.warning(msg)
+            raise Exception(msg)
+        if isinstance(outputs, dict):
+            outputs = [outputs]
+        if len(outputs) != len(sequences):
+            msg = f"Classifier returned {len(outputs)} results for {len(sequences)} sequences."
+            logger.warning(msg)
+            raise Exception(msg)
+        return [ClassificationResult(**output) for output in outputs]
+
+    async def _flush(self, key: tuple, items: list | None = None, delay: float = 0):
+        if delay:
+            await asyncio.sleep(delay)
+        if items is None:
+            self._flush_tasks.pop(key, None)
+            items = self._queues.pop(key, [])
+        if not items:
+            return
+
+        labels, hypothesis_template = key
+        parameters = {"candidate_labels": list(labels)}
+        if hypothesis_template:
+            parameters["hypothesis_template"] = hypothesis_template
+
+        try:
+            results = await self._request(
+                [sequence for sequences, _ in items for sequence in sequences], parameters
+            )
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        start = 0
+        for sequences, future in items:
+            if not future.done():
+                future.set_result(results[start:start + len(sequences)])
+            start += len(sequences)
+
+    async def classify(
+        self,
+        sequences: str | list[str],
+        labels: list[str],
+        hypothesis_template: str | None = None,
+    ) -> list[ClassificationResult]:
+        """Classify text sequences with zero-shot classification."""
+
+        if isinstance(sequences, str):
+            sequences = [sequences]
+
+        key = (tuple(labels), hypothesis_template)
+        future = asyncio.get_running_loop().create_future()
+        self._queues[key].append((sequences, future))
+
+        if sum(len(seqs) for seqs, _ in self._queues[key]) >= self.max_batch_size:
+            task = self._flush_tasks.pop(key, None)
+            if task is not None:
+                task.cancel()
+            flush_task = asyncio.create_task(self._flush(key, items=self._queues.pop(key)))
+            self._running_flushes.add(flush_task)
+            flush_task.add_done_callback(self._running_flushes.discard)
+        elif key not in self._flush_tasks:
+            self._flush_tasks[key] = asyncio.create_task(self._flush(key, delay=self.batch_window))
+
+        return await future
+
+
+_default_client: ClassifierClient | None = None
+
+
+def get_classifier_client() -> ClassifierClient:
+    """returns the classifier client shared by all `classify` calls"""
+    global _default_client
+    if _default_client is None:
+        _default_client = ClassifierClient()
+    return _default_client
 
 
-@tenacity.retry(wait=tenacity.wait_random_exponential(multiplier=1, max=60))
 async def classify(
     sequences: str | list[str],
     labels: list[str],
@@ -35,21 +185,4 @@ async def classify(
 ) -> list[ClassificationResult]:
     """Classify a text sequence with zero-shot classification."""
 
-    if isinstance(sequences, str):
-        sequences = [sequences]
-
-    parameters = {"candidate_labels": labels}
-    if hypothesis_template:
-        parameters["hypothesis_template"] = hypothesis_template
-
-    outputs = await _aquery({"inputs": sequences, "parameters": parameters})
-
-    results: list[ClassificationResult] = []
-    if "error" in outputs:
-        msg = f"Error from classifier: {outputs['error']}"
-        logger.warning(msg)
-        raise Exception(msg)
-    for output in outputs:
-        results.append(ClassificationResult(**output))
-
-    return results
+    return await get_classifier_client().classify(sequences, labels, hypothesis_template)
@@ -49,48 +49,47 @@ class SuggestTopicsChain(BaseChainBuilder):
         )
     ]
 
+    _json_format = (
+        '```json\n'
+        '[\n'
+        '    {{"idx": "1", "topic": "<Insert your first topic here.>"}},\n'
+        '    {{"idx": "2", "topic": "<Insert your second topic here.>"}},\n'
+        '    ...\n'
+        ']\n'
+        '```\n'
+        'Just return the JSON code.\n'
+    )
+
+    _json_schema = utils.json_array_schema("idx", "topic")
+
     _formatting_prompt_msgs = [
         ("system", _SYSTEM_PROMPT),
         ("user", "Can you please suggest some debating topics?"),
         ("assistant", "Yes. I suggest as debating topics:\n{suggestions}"),
-        (
-            "user",
-            (
-                'Good. Please format your suggestions as follows:\n'
-                '```json\n'
-                '[\n'
-                '    {{"idx": "1", "topic": "<Insert your first topic here.>"}},\n'
-                '    {{"idx": "2", "topic": "<Insert your second topic here.>"}},\n'
-                '    ...\n'
-                ']\n'
-                '```\n'
-                'Just return the JSON code.\n'
-            )
-        )
+        ("user", 'Good. Please format your suggestions as follows:\n' + _json_format)
     ]
 
     @classmethod
     def build(cls, llm: BaseChatModel, llm_formatting: BaseChatModel) -> Runnable:
 
-        chain_draft = (
+        chain_suggest = cls.build_draft_and_format(
+            llm,
+            llm_formatting,
+            draft_prompt_msgs=cls._instruction_prompt_msgs,
+            formatting_prompt_msgs=cls._formatting_prompt_msgs,
+            draft_key="suggestions",
+            json_instruction="\nFormat your suggestions as follows:\n" + cls._json_format,
+            json_schema=cls._json_schema,
+            max_tokens=512,
+            temperature=0.6,
+        )
+
+        main_chain = (
             {
                 "taglist": itemgetter("tags") | RunnableLambda(lambda x: ' - '.join(x)),
                 "n": itemgetter("debates_per_tag_cluster"),
             }
-            | ChatPromptTemplate.from_messages(cls._instruction_prompt_msgs)
-            | llm.bind(max_tokens=512, temperature=0.6)
-            | StrOutputParser()
-        )
-
-        chain_format = (
-            ChatPromptTemplate.from_messages(cls._formatting_prompt_msgs)
-            | llm_formatting.bind(max_tokens=512, temperature=0, response_format={"type": "json_object"})
-            | utils.TolerantJsonOutputParser()
-        )
-
-        main_chain = (
-            {"suggestions": chain_draft}
-            | chain_format
+            | chain_suggest
         )
 
         return main_chain
@@ -136,22 +135,22 @@ class SuggestMotionChain(BaseChainBuilder):
         )
     ]
 
+    _json_format = (
+        "```json\n"
+        "{{\n"
+        "    \"motion\": \"<Insert your motion here.>\"\n"
+        "}}\n"
+        "```\n"
+        "Just return the JSON code."
+    )
+
+    _json_schema = utils.json_object_schema("motion")
+
     _formatting_prompt_msgs = [
         ("system", _SYSTEM_PROMPT),
         ("user", "Can you please suggest a motion for the debate?"),
         ("assistant", "Yes, of course. I suggest the motion: {motion}"),
-        (
-            "user",
-            (
-                "Thanks. Please format your suggestion as follows:\n"
-                "```json\n"
-                "{{\n"
-                "    \"motion\": \"<Insert your motion here.>\"\n"
-                "}}\n"
-                "```\n"
-                "Just return the JSON code."
-            )
-        )
+        ("user", "Thanks. Please format your suggestion as follows:\n" + _json_format)
     ]
 
     _titlegen_prompt_msgs = [
@@ -187,27 +186,35 @@ class SuggestMotionChain(BaseChainBuilder):
     @classmethod
     def build(cls, llm: BaseChatModel, llm_formatting: BaseChatModel) -> Runnable:
 
-        chain_draft = (
-            ChatPromptTemplate.from_messages(cls._instruction_prompt_msgs)
-            | llm.bind(max_tokens=128, temperature=0.6)
-            | StrOutputParser()
+        json_instruction = "\nFormat your motion as follows:\n" + cls._json_format
+
+        chain_draft_and_format = cls.build_draft_and_format(
+            llm,
+            llm_formatting,
+            draft_prompt_msgs=cls._instruction_prompt_msgs,
+            formatting_prompt_msgs=cls._formatting_prompt_msgs,
+            draft_key="motion",
+            json_instruction=json_instruction,
+            json_schema=cls._json_schema,
+            max_tokens=128,
+            temperature=0.6,
         )
 
-        chain_revise = (
-            ChatPromptTemplate.from_messages(cls._instruction_prompt_msgs + cls._reformulation_prompt_msgs)
-            | llm.bind(max_tokens=128, temperature=0.3)
-            | StrOutputParser()
-        )
-
-        chain_format = (
-            ChatPromptTemplate.from_messages(cls._formatting_prompt_msgs)
-            | llm_formatting.bind(max_tokens=128, temperature=0, response_format={"type": "json_object"})
-            | utils.TolerantJsonOutputParser()
+        chain_revise_and_format = cls.build_draft_and_format(
+            llm,
+            llm_formatting,
+            draft_prompt_msgs=cls._instruction_prompt_msgs + cls._reformulation_prompt_msgs,
+            formatting_prompt_msgs=cls._formatting_prompt_msgs,
+            draft_key="motion",
+            json_instruction=json_instruction,
+            json_schema=cls._json_schema,
+            max_tokens=128,
+            temperature=0.3,
         )
 
         chain_titlegen = (
             ChatPromptTemplate.from_messages(cls._titlegen_prompt_msgs)
-            | llm.bind(max_tokens=128, temperature=0.3)
+            | cls.bind_llm(llm, max_tokens=128, temperature=0.3)
             | StrOutputParser()
         )
 
@@ -215,7 +222,7 @@ class SuggestMotionChain(BaseChainBuilder):
         def revise_if_necessary(input_: dict) -> Runnable:
             motion = input_["motion"]["motion"]
             if motion.startswith("This house") or motion.startswith("This debate"):
-                return chain_revise | chain_format | RunnableLambda(cls.check_json_format)
+                return chain_revise_and_format | RunnableLambda(cls.check_json_format)
             else:
                 return RunnablePassthrough() | itemgetter("motion")
 
@@ -224,10 +231,7 @@ class SuggestMotionChain(BaseChainBuilder):
                 taglist=(itemgetter("tags") | RunnableLambda(lambda x: ' - '.join(x)))
             )
             | RunnablePassthrough.assign(
-                motion=chain_draft
-            )
-            | RunnablePassthrough.assign(
-                motion=(itemgetter("motion") | chain_format | RunnableLambda(cls.check_json_format))
+                motion=(chain_draft_and_format | RunnableLambda(cls.check_json_format))
             )
             | revise_if_necessary
             | RunnablePassthrough.assign(
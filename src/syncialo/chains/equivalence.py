@@ -1,5 +1,7 @@
 """Equivalence tests"""
 
+import asyncio
+
 from loguru import logger
 from langchain_core.documents.base import Document
 
@@ -30,13 +32,12 @@ LABELS_DIALECTICS = [
 HYPOTHESIS_TEMPLATE_DIALECTICS = "CLAIM is {} REASON."
 
 
-async def are_dialectically_equivalent(
-    arg: ArgumentModel,
+async def classify_dialectical_relation(
     doc: Document,
     target_reason_claim: str,
     topic: str = None,
-    valence: Valence = None,
-) -> bool:
+) -> str | None:
+    """returns how doc is dialectically related to the target reason claim (see LABELS_DIALECTICS)"""
     try:
         checks = await classify(
             TEXT_TEMPLATE_DIALECTICS.format(
@@ -47,18 +48,34 @@ async def are_dialectically_equivalent(
         )
     except Exception as e:
         logger.error(f"Error from classifier: {e}")
-        return False
-    if not isinstance(checks, list) and not isinstance(checks[0], ClassificationResult):
+        return None
+    if not isinstance(checks, list) or not isinstance(checks[0], ClassificationResult):
         logger.error(f"Unexpected output from classifier: {checks}")
-        return False
-    result = checks[0]
-    if result.labels[0] == LABELS_DIALECTICS[0] and valence == Valence.PRO:
+        return None
+    return checks[0].labels[0]
+
+
+def _matches_valence(dialectical_relation: str | None, valence: Valence) -> bool:
+    if dialectical_relation == LABELS_DIALECTICS[0] and valence == Valence.PRO:
         return True
-    if result.labels[0] == LABELS_DIALECTICS[1] and valence == Valence.CON:
+    if dialectical_relation == LABELS_DIALECTICS[1] and valence == Valence.CON:
         return True
     return False
 
 
+async def are_dialectically_equivalent(
+    arg: ArgumentModel,
+    doc: Document,
+    target_reason_claim: str,
+    topic: str = None,
+    valence: Valence = None,
+) -> bool:
+    dialectical_relation = await classify_dialectical_relation(
+        doc, target_reason_claim=target_reason_claim, topic=topic
+    )
+    return _matches_valence(dialectical_relation, valence)
+
+
 async def are_semantically_equivalent(
     arg: ArgumentModel, doc: Document, topic: str = None
 ) -> bool:
@@ -79,3 +96,84 @@ async def are_semantically_equivalent(
         return False
 
     return all(check.labels[0] == LABELS_NLI[0] for check in checks)
+
+
+async def find_equivalents(
+    candidates: list[tuple[ArgumentModel, Valence]],
+    batched_neighbors: list[list[tuple[Document, float]]],
+    target_reason_claim: str,
+    topic: str = None,
+    similarity_threshold: float = 0.0,
+) -> list[Document | None]:
+    """
+    For each candidate argument, finds an equivalent among its retrieved neighbors.
+
+    Args:
+        candidates: new arguments with their valence wrt the target reason
+        batched_neighbors: for each candidate, retrieved (document, similarity) pairs
+        target_reason_claim: claim the candidates are reasons for or against
+        topic: debate topic
+        similarity_threshold: neighbors below this embedding similarity are not
+            considered as duplicates and never passed to the classifier
+
+    Returns:
+        For each candidate, the first neighbor that passes both the dialectical and
+        the semantic equivalence check, or None.
+
+    All checks of all candidates are issued concurrently, so that the classifier
+    client can coalesce them into batched requests. The dialectical relation of a
+    neighbor does not depend on the candidate and is classified only once. As soon
+    as one neighbor of a candidate is confirmed as duplicate, the remaining checks
+    of that candidate are cancelled.
+    """
+
+    dialectical_tasks: dict[str, asyncio.Task] = {}
+
+    def get_dialectical_task(doc: Document) -> asyncio.Task:
+        key = doc.page_content
+        if key not in dialectical_tasks:
+            dialectical_tasks[key] = asyncio.create_task(
+                classify_dialectical_relation(doc, target_reason_claim=target_reason_claim, topic=topic)
+            )
+        return dialectical_tasks[key]
+
+    async def check_pair(arg: ArgumentModel, valence: Valence, doc: Document) -> Document | None:
+        dialectical_relation, semantically_equivalent = await asyncio.gather(
+            asyncio.shield(get_dialectical_task(doc)),
+            are_semantically_equivalent(arg, doc, topic=topic),
+        )
+        if _matches_valence(dialectical_relation, valence) and semantically_equivalent:
+            return doc
+        return None
+
+    async def find_equivalent(
+        arg: ArgumentModel, valence: Valence, neighbors: list[tuple[Document, float]]
+    ) -> Document | None:
+        docs = [doc for doc, similarity in neighbors if similarity >= similarity_threshold]
+        if not docs:
+            return None
+        pair_tasks = [asyncio.create_task(check_pair(arg, valence, doc)) for doc in docs]
+        try:
+            for next_done in asyncio.as_completed(pair_tasks):
+                equivalent_doc = await next_done
+                if equivalent_doc is not None:
+                    logger.info(
+                        f"Found equivalent node for '{arg.claim}': "
+                        f"{equivalent_doc.metadata.get('uid')} | {equivalent_doc.page_content[:100]}"
+                    )
+                    return equivalent_doc
+        finally:
+            for task in pair_tasks:
+                task.cancel()
+        return None
+
+    try:
+        return await asyncio.gather(
+            *[
+                find_equivalent(arg, valence, neighbors)
+                for (arg, valence), neighbors in zip(candidates, batched_neighbors)
+            ]
+        )
+    finally:
+        for task in dialectical_tasks.values():
+            task.cancel()
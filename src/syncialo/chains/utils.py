@@ -60,3 +60,130 @@ class TolerantJsonOutputParser(JsonOutputParser):
                 except ValueError as e2:
                     msg = f"Invalid json output: {text}. Error: {e}. Error: {e2}"
                     raise OutputParserException(msg, llm_output=text) from e
+
+
+def json_object_schema(*keys: str) -> dict:
+    """JSON schema of an object with the given (required) string-valued keys"""
+    return {
+        "type": "object",
+        "properties": {key: {"type": "string"} for key in keys},
+        "required": list(keys),
+    }
+
+
+def json_array_schema(*keys: str) -> dict:
+    """JSON schema of an array of objects with the given (required) string-valued keys"""
+    return {"type": "array", "items": json_object_schema(*keys)}
+
+
+def parse_structured_output(text: str, schema: dict) -> Any:
+    """Parse json output of a model and check it against the structure of `schema`: an
+    object, or an array of objects, with the schema's required keys.
+
+    Raises:
+        OutputParserException: If the output is not valid JSON or doesn't match the schema.
+    """
+    data = TolerantJsonOutputParser().parse_result([Generation(text=text)])
+
+    def has_required_keys(item: Any, object_schema: dict) -> bool:
+        return isinstance(item, dict) and all(key in item for key in object_schema.get("required", []))
+
+    if schema["type"] == "object":
+        valid = has_required_keys(data, schema)
+    else:
+        valid = isinstance(data, list) and all(has_required_keys(item, schema.get("items", {})) for item in data)
+    if not valid:
+        raise OutputParserException(f"Output doesn't match schema: {text}", llm_output=text)
+    return data
+
+
+_LIST_ITEM_PATTERN = re.compile(r"^(\s*)(\(?[A-Za-z]?\d+[.):]|[-*•+])\s+(.*)$")
+_BOLD_LABEL_PATTERN = re.compile(r"^\*\*(.+?)\*\*\s*:?\s*(.*)$")
+
+
+def _strip_list_marker(line: str) -> str:
+    match = _LIST_ITEM_PATTERN.match(line)
+    return match.group(3).strip() if match else line.strip()
+
+
+def _split_bold_label(item: str) -> tuple[str, str] | None:
+    """Split '**label:** text' or '**label**: text' into label and text"""
+    match = _BOLD_LABEL_PATTERN.match(item)
+    if not match:
+        return None
+    label = match.group(1).strip().rstrip(":").strip()
+    text = match.group(2).strip()
+    return label, text
+
+
+def extract_numbered_items(text: str, key: str, max_items: int | None = None) -> list[dict]:
+    """Extract items of a (numbered or bulleted) markdown list, e.g. premises, as
+    `[{"idx": "1", key: "<first item>"}, ...]`.
+
+    Leading bold labels ('**Premise 1:** ...') are dropped. Lines before the list
+    (preamble) are ignored.
+
+    Raises:
+        OutputParserException: If no list is found, the list is followed by
+            anything but further list items, an item is indented differently
+            (e.g. sub-bullets) or uses another list marker than the first item,
+            or there are more than `max_items` items.
+    """
+    items: list[str] = []
+    indent, marker_type = None, None
+    for line in text.strip("\n").splitlines():
+        if not line.strip():
+            continue
+        match = _LIST_ITEM_PATTERN.match(line)
+        if match is None:
+            if items:
+                raise OutputParserException(f"Unexpected line after list items: {line}", llm_output=text)
+            continue
+        # numbered markers only differ in their numbers ('1.', '2.', ...)
+        line_indent, line_marker_type = match.group(1), re.sub(r"\d+", "0", match.group(2))
+        if indent is None:
+            indent, marker_type = line_indent, line_marker_type
+        elif line_indent != indent:
+            raise OutputParserException(f"Nested or misaligned list item: {line}", llm_output=text)
+        elif line_marker_type != marker_type:
+            raise OutputParserException(f"List item with different marker: {line}", llm_output=text)
+        item = match.group(3).strip()
+        labelled = _split_bold_label(item)
+        if labelled is not None:
+            item = labelled[1]
+        if not item:
+            raise OutputParserException(f"Empty list item: {line}", llm_output=text)
+        items.append(item)
+    if not items:
+        raise OutputParserException(f"No list items found: {text}", llm_output=text)
+    if max_items is not None and len(items) > max_items:
+        raise OutputParserException(f"More than {max_items} list items: {text}", llm_output=text)
+    return [{"idx": str(e + 1), key: item} for e, item in enumerate(items)]
+
+
+def extract_labelled_items(text: str) -> list[dict]:
+    """Extract items formatted as '**label:** claim', one per line and optionally
+    list-marked, as `[{"label": "<label>", "claim": "<claim>"}, ...]`.
+
+    Lines before the first item (preamble) are ignored.
+
+    Raises:
+        OutputParserException: If no item is found, an item lacks its claim, or
+            the items are followed by anything but further items.
+    """
+    items: list[dict] = []
+    for line in text.strip().splitlines():
+        if not line.strip():
+            continue
+        labelled = _split_bold_label(_strip_list_marker(line))
+        if labelled is None:
+            if items:
+                raise OutputParserException(f"Unexpected line after labelled items: {line}", llm_output=text)
+            continue
+        label, claim = labelled
+        if not label or not claim:
+            raise OutputParserException(f"Incomplete labelled item: {line}", llm_output=text)
+        items.append({"label": label, "claim": claim})
+    if not items:
+        raise OutputParserException(f"No labelled items found: {text}", llm_output=text)
+    return items
@@ -0,0 +1,156 @@
+"""Append-only journal for checkpointing debates while they are being built."""
+
+import fcntl
+import os
+from pathlib import Path
+import uuid
+
+from loguru import logger
+import networkx as nx
+from pydantic import BaseModel
+import ujson
+
+
+class JournalState(BaseModel):
+    """State of a partially built debate, as recovered from its journal"""
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    tree: nx.DiGraph
+    root_id: str
+    depths: dict[str, int]
+    expanded: set[str]
+    vectors: dict[str, list[float]]
+
+    def frontier(self) -> list[tuple[str, int]]:
+        """nodes (with their depth) that still have to be expanded, in insertion order"""
+        return [(node_id, self.depths[node_id]) for node_id in self.tree.nodes if node_id not in self.expanded]
+
+
+class DebateJournal:
+    """
+    Append-only journal of a debate under construction.
+
+    The journal is a JSON-lines file with one record for the root and one record
+    per expanded node. An expansion record holds the expanded node's premises,
+    the newly added nodes (with their embedding vectors, so that the vector store
+    can be restored without re-embedding) and all newly added edges. Every record
+    is flushed and synced to disk when written, holding an exclusive lock on the
+    file. A truncated last line, as left by a crash, is dropped on replay.
+
+    Every record is tagged with the journal's owner (one per attempt to build
+    the debate). Replaying the journal takes it over: an owner record is
+    appended, and records that a previous owner (e.g. a worker whose lease on
+    the debate has expired, but which is still running) appends thereafter are
+    ignored on any later replay.
+    """
+
+    def __init__(self, path: str | Path, owner: str | None = None):
+        self.path = Path(path)
+        self.owner = owner or uuid.uuid4().hex
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def delete(self):
+        self.path.unlink(missing_ok=True)
+
+    def _append(self, record: dict):
+        with open(self.path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(ujson.dumps({**record, "owner": self.owner}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def record_root(self, root_id: str, claim: str, label: str, vector: list[float]):
+        self._append(
+            {"op": "root", "uid": root_id, "claim": claim, "label": label, "vector": vector}
+        )
+
+    def record_expansion(
+        self,
+        node_id: str,
+        premises: list[str] | None,
+        nodes: list[dict],
+        edges: list[dict],
+    ):
+        """
+        records expansion of node_id
+
+        args:
+
+            node_id:  expanded node
+            premises: premises identified for node_id
+            nodes:    new nodes as dicts with keys uid, claim, label, vector
+            edges:    new edges as dicts with keys source, target, valence, target_idx
+        """
+        self._append(
+            {"op": "expand", "uid": node_id, "premises": premises, "nodes": nodes, "edges": edges}
+        )
+
+    def replay(self) -> JournalState | None:
+        """
+        rebuilds state of the debate from journal and takes over the journal,
+        returns None if journal is empty
+        """
+        tree = nx.DiGraph()
+        root_id = None
+        depths: dict[str, int] = {}
+        expanded: set[str] = set()
+        vectors: dict[str, list[float]] = {}
+
+        # read and take over the journal under the same lock, so that no record
+        # of the previous owner is appended in between
+        with open(self.path, "a+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                lines = f.readlines()
+                valid_size = sum(len(line) for line in lines)
+                if lines and not lines[-1].endswith(b"\n"):
+                    logger.warning(f"Dropping truncated last record in journal {self.path}.")
+                    valid_size -= len(lines.pop())
+                    f.truncate(valid_size)
+                f.write(ujson.dumps({"op": "owner", "owner": self.owner}).encode() + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        # current owner of the journal, as of the first record
+        owner = ujson.loads(lines[0]).get("owner") if lines else None
+        for line in lines:
+            record = ujson.loads(line)
+            if record["op"] == "owner":
+                owner = record["owner"]
+            elif record.get("owner") != owner:
+                logger.debug(f"Ignoring record of previous owner in journal {self.path}.")
+            elif record["op"] == "root":
+                root_id = record["uid"]
+                tree.add_node(root_id, claim=record["claim"], label=record["label"])
+                depths[root_id] = 0
+                vectors[root_id] = record["vector"]
+            elif record["op"] == "expand":
+                node_id = record["uid"]
+                if record["premises"] is not None and node_id != root_id:
+                    tree.nodes[node_id]["premises"] = record["premises"]
+                for node in record["nodes"]:
+                    tree.add_node(node["uid"], claim=node["claim"], label=node["label"])
+                    depths[node["uid"]] = depths[node_id] + 1
+                    vectors[node["uid"]] = node["vector"]
+                for edge in record["edges"]:
+                    tree.add_edge(
+                        edge["source"], edge["target"], valence=edge["valence"], target_idx=edge["target_idx"]
+                    )
+                expanded.add(node_id)
+
+        if root_id is None:
+            return None
+
+        logger.info(
+            f"Resuming debate from journal {self.path}: {tree.number_of_nodes()} nodes, "
+            f"{len(expanded)} expanded."
+        )
+        return JournalState(tree=tree, root_id=root_id, depths=depths, expanded=expanded, vectors=vectors)
@@ -0,0 +1,298 @@
+"""Sharded columnar (Parquet / Arrow IPC) storage of debate corpora."""
+
+from collections.abc import Iterator
+from pathlib import Path
+import shutil
+
+import networkx as nx
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+from syncialo.compact_tree import VALENCES, CompactTree
+from syncialo.corpus import CorpusReader
+
+_COLUMNAR_DIR = "columnar"
+_FORMATS = ["parquet", "arrow"]
+_SHARD_SIZE = 500  # debates per shard
+_TABLES = ["debates", "nodes", "edges"]
+
+DEBATES_SCHEMA = pa.schema(
+    [
+        ("corpus_uid", pa.string()),
+        ("debate_uid", pa.string()),
+        ("tags", pa.list_(pa.string())),
+        ("topic", pa.string()),
+        ("motion", pa.map_(pa.string(), pa.string())),
+        ("degree_config", pa.list_(pa.int32())),
+        ("num_nodes", pa.int32()),
+        ("max_depth", pa.int16()),
+    ]
+)
+
+NODES_SCHEMA = pa.schema(
+    [
+        ("debate_uid", pa.string()),
+        ("node_idx", pa.int32()),
+        ("node_id", pa.string()),
+        ("claim", pa.string()),
+        ("label", pa.string()),
+        ("premises", pa.list_(pa.string())),
+        ("parent_idx", pa.int32()),
+        ("depth", pa.int16()),
+    ]
+)
+
+EDGES_SCHEMA = pa.schema(
+    [
+        ("debate_uid", pa.string()),
+        ("source_idx", pa.int32()),
+        ("target_idx", pa.int32()),
+        ("valence", pa.dictionary(pa.int8(), pa.string())),
+        ("premise_idx", pa.int16()),
+    ]
+)
+
+_SCHEMAS = {"debates": DEBATES_SCHEMA, "nodes": NODES_SCHEMA, "edges": EDGES_SCHEMA}
+
+# splits are not stored in the tables, but given by the (hive-style) shard directories
+_PARTITIONING = ds.partitioning(pa.schema([("split", pa.string())]), flavor="hive")
+
+
+def debate_to_rows(config: dict, tree: nx.DiGraph) -> dict[str, dict[str, list]]:
+    """
+    converts one debate (config and tree) to columns of the debates, nodes and
+    edges tables; edges refer to nodes by their index within the debate, and an
+    edge's `premise_idx` is the `target_idx` attribute of the tree's edge
+    """
+    compact = CompactTree.from_networkx(tree)
+    n = len(compact)
+    debate_uid = config["debate_uid"]
+    debates = {
+        "corpus_uid": [config["corpus_uid"]],
+        "debate_uid": [debate_uid],
+        "tags": [config["tags"]],
+        "topic": [config["topic"]],
+        "motion": [list(config["motion"].items())],
+        "degree_config": [config["degree_config"]],
+        "num_nodes": [n],
+        "max_depth": [int(compact.depths.max()) if n else 0],
+    }
+    nodes = {
+        "debate_uid": [debate_uid] * n,
+        "node_idx": list(range(n)),
+        "node_id": [compact.node_id(i) for i in range(n)],
+        "claim": [compact.claim(i) for i in range(n)],
+        "label": [compact.label(i) for i in range(n)],
+        "premises": [compact.node_premises(i) for i in range(n)],
+        "parent_idx": compact.parents.tolist(),
+        "depth": compact.depths.tolist(),
+    }
+    m = compact.number_of_edges()
+    edges = {
+        "debate_uid": [debate_uid] * m,
+        "source_idx": compact.edge_sources.tolist(),
+        "target_idx": compact.edge_targets.tolist(),
+        "valence": [VALENCES[v] if v >= 0 else None for v in compact.edge_valences.tolist()],
+        "premise_idx": [t if t >= 0 else None for t in compact.edge_target_idxs.tolist()],
+    }
+    return {"debates": debates, "nodes": nodes, "edges": edges}
+
+
+class ColumnarCorpusWriter:
+    """
+    Packs debates into sharded tables, one shard of debates, nodes and edges
+    tables per `shard_size` debates and split:
+
+        <output_dir>/<table>/split=<split>/<table>-<shard>.<parquet|arrow>
+
+    Arrow IPC files can be memory-mapped by the reader without copying.
+    """
+
+    def __init__(self, output_dir: str | Path, format: str = "parquet", shard_size: int = _SHARD_SIZE):
+        if format not in _FORMATS:
+            raise ValueError(f"Format must be one of {_FORMATS}.")
+        self.output_dir = Path(output_dir)
+        self.format = format
+        self.shard_size = shard_size
+        self._buffers: dict[str, dict[str, dict[str, list]]] = {}
+        self._buffered_debates: dict[str, int] = {}
+        self._shards: dict[str, int] = {}
+
+    def add(self, config: dict, tree: nx.DiGraph):
+        split = config["split"]
+        rows = debate_to_rows(config, tree)
+        buffer = self._buffers.setdefault(
+            split, {table: {name: [] for name in _SCHEMAS[table].names} for table in _TABLES}
+        )
+        for table in _TABLES:
+            for name, values in rows[table].items():
+                buffer[table][name].extend(values)
+        self._buffered_debates[split] = self._buffered_debates.get(split, 0) + 1
+        if self._buffered_debates[split] >= self.shard_size:
+            self._flush(split)
+
+    def _flush(self, split: str):
+        if not self._buffered_debates.get(split):
+            return
+        shard = self._shards.get(split, 0)
+        for table in _TABLES:
+            arrow_table = pa.table(self._buffers[split][table], schema=_SCHEMAS[table])
+            path = self.output_dir / table / f"split={split}" / f"{table}-{shard:05d}.{self.format}"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f".{path.name}.tmp")
+            if self.format == "parquet":
+                pq.write_table(arrow_table, tmp_path)
+            else:
+                with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_file(sink, arrow_table.schema) as writer:
+                    writer.write_table(arrow_table)
+            tmp_path.replace(path)
+        self._shards[split] = shard + 1
+        del self._buffers[split]
+        self._buffered_debates[split] = 0
+
+    def close(self):
+        for split in list(self._buffers):
+            self._flush(split)
+
+    def __enter__(self) -> "ColumnarCorpusWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def export_columnar_corpus(
+    corpus_path: str | Path,
+    output_dir: str | Path | None = None,
+    format: str = "parquet",
+    shard_size: int = _SHARD_SIZE,
+) -> Path:
+    """
+    packs all debates of a corpus (one directory per debate with config.yaml and
+    node-link json) into sharded tables, by default in <corpus_path>/columnar;
+    debates without json output are skipped
+
+    Tables are written to a temporary directory first, which then replaces the
+    output directory, so no shards of a previous export are left behind.
+    """
+    corpus_path = Path(corpus_path)
+    output_dir = Path(output_dir) if output_dir is not None else corpus_path / _COLUMNAR_DIR
+    tmp_dir = output_dir.with_name(output_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    with ColumnarCorpusWriter(tmp_dir, format=format, shard_size=shard_size) as writer:
+        for debate in CorpusReader(corpus_path).debates():
+            writer.add(debate.config, debate.load_graph())
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    old_dir = output_dir.with_name(output_dir.name + ".old")
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if output_dir.exists():
+        output_dir.rename(old_dir)
+    tmp_dir.rename(output_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return output_dir
+
+
+class ColumnarCorpus:
+    """
+    Reader of sharded debate tables written by `ColumnarCorpusWriter`.
+
+    Tables are opened as (lazily scanned, memory-mapped) pyarrow datasets.
+    Debates can be filtered by split, tags and depth, and nodes and edges
+    streamed in record batches without decoding any JSON.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._datasets: dict[str, ds.Dataset] = {}
+
+    def dataset(self, table: str) -> ds.Dataset:
+        if table not in _TABLES:
+            raise ValueError(f"Table must be one of {_TABLES}.")
+        if table not in self._datasets:
+            table_path = self.path / table
+            file_format = "ipc" if next(table_path.rglob("*.arrow"), None) is not None else "parquet"
+            self._datasets[table] = ds.dataset(
+                str(table_path),
+                format=file_format,
+                filesystem=pafs.LocalFileSystem(use_mmap=True),
+                partitioning=_PARTITIONING,
+                exclude_invalid_files=True,
+            )
+        return self._datasets[table]
+
+    @staticmethod
+    def _split_filter(split: str | list[str] | None) -> pc.Expression | None:
+        if split is None:
+            return None
+        splits = [split] if isinstance(split, str) else list(split)
+        return pc.field("split").isin(splits)
+
+    def debates(
+        self,
+        split: str | list[str] | None = None,
+        tags: list[str] | None = None,
+        columns: list[str] | None = None,
+    ) -> pa.Table:
+        """debates table, optionally restricted to splits and to debates with any of the given tags"""
+        table = self.dataset("debates").to_table(filter=self._split_filter(split))
+        if tags:
+            # debates (rows) with at least one matching tag
+            is_match = pc.is_in(pc.list_flatten(table["tags"]), value_set=pa.array(tags))
+            matching_rows = pc.filter(pc.list_parent_indices(table["tags"]), is_match)
+            mask = np.zeros(table.num_rows, dtype=bool)
+            mask[matching_rows.to_numpy()] = True
+            table = table.filter(pa.array(mask))
+        return table.select(columns) if columns is not None else table
+
+    def debate_uids(self, split: str | list[str] | None = None, tags: list[str] | None = None) -> list[str]:
+        return self.debates(split=split, tags=tags, columns=["debate_uid"])["debate_uid"].to_pylist()
+
+    def iter_batches(
+        self,
+        table: str = "nodes",
+        split: str | list[str] | None = None,
+        tags: list[str] | None = None,
+        max_depth: int | None = None,
+        columns: list[str] | None = None,
+        batch_size: int = 10_000,
+    ) -> Iterator[pa.RecordBatch]:
+        """
+        streams record batches of the nodes or edges table, restricted to splits,
+        to debates with any of the given tags, and (nodes only) to nodes up to max_depth
+        """
+        expression = self._split_filter(split)
+        if tags:
+            uid_filter = pc.field("debate_uid").isin(self.debate_uids(split=split, tags=tags))
+            expression = uid_filter if expression is None else expression & uid_filter
+        if max_depth is not None:
+            if table != "nodes":
+                raise ValueError("Depth filter only applies to the nodes table.")
+            depth_filter = pc.field("depth") <= max_depth
+            expression = depth_filter if expression is None else expression & depth_filter
+        yield from self.dataset(table).to_batches(columns=columns, filter=expression, batch_size=batch_size)
+
+    def load_debate(self, debate_uid: str) -> nx.DiGraph:
+        """reconstructs the tree of one debate"""
+        uid_filter = pc.field("debate_uid") == debate_uid
+        nodes = self.dataset("nodes").to_table(filter=uid_filter).sort_by("node_idx").to_pylist()
+        edges = self.dataset("edges").to_table(filter=uid_filter).to_pylist()
+        if not nodes:
+            raise KeyError(f"Debate {debate_uid} not found.")
+        tree = nx.DiGraph()
+        for node in nodes:
+            data = {key: node[key] for key in ("claim", "label") if node[key] is not None}
+            if node["premises"] is not None:
+                data["premises"] = node["premises"]
+            tree.add_node(node["node_id"], **data)
+        for edge in edges:
+            data = {}
+            if edge["valence"] is not None:
+                data["valence"] = edge["valence"]
+            if edge["premise_idx"] is not None:
+                data["target_idx"] = edge["premise_idx"]
+            tree.add_edge(nodes[edge["source_idx"]]["node_id"], nodes[edge["target_idx"]]["node_id"], **data)
+        return tree
@@ -0,0 +1,300 @@
+"""Compact, array-backed representation of debate trees."""
+
+from collections import deque
+from typing import Any
+
+import networkx as nx
+import numpy as np
+
+# valence codes of edges
+VALENCES = ("PRO", "CON")
+_NO_VALENCE = -1
+_NO_TARGET_IDX = -1
+_NO_PARENT = -1
+_NO_STRING = -1
+
+_NODE_ATTRIBUTES = ("claim", "label", "premises")
+_MAX_TARGET_IDX = np.iinfo(np.int16).max
+
+
+class StringTable:
+    """
+    Immutable table of interned strings, stored as one utf-8 buffer with offsets.
+
+    Duplicate strings are stored once. Strings are decoded on access.
+    """
+
+    def __init__(self, buffer: bytes, offsets: np.ndarray):
+        self.buffer = buffer
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, strings: list[str]) -> tuple["StringTable", np.ndarray]:
+        """interns `strings`, returns table and index of every string in the table"""
+        index: dict[str, int] = {}
+        encoded: list[bytes] = []
+        ids = np.empty(len(strings), dtype=np.int32)
+        for i, string in enumerate(strings):
+            if string not in index:
+                index[string] = len(encoded)
+                encoded.append(string.encode("utf-8"))
+            ids[i] = index[string]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(b"".join(encoded), offsets), ids
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.buffer[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buffer) + self.offsets.nbytes
+
+
+class CompactTree:
+    """
+    Debate tree stored in flat arrays.
+
+    Nodes are numbered in insertion order. Every node has a parent index (the
+    target of its first out-edge, -1 for roots) and a depth, so both are looked
+    up in O(1). Node ids, claims, labels and premises are indices into one
+    interned string table (-1 for missing claims and labels). All edges,
+    including the extra edges that link duplicate arguments to further parents,
+    are kept in edge arrays with int8 valence codes (see `VALENCES`).
+
+    Converts losslessly to and from `nx.DiGraph` and node-link JSON; node and
+    edge attributes other than the standard ones are kept in sparse dicts.
+    """
+
+    def __init__(
+        self,
+        strings: StringTable,
+        ids: np.ndarray,
+        claims: np.ndarray,
+        labels: np.ndarray,
+        premise_offsets: np.ndarray,
+        premises: np.ndarray,
+        has_premises: np.ndarray,
+        parents: np.ndarray,
+        depths: np.ndarray,
+        edge_sources: np.ndarray,
+        edge_targets: np.ndarray,
+        edge_valences: np.ndarray,
+        edge_target_idxs: np.ndarray,
+        graph: dict | None = None,
+        node_extras: dict[int, dict] | None = None,
+        edge_extras: dict[int, dict] | None = None,
+    ):
+        self.strings = strings
+        self.ids = ids
+        self.claims = claims
+        self.labels = labels
+        # premises of node i are premises[premise_offsets[i]:premise_offsets[i+1]],
+        # if has_premises[i] (i.e., node i has a premises attribute)
+        self.premise_offsets = premise_offsets
+        self.premises = premises
+        self.has_premises = has_premises
+        self.parents = parents
+        self.depths = depths
+        self.edge_sources = edge_sources
+        self.edge_targets = edge_targets
+        self.edge_valences = edge_valences
+        self.edge_target_idxs = edge_target_idxs
+        self.graph = graph or {}
+        self.node_extras = node_extras or {}
+        self.edge_extras = edge_extras or {}
+        self._index: dict[str, int] | None = None
+        self._children: tuple[np.ndarray, np.ndarray] | None = None
+
+    # Conversion
+
+    @classmethod
+    def from_networkx(cls, tree: nx.DiGraph) -> "CompactTree":
+        node_ids = list(tree.nodes)
+        index = {node_id: i for i, node_id in enumerate(node_ids)}
+        n = len(node_ids)
+        if any(not isinstance(node_id, str) for node_id in node_ids):
+            raise ValueError("CompactTree requires string node ids.")
+
+        # attributes of unexpected type are kept as extras
+        def is_standard(key: str, value: Any) -> bool:
+            if key == "premises":
+                return isinstance(value, list) and all(isinstance(p, str) for p in value)
+            return key in _NODE_ATTRIBUTES and isinstance(value, str)
+
+        strings: list[str] = list(node_ids)
+        claims = np.full(n, _NO_STRING, dtype=np.int32)
+        labels = np.full(n, _NO_STRING, dtype=np.int32)
+        premise_offsets = np.zeros(n + 1, dtype=np.int32)
+        has_premises = np.zeros(n, dtype=bool)
+        premise_strings: list[str] = []
+        node_extras: dict[int, dict] = {}
+        for i, node_id in enumerate(node_ids):
+            data = tree.nodes[node_id]
+            for key, ids in (("claim", claims), ("label", labels)):
+                if is_standard(key, data.get(key)):
+                    ids[i] = len(strings)
+                    strings.append(data[key])
+            premise_offsets[i] = len(premise_strings)
+            if is_standard("premises", data.get("premises")):
+                has_premises[i] = True
+                premise_strings.extend(data["premises"])
+            extras = {k: v for k, v in data.items() if not is_standard(k, v)}
+            if extras:
+                node_extras[i] = extras
+        premise_offsets[n] = len(premise_strings)
+        premises_start = len(strings)
+        strings.extend(premise_strings)
+        table, string_ids = StringTable.build(strings)
+        claims[claims >= 0] = string_ids[claims[claims >= 0]]
+        labels[labels >= 0] = string_ids[labels[labels >= 0]]
+
+        m = tree.number_of_edges()
+        edge_sources = np.empty(m, dtype=np.int32)
+        edge_targets = np.empty(m, dtype=np.int32)
+        edge_valences = np.full(m, _NO_VALENCE, dtype=np.int8)
+        edge_target_idxs = np.full(m, _NO_TARGET_IDX, dtype=np.int16)
+        edge_extras: dict[int, dict] = {}
+        parents = np.full(n, _NO_PARENT, dtype=np.int32)
+        for j, (source, target, data) in enumerate(tree.edges(data=True)):
+            edge_sources[j] = index[source]
+            edge_targets[j] = index[target]
+            extras = {}
+            for key, value in data.items():
+                if key == "valence" and value in VALENCES:
+                    edge_valences[j] = VALENCES.index(value)
+                elif key == "target_idx" and type(value) is int and 0 <= value <= _MAX_TARGET_IDX:
+                    edge_target_idxs[j] = value
+                else:
+                    extras[key] = value
+            if extras:
+                edge_extras[j] = extras
+        for i, node_id in enumerate(node_ids):
+            parent_id = next(iter(tree.successors(node_id)), None)
+            if parent_id is not None:
+                parents[i] = index[parent_id]
+
+        return cls(
+            strings=table,
+            ids=string_ids[:n].copy(),
+            claims=claims,
+            labels=labels,
+            premise_offsets=premise_offsets,
+            premises=string_ids[premises_start:].copy(),
+            has_premises=has_premises,
+            parents=parents,
+            depths=cls._compute_depths(parents),
+            edge_sources=edge_sources,
+            edge_targets=edge_targets,
+            edge_valences=edge_valences,
+            edge_target_idxs=edge_target_idxs,
+            graph=dict(tree.graph),
+            node_extras=node_extras,
+            edge_extras=edge_extras,
+        )
+
+    @staticmethod
+    def _compute_depths(parents: np.ndarray) -> np.ndarray:
+        n = len(parents)
+        depths = np.full(n, -1, dtype=np.int16)
+        children: dict[int, list[int]] = {}
+        for i, parent in enumerate(parents.tolist()):
+            children.setdefault(parent, []).append(i)
+        queue = deque(children.get(_NO_PARENT, []))
+        for root in queue:
+            depths[root] = 0
+        while queue:
+            node = queue.popleft()
+            for child in children.get(node, []):
+                if depths[child] < 0:
+                    depths[child] = depths[node] + 1
+                    queue.append(child)
+        return depths
+
+    def to_networkx(self) -> nx.DiGraph:
+        tree = nx.DiGraph(**self.graph)
+        for i in range(len(self)):
+            data = {}
+            if self.claims[i] != _NO_STRING:
+                data["claim"] = self.claim(i)
+            if self.labels[i] != _NO_STRING:
+                data["label"] = self.label(i)
+            if self.has_premises[i]:
+                data["premises"] = self.node_premises(i)
+            data.update(self.node_extras.get(i, {}))
+            tree.add_node(self.node_id(i), **data)
+        for j in range(self.number_of_edges()):
+            data = {}
+            if self.edge_valences[j] != _NO_VALENCE:
+                data["valence"] = VALENCES[self.edge_valences[j]]
+            if self.edge_target_idxs[j] != _NO_TARGET_IDX:
+                data["target_idx"] = int(self.edge_target_idxs[j])
+            data.update(self.edge_extras.get(j, {}))
+            tree.add_edge(self.node_id(self.edge_sources[j]), self.node_id(self.edge_targets[j]), **data)
+        return tree
+
+    @classmethod
+    def from_node_link_data(cls, data: dict) -> "CompactTree":
+        return cls.from_networkx(nx.node_link_graph(data))
+
+    def to_node_link_data(self) -> dict:
+        return nx.node_link_data(self.to_networkx())
+
+    # Lookups
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def number_of_edges(self) -> int:
+        return len(self.edge_sources)
+
+    def index(self, node_id: str) -> int:
+        """index of node with id node_id"""
+        if self._index is None:
+            self._index = {self.node_id(i): i for i in range(len(self))}
+        return self._index[node_id]
+
+    def node_id(self, i: int) -> str:
+        return self.strings[self.ids[i]]
+
+    def claim(self, i: int) -> str | None:
+        return self.strings[self.claims[i]] if self.claims[i] != _NO_STRING else None
+
+    def label(self, i: int) -> str | None:
+        return self.strings[self.labels[i]] if self.labels[i] != _NO_STRING else None
+
+    def node_premises(self, i: int) -> list[str] | None:
+        if not self.has_premises[i]:
+            return None
+        return [self.strings[s] for s in self.premises[self.premise_offsets[i]:self.premise_offsets[i + 1]]]
+
+    def parent(self, i: int) -> int:
+        """index of the (first) parent of node i, -1 for roots"""
+        return int(self.parents[i])
+
+    def depth(self, i: int) -> int:
+        return int(self.depths[i])
+
+    def roots(self) -> list[int]:
+        return np.flatnonzero(self.parents == _NO_PARENT).tolist()
+
+    def children(self, i: int) -> list[int]:
+        """indices of nodes whose (first) parent is node i"""
+        if self._children is None:
+            order = np.argsort(self.parents, kind="stable")
+            starts = np.searchsorted(self.parents[order], np.arange(-1, len(self) + 1))
+            self._children = (order, starts)
+        order, starts = self._children
+        return order[starts[i + 1]:starts[i + 2]].tolist()
+
+    @property
+    def nbytes(self) -> int:
+        """approximate memory used by arrays and string table"""
+        arrays = [
+            self.ids, self.claims, self.labels, self.premise_offsets, self.premises, self.has_premises, self.parents,
+            self.depths, self.edge_sources, self.edge_targets, self.edge_valences, self.edge_target_idxs,
+        ]
+        return self.strings.nbytes + sum(a.nbytes for a in arrays)
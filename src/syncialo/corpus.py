@@ -0,0 +1,119 @@
+"""Lazy, streaming reader of generated debate corpora."""
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import networkx as nx
+import ujson
+
+from syncialo.compact_tree import CompactTree
+from syncialo.manifest import MANIFEST_FILE, CorpusManifest, scan_corpus
+
+
+class CorpusDebate:
+    """
+    Debate of a corpus. The config is read from the corpus manifest, the debate's
+    graph is only decoded (and not cached) when it is loaded.
+    """
+
+    def __init__(self, corpus_path: Path, record: dict):
+        self.corpus_path = corpus_path
+        self.record = record
+
+    @property
+    def config(self) -> dict:
+        return self.record["config"]
+
+    @property
+    def split(self) -> str:
+        return self.config["split"]
+
+    @property
+    def debate_uid(self) -> str:
+        return self.config["debate_uid"]
+
+    @property
+    def path(self) -> Path:
+        return self.corpus_path / self.record["path"]
+
+    @property
+    def graph_path(self) -> Path | None:
+        graph_file = self.record.get("graph_file")
+        return self.path / graph_file if graph_file else None
+
+    def load_node_link_data(self) -> dict:
+        if self.graph_path is None:
+            raise FileNotFoundError(f"Debate {self.debate_uid} has no graph file.")
+        return ujson.decode(self.graph_path.read_text())
+
+    def load_graph(self) -> nx.DiGraph:
+        return nx.node_link_graph(self.load_node_link_data())
+
+    def load_compact_tree(self) -> CompactTree:
+        return CompactTree.from_node_link_data(self.load_node_link_data())
+
+    def __repr__(self) -> str:
+        return f"CorpusDebate({self.record['path']!r})"
+
+
+class CorpusReader:
+    """
+    Reader of a corpus directory (one directory per debate with config.yaml
+    and node-link json, grouped by split).
+
+    Debates are yielded one by one, filtered by split, tags and degree config.
+    Filters are evaluated on the debates' configs as recorded in the corpus
+    manifest (see `syncialo.manifest`), so graph files are never opened for
+    filtering. Without manifest, the split directories are walked lazily instead.
+    Graphs are decoded only when loaded, so memory use does not grow with the
+    size of the corpus.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.path / MANIFEST_FILE
+
+    def build_manifest(self) -> Path:
+        """(re-)builds the corpus manifest from the debates' config and graph files"""
+        with CorpusManifest(self.manifest_path) as manifest:
+            manifest.sync(self.path)
+        return self.manifest_path
+
+    def records(self, split: str | list[str] | None = None) -> Iterator[dict]:
+        """yields records of debates in the given splits, from the manifest if there is one"""
+        if not self.manifest_path.exists():
+            splits = [split] if isinstance(split, str) else split
+            for record in scan_corpus(self.path):
+                if splits is None or record["config"]["split"] in splits:
+                    yield record
+            return
+        with CorpusManifest(self.manifest_path) as manifest:
+            records = manifest.records(split=split)
+        yield from records
+
+    def debates(
+        self,
+        split: str | list[str] | None = None,
+        tags: list[str] | None = None,
+        degree_config: list[int] | None = None,
+        complete: bool = True,
+    ) -> Iterator[CorpusDebate]:
+        """
+        yields debates in the given splits, with any of the given tags and the
+        given degree config; if `complete`, only debates with graph file
+        """
+        for record in self.records(split=split):
+            config = record["config"]
+            if tags and not set(tags).intersection(config["tags"]):
+                continue
+            if degree_config is not None and list(config["degree_config"]) != list(degree_config):
+                continue
+            if complete and not record.get("graph_file"):
+                continue
+            yield CorpusDebate(self.path, record)
+
+    def __iter__(self) -> Iterator[CorpusDebate]:
+        return self.debates()
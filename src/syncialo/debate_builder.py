@@ -2,40 +2,52 @@
 
 import asyncio
 import os
-import random
+from pathlib import Path
 import uuid
 
-import datasets
 from loguru import logger
+import faiss
 import networkx as nx
+import numpy as np
 
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceInferenceAPIEmbeddings
 from langchain_core.documents.base import Document
 
 from syncialo.chains.argumentation import (
     IdentifyPremisesChain,
     GenerateProAndConChain,
+    RankPropsByPlausibilityChain,
     SelectMostSalientChain,
     ArgumentModel,
     Valence,
 )
-from syncialo.chains.equivalence import (
-    are_dialectically_equivalent,
-    are_semantically_equivalent,
-)
+from syncialo.checkpoint import DebateJournal
+from syncialo.embeddings import get_embeddings
+from syncialo.personas import PersonaPool
+from syncialo.chains.equivalence import find_equivalents
 
 _ARGS_PER_PERSONA = 2
+_EXPANSION_MODES = ["depth_first", "breadth_first"]
+_MAX_CONCURRENT_EXPANSIONS = 8
+_RANKING_MODES = ["per_persona", "per_node", "aggregated"]
+_RANKING_PERSONAS = 3
 _PERSONAS_DATASET = dict(
     path="proj-persona/PersonaHub", name="reasoning", split="train"
 )
 _TAGS_PER_CLUSTER = 8
 _TOP_K_RETRIEVAL = 3
-_DEFAULT_EMBEDDINGS_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
-_DEFAUL_EMBEDDINGS_URL = "https://api-inference.huggingface.co/models/sentence-transformers/all-MiniLM-L6-v2"
+_SIMILARITY_THRESHOLD = 0.5
 
 
 class DebateBuilder:
+    """
+    Builds debate trees with LLM-based agents.
+
+    A DebateBuilder holds models, chains, persona data and embeddings, and may
+    be shared across many (concurrently built) debates. All per-debate state,
+    i.e. the tree and its vector store, is created in `build_debate`.
+    """
+
     def __init__(self, model, **kwargs):
         self.model = model
 
@@ -58,34 +70,73 @@ class DebateBuilder:
         if self.split == "test" and not self.tags_test:
             raise ValueError("Argument 'tags_test' is required for split 'test'.")
 
+        self.expansion_mode = kwargs.get("expansion_mode", "depth_first")
+        if self.expansion_mode not in _EXPANSION_MODES:
+            raise ValueError(f"Argument 'expansion_mode' must be one of {_EXPANSION_MODES}.")
+        self.max_concurrent_expansions = kwargs.get("max_concurrent_expansions", _MAX_CONCURRENT_EXPANSIONS)
+        if self.max_concurrent_expansions < 1:
+            raise ValueError("Argument 'max_concurrent_expansions' must be a positive integer.")
+
+        # how premises are ranked by plausibility before generating pros and cons:
+        # by every persona ("per_persona"), once per node ("per_node"), or by
+        # aggregating the rankings of a few personas ("aggregated")
+        self.ranking_mode = kwargs.get("ranking_mode", "per_persona")
+        if self.ranking_mode not in _RANKING_MODES:
+            raise ValueError(f"Argument 'ranking_mode' must be one of {_RANKING_MODES}.")
+        self.ranking_personas = kwargs.get("ranking_personas", _RANKING_PERSONAS)
+        if self.ranking_personas < 1:
+            raise ValueError("Argument 'ranking_personas' must be a positive integer.")
+
+        # number of extra persona requests launched per node; once enough pros and cons
+        # have been generated (as many as without speculation), stragglers are cancelled
+        # (opt-in, as this favours personas with fast answers)
+        self.speculative_personas = kwargs.get("speculative_personas", 0)
+        if self.speculative_personas < 0:
+            raise ValueError("Argument 'speculative_personas' must be a non-negative integer.")
+
         # build sub-chains
         self.chain_identify_premises = IdentifyPremisesChain.build(
             model, llm_formatting=self.formatter_model
         )
         self.chain_generate_pro_and_con = GenerateProAndConChain.build(
+            model, llm_formatting=self.formatter_model, rank_premises=(self.ranking_mode == "per_persona")
+        )
+        self.chain_rank_premises = RankPropsByPlausibilityChain.build(
             model, llm_formatting=self.formatter_model
         )
         self.chain_select_most_salient = SelectMostSalientChain.build(
             model, llm_formatting=self.formatter_model
         )
 
-        # download and init persona datasets
-        ds = datasets.load_dataset(**_PERSONAS_DATASET)
-        self.ds_personas = ds.select_columns(["input persona"])
+        # download and init persona pool, or load it from cache
+        self.persona_pool: PersonaPool = kwargs.get("persona_pool") or PersonaPool.load_or_create(
+            cache_path=os.getenv("SYNCIALO_PERSONAS_CACHE"), **_PERSONAS_DATASET
+        )
+
+        # minimal embedding similarity of potential duplicates, checked with classifier
+        self.similarity_threshold = kwargs.get("similarity_threshold", _SIMILARITY_THRESHOLD)
 
-        # vector store for duplicate detection
-        self.vector_store: FAISS | None = None
+        # (cached) embeddings for duplicate detection, shared by all debates built
+        self.embeddings = kwargs.get("embeddings") or get_embeddings()
+
+    def init_vector_store(
+        self, claims: list[str], uids: list[str], vectors: list[list[float]] | None = None
+    ) -> FAISS:
+        """
+        creates a new vector store for duplicate detection in a single debate,
+        using precomputed embedding vectors if provided
 
-    def init_vector_store(self, root_claim: str, root_id: str):
+        The vector store is part of the per-debate state and is passed along
+        with the tree, so that one DebateBuilder can build several debates
+        concurrently.
+        """
         logger.debug("Initializing vector store for duplicate detection.")
-        embeddings = HuggingFaceInferenceAPIEmbeddings(
-            api_key=os.getenv("HUGGINGFACEHUB_API_TOKEN"),
-            model_name=os.getenv("SYNCIALO_EMBEDDINGS_MODEL", _DEFAULT_EMBEDDINGS_MODEL),
-            api_url=os.getenv("SYNCIALO_EMBEDDINGS_URL", _DEFAUL_EMBEDDINGS_URL),
-        )
-        documents = [Document(root_claim, metadata={"uid": root_id})]
-        self.vector_store = FAISS.from_documents(
-            documents=documents, embedding=embeddings
+        if vectors is None:
+            vectors = self.embeddings.embed_documents(claims)
+        return FAISS.from_embeddings(
+            text_embeddings=list(zip(claims, vectors)),
+            embedding=self.embeddings,
+            metadatas=[{"uid": uid} for uid in uids],
         )
 
     async def identify_premises(
@@ -122,79 +173,153 @@ class DebateBuilder:
 
         return premises
 
-    async def get_equivalent(
-        self,
-        arg: ArgumentModel,
-        target_node_id: str,
-        root_id: str,
-        tree: nx.DiGraph,
-        topic: str = None,
-        valence: Valence = None,
-    ) -> str | None:
+    async def rank_premises(
+        self, premises: list[str], tags: list, personas: list[str]
+    ) -> list[int]:
+        """
+        ranks premises by plausibility once for all personas expanding a node,
+        as assessed by the first persona ("per_node" ranking mode), or by
+        aggregating the rankings of the first `ranking_personas` personas
+        ("aggregated" ranking mode)
+        """
+        if len(premises) == 1:
+            return [0]
+        if self.ranking_mode == "per_node":
+            personas = personas[:1]
+        else:
+            personas = personas[:self.ranking_personas]
+        rankings = await self.chain_rank_premises.abatch(
+            [
+                {
+                    "premises": premises,
+                    "tags": tags,
+                    "persona": GenerateProAndConChain.reformat_persona(persona),
+                }
+                for persona in personas
+            ]
+        )
+        if len(rankings) == 1:
+            return rankings[0]
+        return RankPropsByPlausibilityChain.aggregate_rankings(rankings, len(premises))
+
+    async def generate_pro_and_con_speculatively(
+        self, batched_input: list[dict], min_args: int
+    ) -> list[dict]:
         """
-        checks if arg is already in tree and returns id of equivalent node
+        runs the pro and con generation chain for all inputs (personas) concurrently,
+        collects results as they come in, and cancels the remaining requests as
+        soon as at least `min_args` pros and `min_args` cons have been generated
+
+        Personas are sampled at random, but the results kept are those that arrive
+        first, so personas with fast (e.g. short) answers are somewhat more likely
+        to be used than without speculation; hence speculation is opt-in.
+
+        Failed requests are logged and skipped.
         """
-        if self.vector_store is None:
-            raise ValueError("Vector store not initialized.")
-        similiar_docs = self.vector_store.search(
-            "I cherish wildlife.", search_type="similarity", k=_TOP_K_RETRIEVAL
+        tasks = [
+            asyncio.create_task(self.chain_generate_pro_and_con.ainvoke(input_))
+            for input_ in batched_input
+        ]
+        results: list[dict] = []
+        num_pros = num_cons = 0
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                try:
+                    generated_args = await next_result
+                except Exception as e:
+                    logger.warning(f"Failed to generate pros and cons for one persona: {e!r}")
+                    continue
+                results.append(generated_args)
+                num_pros += len(generated_args["new_pros"])
+                num_cons += len(generated_args["new_cons"])
+                if num_pros >= min_args and num_cons >= min_args:
+                    break
+        finally:
+            cancelled = [task for task in tasks if not task.done()]
+            for task in cancelled:
+                task.cancel()
+            await asyncio.gather(*cancelled, return_exceptions=True)
+        logger.debug(
+            f"Used {len(results)} of {len(tasks)} persona requests, cancelled {len(cancelled)}."
         )
-        target_reason_claim = tree.nodes[target_node_id]["claim"]
-        for doc in similiar_docs:
-            if doc.metadata.get("uid") in [target_node_id, root_id]:
-                continue
-            if await are_dialectically_equivalent(
-                arg,
-                doc,
-                target_reason_claim=target_reason_claim,
-                topic=topic,
-                valence=valence,
-            ) and await are_semantically_equivalent(arg, doc, topic=topic):
-                logger.info(
-                    f"Found equivalent node for '{arg.claim}': {doc.metadata.get("uid")} | {doc.page_content[:100]}"
-                )
-                return doc.id
-        return None
+        return results
+
+    @staticmethod
+    def search_similar(
+        vector_store: FAISS, vectors: list[list[float]], k: int = _TOP_K_RETRIEVAL
+    ) -> list[list[tuple[Document, float]]]:
+        """
+        retrieves the k most similar documents for each of the given
+        embedding vectors with a single multi-vector k-NN search,
+        and returns them together with their cosine similarity
+        """
+        query = np.array(vectors, dtype=np.float32)
+        if vector_store._normalize_L2:
+            faiss.normalize_L2(query)
+        _, batched_indices = vector_store.index.search(query, min(k, vector_store.index.ntotal))
+        batched_docs = []
+        for vector, indices in zip(query, batched_indices):
+            docs = []
+            for idx in indices:
+                if idx == -1:
+                    continue
+                doc = vector_store.docstore.search(vector_store.index_to_docstore_id[idx])
+                if isinstance(doc, Document):
+                    neighbor = vector_store.index.reconstruct(int(idx))
+                    norm = float(np.linalg.norm(vector) * np.linalg.norm(neighbor))
+                    similarity = float(np.dot(vector, neighbor)) / norm if norm else 0.0
+                    docs.append((doc, similarity))
+            batched_docs.append(docs)
+        return batched_docs
 
     @logger.catch
-    async def build_subtree(
+    async def expand_node(
         self,
         node_id: str,
         root_id: str,
         tree: nx.DiGraph,
+        vector_store: FAISS,
         degree_config: list,
         tags: list,
         topic: str,
-    ):
+        depth: int | None = None,
+        journal: DebateJournal | None = None,
+    ) -> list[str]:
         """
-        builds the subtree under node_id and adds it to tree
+        generates pros and cons for node_id, adds them to tree and
+        returns the ids of the newly added child nodes (pros first)
 
         args:
 
-            node_id:       root of subtree to build
+            node_id:       node to expand
             root_id:       root of entire argmap
             tree:          entire argmap
+            vector_store:  vector store with all claims in tree, for duplicate detection
             degree_config: list that details number of attacks / supports in function of depth
             tags:          tags for the particular debate currently built
+            depth:         depth of node_id, computed from tree if not provided
+            journal:       journal in which the expansion is recorded
         """
 
-        depth = nx.shortest_path_length(tree, source=node_id, target=root_id)
+        if depth is None:
+            depth = nx.shortest_path_length(tree, source=node_id, target=root_id)
+        if depth >= len(degree_config):
+            return []
         degree = degree_config[depth]  # number if pros / cons to generate
         logger.debug(f"Processing at depth {depth}")
         logger.debug(f"Degree = {degree}")
         logger.debug(f"Target reason claim: {tree.nodes[node_id]['claim'][:40]}")
         if not degree:
-            return
+            return []
 
-        persona_idxs = random.sample(range(len(self.ds_personas)), k=degree)
-        personas: list[str] = self.ds_personas.select(persona_idxs)["input persona"]
+        personas: list[str] = self.persona_pool.sample(degree + self.speculative_personas)
 
         premises = await self.identify_premises(node_id, root_id, tree)
         if not premises:
             logger.warning(
                 f"No premises found for node: {tree.nodes[node_id]['claim']}. Skip building subtree."
             )
-            return
+            return []
 
         batched_input = [
             {
@@ -207,11 +332,20 @@ class DebateBuilder:
             }
             for persona in personas
         ]
+        if self.ranking_mode != "per_persona":
+            ranking = await self.rank_premises(premises, tags, personas)
+            for input_ in batched_input:
+                input_["ranking"] = ranking
 
         # generate 2*n*degree arguments
-        batched_generated_args = await self.chain_generate_pro_and_con.abatch(
-            batched_input
-        )
+        if self.speculative_personas:
+            batched_generated_args = await self.generate_pro_and_con_speculatively(
+                batched_input, min_args=_ARGS_PER_PERSONA * degree
+            )
+        else:
+            batched_generated_args = await self.chain_generate_pro_and_con.abatch(
+                batched_input
+            )
         all_generated_pros = [
             arg for gen_args in batched_generated_args for arg in gen_args["new_pros"]
         ]
@@ -241,41 +375,46 @@ class DebateBuilder:
             )
         )
 
-        # check for and discard duplicates
-        coros_pro = [
-            self.get_equivalent(
-                pro,
-                target_node_id=node_id,
-                root_id=root_id,
-                tree=tree,
-                topic=topic,
-                valence=Valence.PRO,
-            )
-            for pro in salient_pros
+        # check for and discard duplicates, embedding all candidates at once
+        candidates: list[tuple[ArgumentModel, Valence]] = [
+            (pro, Valence.PRO) for pro in salient_pros
+        ] + [(con, Valence.CON) for con in salient_cons]
+        if not candidates:
+            if journal is not None:
+                journal.record_expansion(node_id, premises=premises, nodes=[], edges=[])
+            return []
+        vectors = await self.embeddings.aembed_documents([arg.claim for arg, _ in candidates])
+        batched_neighbors = [
+            [
+                (doc, similarity)
+                for doc, similarity in neighbors
+                if doc.metadata.get("uid") not in [node_id, root_id]
+            ]
+            for neighbors in self.search_similar(vector_store, vectors)
         ]
-        coros_con = [
-            self.get_equivalent(
-                con,
-                target_node_id=node_id,
-                root_id=root_id,
-                tree=tree,
-                topic=topic,
-                valence=Valence.CON,
-            )
-            for con in salient_cons
+        equivalent_docs = await find_equivalents(
+            candidates,
+            batched_neighbors,
+            target_reason_claim=tree.nodes[node_id]["claim"],
+            topic=topic,
+            similarity_threshold=self.similarity_threshold,
+        )
+        equivalent_node_uids = [
+            doc.metadata.get("uid") if doc is not None else None for doc in equivalent_docs
         ]
 
-        for equivalent_node_uid, new_node in zip(
-            await asyncio.gather(*coros_pro, *coros_con),
-            salient_pros.copy() + salient_cons.copy(),
+        # add non-duplicate new nodes and edges to tree,
+        # and link duplicates to their equivalent nodes
+        pro_ids = []
+        con_ids = []
+        new_texts = []
+        new_vectors = []
+        new_metadatas = []
+        new_edges = []
+        for (new_node, valence), vector, equivalent_node_uid in zip(
+            candidates, vectors, equivalent_node_uids
         ):
             if equivalent_node_uid:
-                if new_node in salient_pros:
-                    salient_pros.remove(new_node)
-                    valence = Valence.PRO
-                if new_node in salient_cons:
-                    salient_cons.remove(new_node)
-                    valence = Valence.CON
                 if not tree.has_edge(equivalent_node_uid, node_id):
                     tree.add_edge(
                         equivalent_node_uid,
@@ -283,59 +422,166 @@ class DebateBuilder:
                         valence=valence.value,
                         target_idx=new_node.target_idx,
                     )
-
-        # add remaining non-duplicate new nodes and edges to tree
-        con_ids = []
-        pro_ids = []
-        for new_pro in salient_pros:
+                    new_edges.append((equivalent_node_uid, valence, new_node.target_idx))
+                continue
             uid = str(uuid.uuid4())
             tree.add_node(
                 uid,
-                claim=new_pro.claim,
-                label=new_pro.label,
+                claim=new_node.claim,
+                label=new_node.label,
             )
             tree.add_edge(
-                uid, node_id, valence=Valence.PRO.value, target_idx=new_pro.target_idx
+                uid, node_id, valence=valence.value, target_idx=new_node.target_idx
             )
-            pro_ids.append(uid)
-            self.vector_store.add_documents(
-                [Document(new_pro.claim, metadata={"uid": uid})]
+            new_edges.append((uid, valence, new_node.target_idx))
+            if valence == Valence.PRO:
+                pro_ids.append(uid)
+            else:
+                con_ids.append(uid)
+            new_texts.append(new_node.claim)
+            new_vectors.append(vector)
+            new_metadatas.append({"uid": uid})
+
+        # bulk insert without re-embedding
+        if new_texts:
+            vector_store.add_embeddings(
+                text_embeddings=list(zip(new_texts, new_vectors)),
+                metadatas=new_metadatas,
             )
-        for new_con in salient_cons:
-            uid = str(uuid.uuid4())
-            tree.add_node(
-                uid,
-                claim=new_con.claim,
-                label=new_con.label,
-            )
-            tree.add_edge(
-                uid, node_id, valence=Valence.CON.value, target_idx=new_con.target_idx
-            )
-            con_ids.append(uid)
-            self.vector_store.add_documents(
-                [Document(new_con.claim, metadata={"uid": uid})]
+
+        if journal is not None:
+            journal.record_expansion(
+                node_id,
+                premises=premises,
+                nodes=[
+                    {"uid": metadata["uid"], "claim": tree.nodes[metadata["uid"]]["claim"],
+                     "label": tree.nodes[metadata["uid"]]["label"], "vector": list(vector)}
+                    for metadata, vector in zip(new_metadatas, new_vectors)
+                ],
+                edges=[
+                    {"source": source, "target": node_id, "valence": valence.value, "target_idx": target_idx}
+                    for source, valence, target_idx in new_edges
+                ],
             )
 
+        return pro_ids + con_ids
+
+    async def build_subtree(
+        self,
+        node_id: str,
+        root_id: str,
+        tree: nx.DiGraph,
+        vector_store: FAISS,
+        degree_config: list,
+        tags: list,
+        topic: str,
+        depth: int | None = None,
+        journal: DebateJournal | None = None,
+    ):
+        """
+        builds the subtree under node_id depth-first and adds it to tree,
+        expanding one node at a time
+        """
+        if depth is None:
+            depth = nx.shortest_path_length(tree, source=node_id, target=root_id)
+
+        child_ids = await self.expand_node(
+            node_id=node_id,
+            root_id=root_id,
+            tree=tree,
+            vector_store=vector_store,
+            degree_config=degree_config,
+            tags=tags,
+            topic=topic,
+            depth=depth,
+            journal=journal,
+        )
+
         # recursion
-        for pro_id in pro_ids:
+        for child_id in child_ids or []:
             await self.build_subtree(
-                node_id=pro_id,
+                node_id=child_id,
                 root_id=root_id,
                 tree=tree,
+                vector_store=vector_store,
                 degree_config=degree_config,
                 tags=tags,
                 topic=topic,
+                depth=depth + 1,
+                journal=journal,
             )
 
-        for con_id in con_ids:
-            await self.build_subtree(
-                node_id=con_id,
-                root_id=root_id,
-                tree=tree,
-                degree_config=degree_config,
-                tags=tags,
-                topic=topic,
-            )
+    async def build_subtree_concurrently(
+        self,
+        node_id: str,
+        root_id: str,
+        tree: nx.DiGraph,
+        vector_store: FAISS,
+        degree_config: list,
+        tags: list,
+        topic: str,
+        depth: int | None = None,
+        journal: DebateJournal | None = None,
+    ):
+        """
+        builds the subtree under node_id breadth-first and adds it to tree
+
+        Nodes are expanded by a work queue: as soon as a node has been expanded,
+        its children are scheduled for expansion, so that all frontier nodes are
+        processed concurrently. At most `max_concurrent_expansions` nodes are
+        expanded at the same time. Produces trees of the same shape as `build_subtree`.
+        """
+        if depth is None:
+            depth = nx.shortest_path_length(tree, source=node_id, target=root_id)
+
+        await self.expand_frontier_concurrently(
+            frontier=[(node_id, depth)],
+            root_id=root_id,
+            tree=tree,
+            vector_store=vector_store,
+            degree_config=degree_config,
+            tags=tags,
+            topic=topic,
+            journal=journal,
+        )
+
+    async def expand_frontier_concurrently(
+        self,
+        frontier: list[tuple[str, int]],
+        root_id: str,
+        tree: nx.DiGraph,
+        vector_store: FAISS,
+        degree_config: list,
+        tags: list,
+        topic: str,
+        journal: DebateJournal | None = None,
+    ):
+        """
+        expands the given (node_id, depth) pairs and, recursively, all their
+        descendants with the concurrent work queue of `build_subtree_concurrently`
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent_expansions)
+
+        async with asyncio.TaskGroup() as task_group:
+
+            async def expand(_node_id: str, _depth: int):
+                async with semaphore:
+                    child_ids = await self.expand_node(
+                        node_id=_node_id,
+                        root_id=root_id,
+                        tree=tree,
+                        vector_store=vector_store,
+                        degree_config=degree_config,
+                        tags=tags,
+                        topic=topic,
+                        depth=_depth,
+                        journal=journal,
+                    )
+                for child_id in child_ids or []:
+                    task_group.create_task(expand(child_id, _depth + 1))
+
+            for node_id, depth in frontier:
+                task_group.create_task(expand(node_id, depth))
 
     async def build_debate(
         self,
@@ -343,32 +589,75 @@ class DebateBuilder:
         topic: str,
         tag_cluster,
         degree_config,
+        journal_path: str | Path | None = None,
     ) -> nx.DiGraph:
-        if isinstance(motion, dict):
-            root_claim = motion["claim"]
-            root_label = motion["label"]
+        """
+        builds a debate tree for the given motion
+
+        If a journal_path is given, every node expansion is checkpointed in an
+        append-only journal. If that journal already exists, the debate is
+        resumed from the recorded state rather than started from scratch.
+        """
+        journal = DebateJournal(journal_path) if journal_path is not None else None
+        state = journal.replay() if journal is not None else None
+
+        if state is not None:
+            tree = state.tree
+            root_id = state.root_id
+            vector_store = self.init_vector_store(
+                claims=[tree.nodes[uid]["claim"] for uid in state.vectors],
+                uids=list(state.vectors),
+                vectors=list(state.vectors.values()),
+            )
+            frontier = state.frontier()
         else:
-            root_claim = motion
-            root_label = ""
+            if isinstance(motion, dict):
+                root_claim = motion["claim"]
+                root_label = motion["label"]
+            else:
+                root_claim = motion
+                root_label = ""
 
-        tree = nx.DiGraph()
+            tree = nx.DiGraph()
 
-        root_id = str(uuid.uuid4())
-        tree.add_node(
-            root_id,
-            claim=root_claim,
-            label=root_label,
-        )
-        self.init_vector_store(root_claim=root_claim, root_id=root_id)
+            root_id = str(uuid.uuid4())
+            tree.add_node(
+                root_id,
+                claim=root_claim,
+                label=root_label,
+            )
+            root_vector = (await self.embeddings.aembed_documents([root_claim]))[0]
+            vector_store = self.init_vector_store(
+                claims=[root_claim], uids=[root_id], vectors=[root_vector]
+            )
+            if journal is not None:
+                journal.record_root(root_id, claim=root_claim, label=root_label, vector=list(root_vector))
+            frontier = [(root_id, 0)]
 
-        await self.build_subtree(
-            node_id=root_id,
-            root_id=root_id,
-            tree=tree,
-            degree_config=degree_config,
-            tags=tag_cluster,
-            topic=topic,
-        )
+        if self.expansion_mode == "breadth_first":
+            await self.expand_frontier_concurrently(
+                frontier=frontier,
+                root_id=root_id,
+                tree=tree,
+                vector_store=vector_store,
+                degree_config=degree_config,
+                tags=tag_cluster,
+                topic=topic,
+                journal=journal,
+            )
+        else:
+            for node_id, depth in frontier:
+                await self.build_subtree(
+                    node_id=node_id,
+                    root_id=root_id,
+                    tree=tree,
+                    vector_store=vector_store,
+                    degree_config=degree_config,
+                    tags=tag_cluster,
+                    topic=topic,
+                    depth=depth,
+                    journal=journal,
+                )
 
         return tree
 
@@ -0,0 +1,246 @@
+"""Embeddings for duplicate detection: remote or local backends behind a content-hash keyed cache."""
+
+import asyncio
+from array import array
+from collections import OrderedDict
+import hashlib
+import os
+from pathlib import Path
+import sqlite3
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+_DEFAULT_EMBEDDINGS_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+_DEFAUL_EMBEDDINGS_URL = "https://api-inference.huggingface.co/models/sentence-transformers/all-MiniLM-L6-v2"
+_EMBEDDINGS_BACKENDS = ["api", "local", "onnx"]
+_DEFAULT_MEMORY_CACHE_SIZE = 100_000
+_DEFAULT_DISK_CACHE_SIZE = 1_000_000
+_LOCAL_BATCH_SIZE = 64
+_BATCH_WINDOW = 0.01  # seconds to wait for further concurrent embedding requests
+
+
+def init_embeddings_backend(backend: str = "api", model_name: str = _DEFAULT_EMBEDDINGS_MODEL) -> Embeddings:
+    """
+    creates uncached embeddings for the given backend
+
+    backends:
+
+        api:    Hugging Face inference API (remote)
+        local:  in-process sentence-transformers model (pytorch)
+        onnx:   in-process sentence-transformers model (onnx runtime)
+    """
+    if backend not in _EMBEDDINGS_BACKENDS:
+        raise ValueError(f"Embeddings backend must be one of {_EMBEDDINGS_BACKENDS}.")
+
+    if backend == "api":
+        from langchain_community.embeddings import HuggingFaceInferenceAPIEmbeddings
+
+        return HuggingFaceInferenceAPIEmbeddings(
+            api_key=os.getenv("HUGGINGFACEHUB_API_TOKEN"),
+            model_name=model_name,
+            api_url=os.getenv("SYNCIALO_EMBEDDINGS_URL", _DEFAUL_EMBEDDINGS_URL),
+        )
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    model_kwargs = {"device": "cpu"}
+    if backend == "onnx":
+        model_kwargs["backend"] = "onnx"
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs=model_kwargs,
+        encode_kwargs={"batch_size": _LOCAL_BATCH_SIZE, "normalize_embeddings": True},
+    )
+
+
+class _DiskCache:
+    """Size-bounded SQLite store of embedding vectors, evicting least recently used entries."""
+
+    def __init__(self, path: str | Path, max_size: int):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB, accessed REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed)")
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", keys
+            ).fetchall()
+            if rows:
+                self._conn.execute(
+                    f"UPDATE embeddings SET accessed = ? WHERE key IN ({','.join('?' * len(rows))})",
+                    [time.time()] + [key for key, _ in rows],
+                )
+        return {key: array("f", vector).tolist() for key, vector in rows}
+
+    def set_many(self, items: dict[str, list[float]]):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, accessed) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items.items()],
+            )
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if size > self.max_size:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY accessed LIMIT ?)",
+                    (size - self.max_size,),
+                )
+            self._conn.execute("COMMIT")
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings that look up vectors in a cache before calling the underlying backend.
+
+    Cache keys are content hashes of (namespace, text). Vectors are kept in a
+    size-bounded in-memory LRU cache and, if `cache_path` is given, in a
+    size-bounded on-disk SQLite cache that can be shared between runs.
+    Cache misses are embedded in one batched backend call; concurrent async
+    calls are coalesced into a single batch.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        namespace: str = "",
+        cache_path: str | Path | None = None,
+        max_memory_items: int = _DEFAULT_MEMORY_CACHE_SIZE,
+        max_disk_items: int = _DEFAULT_DISK_CACHE_SIZE,
+    ):
+        self.underlying = underlying
+        self.namespace = namespace
+        self.max_memory_items = max_memory_items
+        self._memory: OrderedDict[str, list[float]] = OrderedDict()
+        self._disk = _DiskCache(cache_path, max_disk_items) if cache_path else None
+        self._pending: dict[str, asyncio.Future] = {}
+        self._batch: dict[str, str] = {}
+        self._flush_task: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: list[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys: list[str]) -> dict[str, list[float]]:
+        found = {}
+        for key in keys:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                found[key] = self._memory[key]
+        if self._disk is not None:
+            from_disk = self._disk.get_many([key for key in keys if key not in found])
+            for key, vector in from_disk.items():
+                self._remember(key, vector)
+            found.update(from_disk)
+        return found
+
+    def _store(self, items: dict[str, list[float]]):
+        for key, vector in items.items():
+            self._remember(key, vector)
+        if self._disk is not None:
+            self._disk.set_many(items)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(list(set(keys)))
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def _flush(self):
+        await asyncio.sleep(_BATCH_WINDOW)
+        batch, self._batch, self._flush_task = self._batch, {}, None
+        try:
+            vectors = await self.underlying.aembed_documents(list(batch.values()))
+            computed = dict(zip(batch.keys(), vectors))
+            self._store(computed)
+        except Exception as e:
+            logger.error(f"Failed to embed batch of {len(batch)} texts: {e}")
+            computed, error = {}, e
+        else:
+            error = ValueError("Embeddings backend returned fewer vectors than texts.")
+        for key in batch:
+            future = self._pending.pop(key, None)
+            if future is None or future.done():
+                continue
+            if key in computed:
+                future.set_result(computed[key])
+            else:
+                future.set_exception(error)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(list(set(keys)))
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        for key, text in missing.items():
+            if key not in self._pending:
+                self._pending[key] = asyncio.get_running_loop().create_future()
+                self._batch[key] = text
+        if self._batch and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush())
+        if missing:
+            # pending futures are shared with concurrent callers, which must not
+            # be affected if this caller is cancelled
+            vectors = await asyncio.gather(*[asyncio.shield(self._pending[key]) for key in missing])
+            found.update(zip(missing.keys(), vectors))
+        return [found[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+def get_embeddings(
+    backend: str | None = None,
+    model_name: str | None = None,
+    cache_path: str | Path | None = None,
+) -> CachedEmbeddings:
+    """
+    creates cached embeddings for duplicate detection
+
+    Defaults are read from the environment variables SYNCIALO_EMBEDDINGS_BACKEND,
+    SYNCIALO_EMBEDDINGS_MODEL, SYNCIALO_EMBEDDINGS_CACHE and SYNCIALO_EMBEDDINGS_CACHE_SIZE.
+    """
+    backend = backend or os.getenv("SYNCIALO_EMBEDDINGS_BACKEND", "api")
+    model_name = model_name or os.getenv("SYNCIALO_EMBEDDINGS_MODEL", _DEFAULT_EMBEDDINGS_MODEL)
+    cache_path = cache_path or os.getenv("SYNCIALO_EMBEDDINGS_CACHE")
+    logger.debug(f"Initializing {backend} embeddings backend for {model_name}.")
+    return CachedEmbeddings(
+        init_embeddings_backend(backend=backend, model_name=model_name),
+        namespace=f"{backend}/{model_name}",
+        cache_path=cache_path,
+        max_disk_items=int(os.getenv("SYNCIALO_EMBEDDINGS_CACHE_SIZE", _DEFAULT_DISK_CACHE_SIZE)),
+    )
@@ -0,0 +1,137 @@
+"""Crash-safe, lease-based task ledger shared by several worker processes."""
+
+from collections.abc import Iterable
+import os
+from pathlib import Path
+import socket
+import sqlite3
+import time
+import uuid
+
+from loguru import logger
+
+_LEASE_DURATION = 600.0  # seconds
+_MAX_ATTEMPTS = 3
+_BUSY_TIMEOUT = 60.0  # seconds
+
+
+class TaskLedger:
+    """
+    Task ledger stored in a SQLite file, e.g. in the corpus directory.
+
+    Workers (processes, possibly on several hosts sharing a filesystem) claim
+    pending tasks, which grants them a time-limited lease. A worker renews the
+    leases of its tasks while working on them, and marks them as done on
+    completion. Leases of crashed workers expire, and their tasks are handed out
+    again. A task that fails (or whose lease expires) `max_attempts` times is
+    marked as failed.
+
+    All state transitions are single SQLite transactions. Note that SQLite
+    relies on file locks, which must be supported by the shared filesystem.
+
+    Task states: pending -> leased -> done | pending | failed
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        lease_duration: float = _LEASE_DURATION,
+        max_attempts: int = _MAX_ATTEMPTS,
+        worker_id: str | None = None,
+    ):
+        self.path = Path(path)
+        self.lease_duration = lease_duration
+        self.max_attempts = max_attempts
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._conn = sqlite3.connect(str(path), timeout=_BUSY_TIMEOUT, isolation_level=None)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "task_id TEXT PRIMARY KEY, status TEXT NOT NULL DEFAULT 'pending', "
+            "owner TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "updated REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status)")
+
+    def close(self):
+        self._conn.close()
+
+    def add_tasks(self, task_ids: Iterable[str]):
+        """adds new pending tasks, ignoring tasks already in the ledger"""
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO tasks (task_id, updated) VALUES (?, ?)",
+            [(task_id, now) for task_id in task_ids],
+        )
+        self._conn.execute("COMMIT")
+
+    def claim(self) -> str | None:
+        """leases next pending (or expired) task, returns None if there is none"""
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        # expired leases count as failed attempts, e.g. of a task that keeps crashing its workers
+        cursor = self._conn.execute(
+            "UPDATE tasks SET status = 'failed', owner = NULL, lease_expires = NULL, updated = ? "
+            "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+            (now, now, self.max_attempts),
+        )
+        if cursor.rowcount:
+            logger.warning(f"Marked {cursor.rowcount} task(s) as failed after {self.max_attempts} expired leases.")
+        row = self._conn.execute(
+            "SELECT task_id FROM tasks WHERE status = 'pending' "
+            "OR (status = 'leased' AND lease_expires < ?) "
+            "ORDER BY attempts, task_id LIMIT 1",
+            (now,),
+        ).fetchone()
+        if row is None:
+            self._conn.execute("COMMIT")
+            return None
+        self._conn.execute(
+            "UPDATE tasks SET status = 'leased', owner = ?, lease_expires = ?, "
+            "attempts = attempts + 1, updated = ? WHERE task_id = ?",
+            (self.worker_id, now + self.lease_duration, now, row[0]),
+        )
+        self._conn.execute("COMMIT")
+        logger.debug(f"Worker {self.worker_id} claimed task {row[0]}.")
+        return row[0]
+
+    def _update_own(self, task_id: str, sql: str, params: tuple) -> bool:
+        self._conn.execute("BEGIN IMMEDIATE")
+        cursor = self._conn.execute(
+            sql + " WHERE task_id = ? AND owner = ? AND status = 'leased'",
+            params + (task_id, self.worker_id),
+        )
+        self._conn.execute("COMMIT")
+        return cursor.rowcount == 1
+
+    def renew(self, task_id: str) -> bool:
+        """extends lease on task, returns False if the lease has been lost"""
+        now = time.time()
+        return self._update_own(
+            task_id, "UPDATE tasks SET lease_expires = ?, updated = ?", (now + self.lease_duration, now)
+        )
+
+    def holds_lease(self, task_id: str) -> bool:
+        row = self._conn.execute(
+            "SELECT owner, status, lease_expires FROM tasks WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        return row is not None and row[0] == self.worker_id and row[1] == "leased" and row[2] >= time.time()
+
+    def complete(self, task_id: str) -> bool:
+        """marks task as done, returns False if the lease has been lost"""
+        return self._update_own(
+            task_id, "UPDATE tasks SET status = 'done', lease_expires = NULL, updated = ?", (time.time(),)
+        )
+
+    def release(self, task_id: str, failed: bool = False) -> bool:
+        """gives up lease on task, e.g. after an error, so that it can be retried"""
+        row = self._conn.execute("SELECT attempts FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        status = "failed" if failed and row is not None and row[0] >= self.max_attempts else "pending"
+        return self._update_own(
+            task_id,
+            "UPDATE tasks SET status = ?, owner = NULL, lease_expires = NULL, updated = ?",
+            (status, time.time()),
+        )
+
+    def counts(self) -> dict[str, int]:
+        return dict(self._conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
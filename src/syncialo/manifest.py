@@ -0,0 +1,186 @@
+"""Corpus manifest: index of the debates of a corpus and their pipeline stages."""
+
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+import hashlib
+import os
+from pathlib import Path
+import sqlite3
+import time
+
+import ujson
+import yaml
+
+MANIFEST_FILE = "manifest.sqlite"
+SPLITS = ["train", "eval", "test"]
+
+# pipeline stages of a debate, in order:
+# config (split and degree config) -> topic (tags and topic) -> motion -> debate (graph file written)
+STAGES = ["config", "topic", "motion", "debate"]
+
+_BUSY_TIMEOUT = 60.0  # seconds
+_COLUMNS = "path, stage, config, graph_file, graph_hash"
+
+
+def debate_stage(config: dict, graph_file: str | None = None) -> str:
+    """last completed pipeline stage of a debate"""
+    if graph_file:
+        return "debate"
+    if config.get("motion"):
+        return "motion"
+    if config.get("topic"):
+        return "topic"
+    return "config"
+
+
+def file_hash(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+def scan_corpus(corpus_path: Path, hash_graphs: bool = False) -> Iterator[dict]:
+    """
+    walks the split directories of a corpus lazily and yields one record per
+    debate directory with config file; graph files are only opened if `hash_graphs`
+    """
+    for split in SPLITS:
+        split_path = corpus_path / split
+        if not split_path.is_dir():
+            continue
+        for name in sorted(os.listdir(split_path)):
+            debate_path = split_path / name
+            config_path = debate_path / "config.yaml"
+            if not config_path.exists():
+                continue
+            graph_files = sorted(p.name for p in debate_path.glob("node_link_data-*.json"))
+            graph_file = graph_files[0] if graph_files else None
+            yield {
+                "path": str(debate_path.relative_to(corpus_path)),
+                "config": yaml.safe_load(config_path.read_text()),
+                "graph_file": graph_file,
+                "graph_hash": file_hash(debate_path / graph_file) if graph_file and hash_graphs else None,
+            }
+
+
+class CorpusManifest:
+    """
+    Manifest of a corpus stored in a SQLite file at the corpus root.
+
+    Records every debate's config, last completed pipeline stage (see `STAGES`),
+    and the name and sha1 hash of its graph file. Debates are identified by
+    their directory relative to the corpus root. Pipeline steps query the debates
+    in a given stage instead of walking and parsing all config files, and update
+    a debate's record (in a single transaction) after having written its files.
+
+    Config files and graph files remain the primary data; `sync` rebuilds the
+    manifest from them.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._conn = sqlite3.connect(str(path), timeout=_BUSY_TIMEOUT, isolation_level=None)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS debates ("
+            "path TEXT PRIMARY KEY, split TEXT NOT NULL, debate_uid TEXT NOT NULL, "
+            "stage TEXT NOT NULL, config TEXT NOT NULL, graph_file TEXT, graph_hash TEXT, "
+            "updated REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS debates_split_stage ON debates (split, stage)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS debates_stage ON debates (stage)")
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self) -> "CorpusManifest":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def _row(record: dict, now: float) -> tuple:
+        config = record["config"]
+        return (
+            record["path"],
+            config["split"],
+            config["debate_uid"],
+            debate_stage(config, record.get("graph_file")),
+            ujson.encode(config, ensure_ascii=False),
+            record.get("graph_file"),
+            record.get("graph_hash"),
+            now,
+        )
+
+    def _insert(self, records: Iterable[dict]):
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO debates "
+            "(path, split, debate_uid, stage, config, graph_file, graph_hash, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (self._row(record, now) for record in records),
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def put_many(self, records: Iterable[dict]):
+        """adds or replaces records of debates (keys: path, config, and optionally graph_file, graph_hash)"""
+        with self._transaction():
+            self._insert(records)
+
+    def put(self, path: str, config: dict, graph_file: str | None = None, graph_hash: str | None = None):
+        """adds or replaces the record of one debate, its stage follows from config and graph file"""
+        self.put_many([{"path": path, "config": config, "graph_file": graph_file, "graph_hash": graph_hash}])
+
+    def sync(self, corpus_path: str | Path):
+        """rebuilds the manifest from the corpus' config and graph files"""
+        records = list(scan_corpus(Path(corpus_path), hash_graphs=True))
+        # a single transaction, so that a failed sync leaves the previous manifest intact
+        with self._transaction():
+            self._conn.execute("DELETE FROM debates")
+            self._insert(records)
+
+    def records(self, split: str | list[str] | None = None, stage: str | list[str] | None = None) -> list[dict]:
+        """records of debates in the given splits and stages, ordered by path"""
+        clauses, params = [], []
+        for column, values in (("split", split), ("stage", stage)):
+            if values is None:
+                continue
+            values = [values] if isinstance(values, str) else list(values)
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn.execute(f"SELECT {_COLUMNS} FROM debates{where} ORDER BY path", params).fetchall()
+        return [self._record(row) for row in rows]
+
+    def get(self, path: str) -> dict | None:
+        """record of the debate in directory `path` (relative to the corpus root)"""
+        row = self._conn.execute(f"SELECT {_COLUMNS} FROM debates WHERE path = ?", (path,)).fetchone()
+        return self._record(row) if row is not None else None
+
+    @staticmethod
+    def _record(row: tuple) -> dict:
+        path, stage, config, graph_file, graph_hash = row
+        return {
+            "path": path,
+            "stage": stage,
+            "config": ujson.decode(config),
+            "graph_file": graph_file,
+            "graph_hash": graph_hash,
+        }
+
+    def counts(self, split: str | None = None) -> dict[str, int]:
+        """number of debates per stage"""
+        if split is None:
+            rows = self._conn.execute("SELECT stage, COUNT(*) FROM debates GROUP BY stage").fetchall()
+        else:
+            rows = self._conn.execute(
+                "SELECT stage, COUNT(*) FROM debates WHERE split = ? GROUP BY stage", (split,)
+            ).fetchall()
+        return dict(rows)
@@ -0,0 +1,113 @@
+"""Compact, in-memory pool of personas for fast sampling."""
+
+from array import array
+from collections.abc import Iterable
+import mmap
+import os
+from pathlib import Path
+import random
+
+from loguru import logger
+
+_MAGIC = b"SYNCPERS"
+_HEADER_SIZE = len(_MAGIC) + 8
+_PERSONA_COLUMN = "input persona"
+_ITER_BATCH_SIZE = 10_000
+
+
+class PersonaPool:
+    """
+    Pool of persona descriptions stored as one utf-8 blob plus an offsets table.
+
+    Sampling k personas costs O(k) and does not touch the Hugging Face
+    `datasets` machinery. A pool can be saved to and memory-mapped from a
+    single cache file:
+
+        magic (8 bytes) | count n (uint64) | n+1 offsets (uint64) | blob
+
+    Integers are stored in native byte order.
+    """
+
+    def __init__(self, offsets: array | memoryview, blob: bytes | mmap.mmap):
+        if len(offsets) == 0:
+            raise ValueError("Persona pool requires at least one offset.")
+        self._offsets = offsets
+        self._blob = blob
+        self._mmap: mmap.mmap | None = None
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, idx: int) -> str:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("Persona index out of range.")
+        return str(self._blob[self._offsets[idx]:self._offsets[idx + 1]], "utf-8")
+
+    def sample(self, k: int) -> list[str]:
+        """samples k distinct personas"""
+        return [self[idx] for idx in random.sample(range(len(self)), k=k)]
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str]) -> "PersonaPool":
+        offsets = array("Q", [0])
+        blob = bytearray()
+        for text in texts:
+            blob += text.encode("utf-8")
+            offsets.append(len(blob))
+        return cls(offsets, bytes(blob))
+
+    @classmethod
+    def from_dataset(cls, column: str = _PERSONA_COLUMN, **dataset_kwargs) -> "PersonaPool":
+        """loads persona column from a Hugging Face dataset (e.g. PersonaHub)"""
+        import datasets
+
+        ds = datasets.load_dataset(**dataset_kwargs).select_columns([column])
+        return cls.from_texts(
+            text for batch in ds.iter(batch_size=_ITER_BATCH_SIZE) for text in batch[column]
+        )
+
+    def save(self, path: str | Path):
+        """writes pool to cache file (atomically)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + f".tmp-{os.getpid()}")
+        with open(tmp_path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(array("Q", [len(self)]).tobytes())
+            f.write(array("Q", self._offsets).tobytes())
+            f.write(self._blob[:self._offsets[-1]])
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "PersonaPool":
+        """memory-maps pool from cache file"""
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if buffer[:len(_MAGIC)] != _MAGIC:
+            buffer.close()
+            raise ValueError(f"Not a persona pool cache file: {path}")
+        view = memoryview(buffer)
+        count = view[len(_MAGIC):_HEADER_SIZE].cast("Q")[0]
+        offsets_end = _HEADER_SIZE + 8 * (count + 1)
+        offsets = view[_HEADER_SIZE:offsets_end].cast("Q")
+        pool = cls(offsets, view[offsets_end:])
+        pool._mmap = buffer
+        return pool
+
+    @classmethod
+    def load_or_create(cls, cache_path: str | Path | None = None, **dataset_kwargs) -> "PersonaPool":
+        """
+        loads pool from cache_path if it exists, otherwise from the dataset;
+        in the latter case, writes cache file if cache_path is given
+        """
+        if cache_path is not None and Path(cache_path).exists():
+            logger.debug(f"Loading personas from cache {cache_path}.")
+            return cls.load(cache_path)
+        logger.debug(f"Loading personas from dataset {dataset_kwargs}.")
+        pool = cls.from_dataset(**dataset_kwargs)
+        if cache_path is not None:
+            pool.save(cache_path)
+            logger.debug(f"Saved {len(pool)} personas to cache {cache_path}.")
+        return pool
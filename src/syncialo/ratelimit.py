@@ -0,0 +1,339 @@
+"""Rate limiting and adaptive concurrency control for inference endpoints."""
+
+import asyncio
+from collections import Counter, deque
+import contextlib
+import hashlib
+import random
+import time
+from typing import Any
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+from loguru import logger
+
+_INITIAL_CONCURRENCY = 8
+_MIN_CONCURRENCY = 1
+_MAX_CONCURRENCY = 64
+_DECREASE_FACTOR = 0.5  # multiplicative decrease on overload
+_LATENCY_SMOOTHING = 0.1  # weight of latest request in latency moving average
+_MAX_RETRIES = 5  # retries of requests that failed due to overload
+_BACKOFF_BASE = 1.0  # seconds, doubled with every retry (with full jitter)
+_MAX_BACKOFF = 60.0  # seconds
+_CHARS_PER_TOKEN = 4  # rough estimate for budgeting prompt tokens
+_OVERLOAD_STATUS = {429, 500, 502, 503, 504}
+_PREFIX_CHARS = 1024  # leading prompt characters that identify a shared prompt prefix
+_PREFIX_LOOKAHEAD = 16  # number of queued requests searched for one with an in-flight prefix
+
+
+class EndpointOverloadedError(Exception):
+    """Raised when an endpoint signals overload (429/5xx)"""
+
+    def __init__(self, msg: str, status: int | None = None, retry_after: float | None = None):
+        super().__init__(msg)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Token bucket that refills at `rate` units per second up to `capacity`.
+
+    Callers acquire units before sending a request. A bucket may go into debt
+    (e.g., if a request consumed more tokens than estimated), which delays
+    subsequent acquisitions accordingly.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        # requests larger than the bucket may never fit, so we only wait until it's full
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self._level >= amount:
+                self._level -= amount
+                return
+            await asyncio.sleep((amount - self._level) / self.rate)
+
+    def debit(self, amount: float):
+        """consumes units without waiting, possibly going into debt"""
+        self._refill()
+        self._level -= amount
+
+
+class EndpointLimiter:
+    """
+    Shared limiter for one inference endpoint.
+
+    Combines optional requests/s and tokens/s budgets (token buckets) with an
+    AIMD concurrency controller: The concurrency limit grows additively while
+    requests succeed, and shrinks multiplicatively when the endpoint signals
+    overload (429/5xx or timeout). Raw latency is no signal of overload, as it
+    mostly varies with prompt and completion lengths and prefix cache hits; it
+    only paces decreases. A `Retry-After` signal pauses all new requests to the
+    endpoint, so that retries don't hit the server all at once.
+
+    Queued requests that share their prompt prefix with a request in flight are
+    admitted first (looking ahead `_PREFIX_LOOKAHEAD` requests), so that the
+    server can reuse the cached prefix.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_second: float | None = None,
+        tokens_per_second: float | None = None,
+        initial_concurrency: int = _INITIAL_CONCURRENCY,
+        min_concurrency: int = _MIN_CONCURRENCY,
+        max_concurrency: int = _MAX_CONCURRENCY,
+    ):
+        self.name = name
+        self.request_bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        self.token_bucket = TokenBucket(tokens_per_second) if tokens_per_second else None
+        self.limit = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.stats = {"requests": 0, "overloads": 0, "decreases": 0}
+        self._latency: float | None = None
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._waiters: deque[tuple[asyncio.Future, str | None]] = deque()
+        self._prefixes_in_flight: Counter = Counter()
+
+    def _next_waiter(self) -> int:
+        for i, (_, prefix) in enumerate(self._waiters):
+            if i >= _PREFIX_LOOKAHEAD:
+                break
+            if prefix is not None and self._prefixes_in_flight[prefix]:
+                return i
+        return 0
+
+    def _wake_waiters(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            i = self._next_waiter()
+            waiter, prefix = self._waiters[i]
+            del self._waiters[i]
+            if not waiter.done():
+                waiter.set_result(None)
+                self.in_flight += 1
+                self._prefixes_in_flight[prefix] += 1
+
+    async def _acquire_slot(self, prefix: str | None = None):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self._prefixes_in_flight[prefix] += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append((waiter, prefix))
+        self._wake_waiters()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # slot was granted concurrently, hand it on
+                self._release_slot(prefix)
+            else:
+                with contextlib.suppress(ValueError):
+                    self._waiters.remove((waiter, prefix))
+            raise
+
+    def _release_slot(self, prefix: str | None = None):
+        self.in_flight -= 1
+        self._prefixes_in_flight[prefix] -= 1
+        if not self._prefixes_in_flight[prefix]:
+            del self._prefixes_in_flight[prefix]
+        self._wake_waiters()
+
+    def _decrease(self, factor: float):
+        # in-flight requests tend to fail (or slow down) together, so we
+        # decrease at most once per (average) latency
+        now = time.monotonic()
+        if now - self._last_decrease < (self._latency or 1.0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_concurrency, self.limit * factor)
+        self.stats["decreases"] += 1
+        logger.debug(f"Endpoint {self.name}: reducing concurrency to {self.limit:.1f}.")
+
+    def record_success(self, latency: float):
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency += _LATENCY_SMOOTHING * (latency - self._latency)
+        self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+        self._wake_waiters()
+
+    def record_overload(self, retry_after: float | None = None):
+        self.stats["overloads"] += 1
+        self._decrease(_DECREASE_FACTOR)
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            logger.debug(f"Endpoint {self.name}: pausing for {retry_after}s.")
+
+    @contextlib.asynccontextmanager
+    async def slot(self, tokens: float = 0.0, prefix: str | None = None):
+        """
+        waits for a request slot (within budgets and concurrency limit), and records
+        latency and overload signals of the request made within the context
+
+        `prefix` identifies the request's prompt prefix (see `prefix_key`).
+        """
+        while (pause := self._paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(pause)
+        if self.request_bucket is not None:
+            await self.request_bucket.acquire(1)
+        if self.token_bucket is not None and tokens:
+            await self.token_bucket.acquire(tokens)
+        await self._acquire_slot(prefix)
+        self.stats["requests"] += 1
+        start = time.monotonic()
+        try:
+            yield self
+        except Exception as e:
+            if overload_status(e) is not None:
+                self.record_overload(retry_after_from(e))
+            raise
+        else:
+            self.record_success(time.monotonic() - start)
+        finally:
+            self._release_slot(prefix)
+
+    def debit_tokens(self, tokens: float):
+        """accounts for tokens used beyond the estimate passed to `slot`"""
+        if self.token_bucket is not None and tokens > 0:
+            self.token_bucket.debit(tokens)
+
+
+def overload_status(error: Exception) -> int | None:
+    """returns status code if error signals an overloaded endpoint"""
+    if isinstance(error, EndpointOverloadedError):
+        return error.status or 503
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if status in _OVERLOAD_STATUS:
+        return status
+    if isinstance(error, asyncio.TimeoutError) or type(error).__name__ == "APITimeoutError":
+        return 504
+    return None
+
+
+def retry_after_from(error: Exception) -> float | None:
+    """returns delay requested by endpoint (via `Retry-After`), if any"""
+    if isinstance(error, EndpointOverloadedError):
+        return error.retry_after
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+_limiters: dict[str, EndpointLimiter] = {}
+
+
+def configure_endpoint_limiter(endpoint: str, **kwargs) -> EndpointLimiter:
+    """(re-)configures the limiter shared by all clients of endpoint, see `EndpointLimiter`"""
+    _limiters[endpoint] = EndpointLimiter(name=endpoint, **kwargs)
+    return _limiters[endpoint]
+
+
+def get_endpoint_limiter(endpoint: str) -> EndpointLimiter:
+    """returns the limiter shared by all clients of endpoint, creating a default one if needed"""
+    if endpoint not in _limiters:
+        _limiters[endpoint] = EndpointLimiter(name=endpoint)
+    return _limiters[endpoint]
+
+
+def prefix_key(messages: list[BaseMessage]) -> str:
+    """returns a stable hash of the leading characters of a prompt, which identifies
+    requests that may share a server-side prefix (KV) cache"""
+    text = "".join(
+        f"{m.type}: {m.content if isinstance(m.content, str) else str(m.content)}\n" for m in messages
+    )
+    return hashlib.sha1(text[:_PREFIX_CHARS].encode("utf-8")).hexdigest()
+
+
+def _estimate_tokens(messages: list[BaseMessage], max_tokens: int | None) -> float:
+    chars = sum(len(m.content) if isinstance(m.content, str) else len(str(m.content)) for m in messages)
+    return chars / _CHARS_PER_TOKEN + (max_tokens or 0)
+
+
+class RateLimitedChatModel(BaseChatModel):
+    """
+    Chat model that sends all (async) requests of the wrapped model through the
+    shared `EndpointLimiter` of its endpoint.
+
+    Token budgets are charged with an estimate (prompt length plus `max_tokens`)
+    before the request, and corrected with the actual usage afterwards.
+    Requests that fail due to overload are retried up to `max_retries` times,
+    after a jittered exponential backoff (or the endpoint's `Retry-After` pause),
+    and again through the limiter, so that it sees every overload signal. The
+    wrapped model should hence not retry by itself (e.g. `ChatOpenAI(max_retries=0)`).
+    Synchronous calls are passed through without limiting.
+    """
+
+    model: BaseChatModel
+    endpoint: str
+    max_retries: int = _MAX_RETRIES
+
+    @property
+    def limiter(self) -> EndpointLimiter:
+        return get_endpoint_limiter(self.endpoint)
+
+    @property
+    def _llm_type(self) -> str:
+        return self.model._llm_type
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return self.model._identifying_params
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return self.model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        max_tokens = kwargs.get("max_tokens", getattr(self.model, "max_tokens", None))
+        estimate = _estimate_tokens(messages, max_tokens)
+        limiter = self.limiter
+        prefix = prefix_key(messages)
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with limiter.slot(tokens=estimate, prefix=prefix):
+                    result = await self.model._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                break
+            except Exception as e:
+                if overload_status(e) is None or attempt == self.max_retries:
+                    raise
+                # with Retry-After, the limiter pauses the endpoint itself
+                if retry_after_from(e) is None:
+                    await asyncio.sleep(random.uniform(0, min(_MAX_BACKOFF, _BACKOFF_BASE * 2**attempt)))
+                logger.debug(f"Endpoint {self.endpoint} overloaded, retry {attempt + 1} of {self.max_retries}.")
+        usage = (result.llm_output or {}).get("token_usage") or {}
+        if usage.get("total_tokens"):
+            limiter.debit_tokens(usage["total_tokens"] - estimate)
+        return result
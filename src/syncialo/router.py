@@ -0,0 +1,193 @@
+"""Load balancing of chat model requests over several identical endpoints."""
+
+import hashlib
+import random
+import time
+from typing import Any, Literal
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+from loguru import logger
+from pydantic import PrivateAttr
+
+from syncialo.ratelimit import overload_status, prefix_key
+
+_COOLDOWN = 30.0  # seconds an endpoint is taken out of rotation after a failure
+_MAX_COOLDOWN = 600.0
+_LATENCY_SMOOTHING = 0.2  # weight of latest request in latency moving average
+_AFFINITY_SLACK = 4  # extra outstanding requests tolerated on an endpoint to keep prefix affinity
+
+
+class EndpointState:
+    """Health and load of one endpoint, as observed by the router"""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.outstanding = 0
+        self.latency: float | None = None
+        self.failures = 0  # consecutive failures
+        self.unhealthy_until = 0.0
+        self.requests = 0
+
+    def healthy(self, now: float) -> bool:
+        return self.unhealthy_until <= now
+
+    def record_success(self, latency: float):
+        self.failures = 0
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += _LATENCY_SMOOTHING * (latency - self.latency)
+
+    def record_failure(self, cooldown: float):
+        self.failures += 1
+        self.unhealthy_until = time.monotonic() + min(_MAX_COOLDOWN, cooldown * 2 ** (self.failures - 1))
+        logger.warning(
+            f"Taking endpoint {self.endpoint} out of rotation for "
+            f"{self.unhealthy_until - time.monotonic():.0f}s ({self.failures} consecutive failures)."
+        )
+
+
+def _is_endpoint_failure(error: Exception) -> bool:
+    # overloaded, timed out or unreachable endpoints; other errors (e.g. bad requests)
+    # would fail on any endpoint
+    return overload_status(error) is not None or type(error).__name__ in (
+        "APIConnectionError",
+        "ConnectError",
+        "ClientConnectionError",
+    )
+
+
+class ChatModelRouter(BaseChatModel):
+    """
+    Chat model that spreads requests over several identical models (endpoints).
+
+    Each request goes to the healthy endpoint with the fewest outstanding requests
+    (strategy "least_outstanding") or with the lowest expected latency given its
+    current load (strategy "latency"). With strategy "prefix_affinity", requests that
+    share a prompt prefix go to the same endpoint (rendezvous hashing), so that its
+    prefix cache can be reused, unless that endpoint has `_AFFINITY_SLACK` more
+    outstanding requests than the least loaded one. An endpoint that fails with an overload,
+    timeout or connection error is taken out of rotation for `cooldown` seconds
+    (doubling with consecutive failures), and the request is retried on another
+    endpoint.
+    """
+
+    models: list[BaseChatModel]
+    endpoints: list[str]
+    strategy: Literal["least_outstanding", "latency", "prefix_affinity"] = "least_outstanding"
+    cooldown: float = _COOLDOWN
+
+    # shared by all copies of the router (e.g., with bound parameters)
+    _states: list[EndpointState] = PrivateAttr(default_factory=list)
+
+    def model_post_init(self, __context: Any):
+        if len(self.models) != len(self.endpoints):
+            raise ValueError("Router needs exactly one endpoint name per model.")
+        if not self.models:
+            raise ValueError("Router needs at least one model.")
+        self._states = [EndpointState(endpoint) for endpoint in self.endpoints]
+
+    @property
+    def states(self) -> list[EndpointState]:
+        return self._states
+
+    @property
+    def _llm_type(self) -> str:
+        return self.models[0]._llm_type
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return self.models[0]._identifying_params
+
+    def _load(self, state: EndpointState) -> tuple:
+        if self.strategy == "latency" and state.latency is not None:
+            return ((state.outstanding + 1) * state.latency, state.outstanding)
+        # endpoints without latency measurements are tried first
+        return (state.outstanding, state.latency or 0.0)
+
+    def _affinity(self, prefix: str, idx: int) -> str:
+        return hashlib.sha1(f"{prefix}{self.endpoints[idx]}".encode("utf-8")).hexdigest()
+
+    def select(self, exclude: set[int] | None = None, prefix: str | None = None) -> int:
+        """returns index of endpoint the next request (with prompt prefix key `prefix`) is sent to"""
+        now = time.monotonic()
+        candidates = [i for i in range(len(self.models)) if not exclude or i not in exclude]
+        if not candidates:
+            candidates = list(range(len(self.models)))
+        healthy = [i for i in candidates if self._states[i].healthy(now)]
+        if not healthy:
+            # all endpoints are cooling down, try the one that recovers first
+            return min(candidates, key=lambda i: self._states[i].unhealthy_until)
+        if self.strategy == "prefix_affinity" and prefix is not None:
+            preferred = max(healthy, key=lambda i: self._affinity(prefix, i))
+            least_outstanding = min(self._states[i].outstanding for i in healthy)
+            if self._states[preferred].outstanding <= least_outstanding + _AFFINITY_SLACK:
+                return preferred
+        # shuffle to break ties randomly
+        random.shuffle(healthy)
+        return min(healthy, key=lambda i: self._load(self._states[i]))
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tried: set[int] = set()
+        prefix = prefix_key(messages) if self.strategy == "prefix_affinity" else None
+        while True:
+            idx = self.select(exclude=tried, prefix=prefix)
+            state = self._states[idx]
+            state.outstanding += 1
+            state.requests += 1
+            start = time.monotonic()
+            try:
+                result = self.models[idx]._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except Exception as e:
+                if not _is_endpoint_failure(e):
+                    raise
+                state.record_failure(self.cooldown)
+                tried.add(idx)
+                if len(tried) >= len(self.models):
+                    raise
+                continue
+            finally:
+                state.outstanding -= 1
+            state.record_success(time.monotonic() - start)
+            return result
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tried: set[int] = set()
+        prefix = prefix_key(messages) if self.strategy == "prefix_affinity" else None
+        while True:
+            idx = self.select(exclude=tried, prefix=prefix)
+            state = self._states[idx]
+            state.outstanding += 1
+            state.requests += 1
+            start = time.monotonic()
+            try:
+                result = await self.models[idx]._agenerate(
+                    messages, stop=stop, run_manager=run_manager, **kwargs
+                )
+            except Exception as e:
+                if not _is_endpoint_failure(e):
+                    raise
+                state.record_failure(self.cooldown)
+                tried.add(idx)
+                if len(tried) >= len(self.models):
+                    raise
+                continue
+            finally:
+                state.outstanding -= 1
+            state.record_success(time.monotonic() - start)
+            return result
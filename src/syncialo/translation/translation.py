@@ -1,3 +1,5 @@
+import asyncio
+from collections import deque
 import enum
 import json
 
@@ -8,6 +10,9 @@ from pydantic import BaseModel
 import tenacity
 
 
+_MAX_CONCURRENT_TRANSLATIONS = 16
+
+
 class Language(enum.Enum):
     EN = "English"
     DE = "German"
@@ -248,46 +253,43 @@ async def translate_argmap(source_argmap: nx.DiGraph, **kwargs):
     target_language = getattr(Language, kwargs["target_language"])
     target_argmap = source_argmap.copy()
 
-    translated_nodes = []
+    # nodes reachable from the roots, in breadth-first order; nodes
+    # with several parents are visited (and translated) only once
+    roots = {node for node in target_argmap.nodes if target_argmap.out_degree(node) == 0}
+    visited = set(roots)
+    queue = deque(roots)
+    nodes = []
+    while queue:
+        node = queue.popleft()
+        nodes.append(node)
+        for child in target_argmap.predecessors(node):
+            if child not in visited:
+                visited.add(child)
+                queue.append(child)
 
-    async def translate_node(
-        node,
-        parent: str | None = None,
-        translated_parent_data: dict | None = None,
-        original_parent_data: dict | None = None,
-    ):
-        if node in translated_nodes:
-            return
+    # nodes are translated independently of each other (and of their parents),
+    # so all of them can be translated concurrently
+    semaphore = asyncio.Semaphore(kwargs.get("max_concurrent_translations") or _MAX_CONCURRENT_TRANSLATIONS)
+
+    async def translate_node(node):
         original_node_data = target_argmap.nodes[node].copy()
         try:
-            if parent is None:
-                translated_node_data = await _translate_root(
-                    original_node_data, target_language, client=client
-                )
-            else:
-                translated_node_data = await _translate_reason(
-                    original_node_data,
-                    target_language,
-                    client=client,
-                )
-            nx.set_node_attributes(target_argmap, {node: translated_node_data})
+            async with semaphore:
+                if node in roots:
+                    translated_node_data = await _translate_root(
+                        original_node_data, target_language, client=client
+                    )
+                else:
+                    translated_node_data = await _translate_reason(
+                        original_node_data,
+                        target_language,
+                        client=client,
+                    )
         except Exception as e:
             logger.error(f"Failed to translate node {original_node_data} due to {e}. Will keep original data.")
+            return
+        nx.set_node_attributes(target_argmap, {node: translated_node_data})
 
-        translated_nodes.append(node)
-
-        for child in target_argmap.predecessors(node):
-            await translate_node(
-                child,
-                parent=node,
-                translated_parent_data=translated_node_data,
-                original_parent_data=original_node_data,
-            )
-
-        return
-
-    for root in target_argmap.nodes:
-        if not list(target_argmap.successors(root)):
-            await translate_node(root)
+    await asyncio.gather(*[translate_node(node) for node in nodes])
 
     return target_argmap
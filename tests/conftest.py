@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import networkx as nx
+import pytest
+import ujson
+import yaml
+
+
+def make_tree(debate_uid: str) -> nx.DiGraph:
+    tree = nx.DiGraph()
+    tree.add_node(f"{debate_uid}-root", claim="Root claim.", label="Root")
+    tree.add_node(f"{debate_uid}-pro", claim="Pro claim.", label="Pro", premises=["P1.", "P2."])
+    tree.add_node(f"{debate_uid}-con", claim="Con claim.", label="Con")
+    tree.add_edge(f"{debate_uid}-pro", f"{debate_uid}-root", valence="PRO")
+    tree.add_edge(f"{debate_uid}-con", f"{debate_uid}-pro", valence="CON", target_idx=1)
+    return tree
+
+
+@pytest.fixture
+def write_debate():
+    """writes a debate directory (config and, if `complete`, graph file) into a corpus"""
+
+    def write(
+        corpus_path: Path,
+        split: str,
+        debate_uid: str,
+        tags: list[str] = ("a",),
+        degree_config: list[int] = (1, 1),
+        complete: bool = True,
+    ) -> Path:
+        debate_path = corpus_path / split / debate_uid
+        debate_path.mkdir(parents=True)
+        config = {
+            "split": split,
+            "corpus_uid": "test",
+            "debate_uid": debate_uid,
+            "tags": list(tags),
+            "topic": "Topic",
+            "motion": {"label": "Motion", "claim": "Motion claim."},
+            "degree_config": list(degree_config),
+        }
+        (debate_path / "config.yaml").write_text(yaml.dump(config))
+        if complete:
+            data = nx.node_link_data(make_tree(debate_uid))
+            (debate_path / f"node_link_data-{debate_uid}.json").write_text(ujson.dumps(data))
+        return debate_path
+
+    return write
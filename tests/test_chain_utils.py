@@ -0,0 +1,74 @@
+from langchain_core.exceptions import OutputParserException
+import pytest
+
+from syncialo.chains.utils import (
+    extract_numbered_items,
+    json_array_schema,
+    json_object_schema,
+    parse_structured_output,
+)
+
+
+def test_extract_numbered_items():
+    text = "Here are the premises:\n\n1. **Premise 1:** A is B.\n2. C is D.\n"
+    assert extract_numbered_items(text, key="premise") == [
+        {"idx": "1", "premise": "A is B."},
+        {"idx": "2", "premise": "C is D."},
+    ]
+
+
+def test_extract_bulleted_items():
+    text = "- A is B.\n- C is D."
+    assert [item["premise"] for item in extract_numbered_items(text, key="premise")] == ["A is B.", "C is D."]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "No list here.",
+        "1. A is B.\nSo C is D.",
+        "1. A is B.\n   - because of E\n2. C is D.",
+        "1. A is B.\n  2. C is D.",
+        "1. A is B.\n- C is D.",
+        "- A is B.\n* C is D.",
+        "1. A is B.\n2) C is D.",
+        "1. A is B.\n2. ",
+    ],
+)
+def test_extract_numbered_items_gives_up(text):
+    with pytest.raises(OutputParserException):
+        extract_numbered_items(text, key="premise")
+
+
+def test_extract_numbered_items_max_items():
+    text = "\n".join(f"{i}. Premise {i}." for i in range(1, 7))
+    assert len(extract_numbered_items(text, key="premise", max_items=6)) == 6
+    with pytest.raises(OutputParserException):
+        extract_numbered_items(text, key="premise", max_items=5)
+
+
+@pytest.mark.parametrize(
+    "text, schema",
+    [
+        ('[{"idx": "1", "premise": "A is B."}]', json_array_schema("idx", "premise")),
+        ('```json\n{"label": "L", "claim": "C"}\n```', json_object_schema("label", "claim")),
+    ],
+)
+def test_parse_structured_output(text, schema):
+    assert parse_structured_output(text, schema)
+
+
+@pytest.mark.parametrize(
+    "text, schema",
+    [
+        ('[{"foo": 1}]', json_array_schema("idx", "premise")),
+        ('[{"idx": "1", "premise": "A is B."}, {"idx": "2"}]', json_array_schema("idx", "premise")),
+        ('["A is B."]', json_array_schema("idx", "premise")),
+        ('{"idx": "1", "premise": "A is B."}', json_array_schema("idx", "premise")),
+        ('{"label": "L"}', json_object_schema("label", "claim")),
+        ("no json", json_object_schema("label", "claim")),
+    ],
+)
+def test_parse_structured_output_rejects_mismatches(text, schema):
+    with pytest.raises(OutputParserException):
+        parse_structured_output(text, schema)
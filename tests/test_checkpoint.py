@@ -0,0 +1,117 @@
+import asyncio
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import networkx as nx
+import pytest
+
+from syncialo.checkpoint import DebateJournal
+from syncialo.debate_builder import DebateBuilder
+
+
+def _record_children(journal: DebateJournal, node_id: str, child_ids: list[str]):
+    journal.record_expansion(
+        node_id,
+        premises=[f"Premise of {node_id}."],
+        nodes=[{"uid": uid, "claim": f"Claim {uid}.", "label": uid, "vector": [0.0, 1.0]} for uid in child_ids],
+        edges=[{"source": uid, "target": node_id, "valence": "PRO", "target_idx": 0} for uid in child_ids],
+    )
+
+
+def test_replay(tmp_path):
+    journal = DebateJournal(tmp_path / "journal.jsonl")
+    assert journal.replay() is None
+    journal.record_root("r", claim="Root.", label="Root", vector=[1.0, 0.0])
+    _record_children(journal, "r", ["a", "b"])
+    _record_children(journal, "a", ["c"])
+
+    state = DebateJournal(journal.path).replay()
+
+    assert state.root_id == "r"
+    assert set(state.tree.edges) == {("a", "r"), ("b", "r"), ("c", "a")}
+    assert state.tree.nodes["a"]["premises"] == ["Premise of a."]
+    assert "premises" not in state.tree.nodes["r"]
+    assert state.expanded == {"r", "a"}
+    assert state.frontier() == [("b", 1), ("c", 2)]
+    assert state.vectors["c"] == [0.0, 1.0]
+
+
+def test_replay_drops_truncated_last_line(tmp_path):
+    journal = DebateJournal(tmp_path / "journal.jsonl")
+    journal.record_root("r", claim="Root.", label="Root", vector=[1.0, 0.0])
+    _record_children(journal, "r", ["a"])
+    with open(journal.path, "a") as f:
+        f.write('{"op": "expand", "uid": "a", "prem')
+
+    resumed = DebateJournal(journal.path)
+    state = resumed.replay()
+
+    assert state.frontier() == [("a", 1)]
+    assert journal.path.read_text().endswith("\n")
+    # the journal can be extended and replayed again
+    _record_children(resumed, "a", ["b"])
+    assert DebateJournal(journal.path).replay().frontier() == [("b", 2)]
+
+
+def test_replay_ignores_records_of_previous_owner(tmp_path):
+    stale = DebateJournal(tmp_path / "journal.jsonl", owner="stale")
+    stale.replay()
+    stale.record_root("r", claim="Root.", label="Root", vector=[1.0, 0.0])
+    _record_children(stale, "r", ["a", "b"])
+
+    # another worker takes over, while the stale one keeps on appending
+    current = DebateJournal(stale.path, owner="current")
+    assert current.replay().frontier() == [("a", 1), ("b", 1)]
+    _record_children(stale, "a", ["x"])
+    _record_children(current, "a", ["c"])
+
+    state = DebateJournal(stale.path).replay()
+    assert set(state.tree.nodes) == {"r", "a", "b", "c"}
+    assert state.frontier() == [("b", 1), ("c", 2)]
+
+
+class _Interrupted(Exception):
+    pass
+
+
+def _builder(max_expansions: int | None = None) -> DebateBuilder:
+    """debate builder whose expansions add one child per node, and fail after max_expansions"""
+    builder = DebateBuilder.__new__(DebateBuilder)
+    builder.expansion_mode = "depth_first"
+    builder.embeddings = DeterministicFakeEmbedding(size=2)
+    builder.expanded = []
+
+    async def expand_node(node_id, root_id, tree, vector_store, degree_config, tags, topic, depth, journal):
+        if max_expansions is not None and len(builder.expanded) >= max_expansions:
+            raise _Interrupted()
+        builder.expanded.append(node_id)
+        if depth >= len(degree_config):
+            journal.record_expansion(node_id, premises=None, nodes=[], edges=[])
+            return []
+        child_id = f"{node_id}.0"
+        tree.add_node(child_id, claim=f"Claim {child_id}.", label=child_id)
+        tree.add_edge(child_id, node_id, valence="PRO", target_idx=0)
+        _record_children(journal, node_id, [child_id])
+        return [child_id]
+
+    builder.expand_node = expand_node
+    return builder
+
+
+def test_build_debate_resumes_from_journal(tmp_path):
+    journal_path = tmp_path / "journal.jsonl"
+    kwargs = {"motion": "Motion.", "topic": "Topic", "tag_cluster": [], "degree_config": [1, 1, 1]}
+
+    interrupted = _builder(max_expansions=2)
+    with pytest.raises(_Interrupted):
+        asyncio.run(interrupted.build_debate(**kwargs, journal_path=journal_path))
+    root_id = interrupted.expanded[0]
+    with open(journal_path, "a") as f:
+        f.write('{"op": "exp')
+
+    resumed = _builder()
+    tree = asyncio.run(resumed.build_debate(**kwargs, journal_path=journal_path))
+
+    assert resumed.expanded == [f"{root_id}.0.0", f"{root_id}.0.0.0"]
+    assert nx.shortest_path(tree, f"{root_id}.0.0.0", root_id) == [
+        f"{root_id}.0.0.0", f"{root_id}.0.0", f"{root_id}.0", root_id
+    ]
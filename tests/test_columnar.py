@@ -0,0 +1,35 @@
+import shutil
+
+import networkx as nx
+
+from syncialo.columnar import ColumnarCorpus, export_columnar_corpus
+
+from .conftest import make_tree
+
+
+def test_export_and_load_debate(tmp_path, write_debate):
+    write_debate(tmp_path, "train", "d1", tags=["a"])
+    write_debate(tmp_path, "test", "d2", tags=["b"])
+    write_debate(tmp_path, "train", "d3", complete=False)
+
+    corpus = ColumnarCorpus(export_columnar_corpus(tmp_path))
+
+    assert sorted(corpus.debate_uids()) == ["d1", "d2"]
+    assert corpus.debate_uids(split="train") == ["d1"]
+    assert corpus.debate_uids(tags=["b"]) == ["d2"]
+    assert nx.utils.graphs_equal(corpus.load_debate("d1"), make_tree("d1"))
+
+
+def test_reexport_removes_stale_shards(tmp_path, write_debate):
+    for idx in range(3):
+        write_debate(tmp_path, "train", f"d{idx}")
+    output_dir = export_columnar_corpus(tmp_path, shard_size=1)
+    assert len(list((output_dir / "debates").rglob("*.parquet"))) == 3
+
+    shutil.rmtree(tmp_path / "train" / "d1")
+    shutil.rmtree(tmp_path / "train" / "d2")
+    output_dir = export_columnar_corpus(tmp_path, shard_size=1)
+
+    assert len(list((output_dir / "debates").rglob("*.parquet"))) == 1
+    assert ColumnarCorpus(output_dir).debate_uids() == ["d0"]
+    assert not output_dir.with_name(output_dir.name + ".tmp").exists()
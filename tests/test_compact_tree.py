@@ -0,0 +1,53 @@
+import networkx as nx
+
+from syncialo.compact_tree import CompactTree
+
+from .conftest import make_tree
+
+
+def _tree() -> nx.DiGraph:
+    tree = make_tree("d")
+    tree.graph["corpus_uid"] = "test"
+    tree.add_node("d-dup", claim="Con claim.", label="Con", premises=[], score=0.5)
+    tree.add_node("d-bare")
+    tree.add_edge("d-dup", "d-pro", valence="CON", target_idx=0)
+    tree.add_edge("d-dup", "d-root", valence="PRO", weight=2)
+    tree.add_edge("d-bare", "d-con")
+    return tree
+
+
+def _assert_same(tree: nx.DiGraph, other: nx.DiGraph):
+    assert other.graph == tree.graph
+    assert list(other.nodes(data=True)) == list(tree.nodes(data=True))
+    assert list(other.edges(data=True)) == list(tree.edges(data=True))
+
+
+def test_networkx_round_trip():
+    tree = _tree()
+    _assert_same(tree, CompactTree.from_networkx(tree).to_networkx())
+
+
+def test_node_link_round_trip():
+    tree = _tree()
+    data = nx.node_link_data(tree)
+    compact = CompactTree.from_node_link_data(data)
+    assert compact.to_node_link_data() == data
+    _assert_same(tree, compact.to_networkx())
+
+
+def test_lookups():
+    compact = CompactTree.from_networkx(_tree())
+    root, pro, con = compact.index("d-root"), compact.index("d-pro"), compact.index("d-con")
+    dup, bare = compact.index("d-dup"), compact.index("d-bare")
+
+    assert len(compact) == 5
+    assert compact.number_of_edges() == 5
+    assert compact.roots() == [root]
+    assert compact.parent(dup) == pro
+    assert compact.children(pro) == [con, dup]
+    assert [compact.depth(i) for i in (root, pro, con, dup, bare)] == [0, 1, 2, 2, 3]
+    assert compact.claim(pro) == "Pro claim."
+    assert compact.claim(bare) is None and compact.label(bare) is None
+    assert compact.node_premises(pro) == ["P1.", "P2."]
+    assert compact.node_premises(dup) == []
+    assert compact.node_premises(root) is None
@@ -0,0 +1,48 @@
+import pytest
+
+from syncialo.corpus import CorpusReader
+
+
+@pytest.fixture(params=[False, True], ids=["scan", "manifest"])
+def reader(request, tmp_path, write_debate) -> CorpusReader:
+    write_debate(tmp_path, "train", "d1", tags=["a", "b"], degree_config=[1, 1])
+    write_debate(tmp_path, "train", "d2", tags=["c"], degree_config=[2])
+    write_debate(tmp_path, "eval", "d3", tags=["b"], degree_config=[1, 1])
+    write_debate(tmp_path, "test", "d4", tags=["a"], complete=False)
+    reader = CorpusReader(tmp_path)
+    if request.param:
+        reader.build_manifest()
+    return reader
+
+
+def _uids(debates) -> list[str]:
+    return sorted(debate.debate_uid for debate in debates)
+
+
+def test_complete_debates(reader):
+    assert _uids(reader) == ["d1", "d2", "d3"]
+    assert _uids(reader.debates(complete=False)) == ["d1", "d2", "d3", "d4"]
+
+
+def test_split_filter(reader):
+    assert _uids(reader.debates(split="train")) == ["d1", "d2"]
+    assert _uids(reader.debates(split=["eval", "test"], complete=False)) == ["d3", "d4"]
+
+
+def test_tags_filter(reader):
+    assert _uids(reader.debates(tags=["b"])) == ["d1", "d3"]
+    assert _uids(reader.debates(tags=["a", "c"], complete=False)) == ["d1", "d2", "d4"]
+
+
+def test_degree_config_filter(reader):
+    assert _uids(reader.debates(degree_config=[1, 1])) == ["d1", "d3"]
+    assert _uids(reader.debates(split="train", degree_config=(2,))) == ["d2"]
+
+
+def test_load_debate(reader):
+    debate = next(reader.debates(split="eval"))
+    tree = debate.load_graph()
+    assert set(tree.nodes) == {"d3-root", "d3-pro", "d3-con"}
+    assert debate.load_compact_tree().roots() == [0]
+    with pytest.raises(FileNotFoundError):
+        next(reader.debates(split="test", complete=False)).load_node_link_data()
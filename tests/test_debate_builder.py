@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+from syncialo.debate_builder import DebateBuilder
+
+
+class _ProAndConChain:
+    """stub of the pro and con generation chain with per-persona delays"""
+
+    def __init__(self):
+        self.cancelled: list[str] = []
+
+    async def ainvoke(self, input_: dict) -> dict:
+        try:
+            await asyncio.sleep(input_["delay"])
+        except asyncio.CancelledError:
+            self.cancelled.append(input_["persona"])
+            raise
+        if input_.get("fail"):
+            raise RuntimeError("request failed")
+        return {"new_pros": [input_["persona"]] * 2, "new_cons": [input_["persona"]] * 2}
+
+
+def _builder() -> DebateBuilder:
+    builder = DebateBuilder.__new__(DebateBuilder)
+    builder.chain_generate_pro_and_con = _ProAndConChain()
+    return builder
+
+
+def test_speculation_does_not_wait_for_slow_persona():
+    builder = _builder()
+    batched_input = [
+        {"persona": "slow", "delay": 10.0},
+        {"persona": "a", "delay": 0.01},
+        {"persona": "failing", "delay": 0.01, "fail": True},
+        {"persona": "b", "delay": 0.02},
+    ]
+
+    start = time.monotonic()
+    results = asyncio.run(builder.generate_pro_and_con_speculatively(batched_input, min_args=4))
+
+    assert time.monotonic() - start < 1.0
+    assert sorted(result["new_pros"][0] for result in results) == ["a", "b"]
+    assert builder.chain_generate_pro_and_con.cancelled == ["slow"]
+
+
+def test_speculation_uses_all_results_if_too_few_args():
+    builder = _builder()
+    batched_input = [{"persona": "a", "delay": 0.01}, {"persona": "b", "delay": 0.02, "fail": True}]
+
+    results = asyncio.run(builder.generate_pro_and_con_speculatively(batched_input, min_args=4))
+
+    assert [result["new_pros"][0] for result in results] == ["a"]
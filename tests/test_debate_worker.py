@@ -0,0 +1,77 @@
+import asyncio
+from pathlib import Path
+import sys
+
+import networkx as nx
+import yaml
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "workflows"))
+
+import synthetic_corpus_generation as gen  # noqa: E402
+from syncialo.ledger import TaskLedger  # noqa: E402
+
+
+class _ClassifierClient:
+    async def aclose(self):
+        pass
+
+
+def _make_debate(corpus_path: Path, debate_uid: str) -> str:
+    debate_path = corpus_path / "train" / debate_uid
+    debate_path.mkdir(parents=True)
+    config = {
+        "split": "train",
+        "corpus_uid": "test",
+        "debate_uid": debate_uid,
+        "tags": ["a"],
+        "topic": "t",
+        "motion": {"label": "l", "claim": "c"},
+        "degree_config": [1, 0],
+    }
+    (debate_path / "config.yaml").write_text(yaml.dump(config))
+    return str(debate_path.relative_to(corpus_path))
+
+
+def _run_worker(monkeypatch, corpus_path: Path, fail_times: int) -> list[Path]:
+    calls = []
+
+    async def generate(debate_path: Path, debate_builder, **kwargs) -> nx.DiGraph:
+        calls.append(debate_path)
+        await asyncio.sleep(0)
+        if len(calls) <= fail_times:
+            raise RuntimeError("debate failed")
+        tree = nx.DiGraph()
+        tree.add_node("n0", claim="c", label="l")
+        return tree
+
+    monkeypatch.setattr(gen.generate_single_debate, "fn", generate)
+    monkeypatch.setattr(gen, "init_rate_limits", lambda **kwargs: None)
+    monkeypatch.setattr(gen, "init_debate_builder", lambda **kwargs: None)
+    monkeypatch.setattr(gen, "get_classifier_client", lambda: _ClassifierClient())
+    asyncio.run(gen.run_debate_worker(path=corpus_path))
+    return calls
+
+
+def test_worker_retries_failed_debate(tmp_path, monkeypatch):
+    task_id = _make_debate(tmp_path, "debate-train-0001")
+    ledger = TaskLedger(tmp_path / gen._LEDGER_FILE)
+    ledger.add_tasks([task_id])
+
+    calls = _run_worker(monkeypatch, tmp_path, fail_times=1)
+
+    assert len(calls) == 2
+    assert ledger.counts() == {"done": 1}
+    assert (tmp_path / task_id / "node_link_data-debate-train-0001.json").exists()
+    ledger.close()
+
+
+def test_worker_marks_debate_failed_after_max_attempts(tmp_path, monkeypatch):
+    task_id = _make_debate(tmp_path, "debate-train-0001")
+    ledger = TaskLedger(tmp_path / gen._LEDGER_FILE)
+    ledger.add_tasks([task_id])
+
+    calls = _run_worker(monkeypatch, tmp_path, fail_times=10)
+
+    assert len(calls) == ledger.max_attempts
+    assert ledger.counts() == {"failed": 1}
+    ledger.close()
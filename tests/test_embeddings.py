@@ -0,0 +1,53 @@
+import asyncio
+
+from langchain_core.embeddings import Embeddings
+
+from syncialo.embeddings import CachedEmbeddings
+
+
+class _SlowEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return self.embed_documents(texts)
+
+
+def test_concurrent_requests_are_batched():
+    underlying = _SlowEmbeddings()
+    embeddings = CachedEmbeddings(underlying)
+
+    async def main():
+        return await asyncio.gather(embeddings.aembed_documents(["a", "bb"]), embeddings.aembed_query("bb"))
+
+    vectors, query_vector = asyncio.run(main())
+    assert vectors == [[1.0], [2.0]]
+    assert query_vector == [2.0]
+    assert underlying.calls == 1
+
+
+def test_cancelled_caller_does_not_affect_other_callers():
+    embeddings = CachedEmbeddings(_SlowEmbeddings())
+
+    async def main():
+        cancelled = asyncio.create_task(embeddings.aembed_documents(["a", "bb"]))
+        other = asyncio.create_task(embeddings.aembed_documents(["bb", "ccc"]))
+        await asyncio.sleep(0.02)
+        cancelled.cancel()
+        result = await asyncio.wait_for(other, timeout=1.0)
+        assert cancelled.cancelled()
+        return result
+
+    assert asyncio.run(main()) == [[2.0], [3.0]]
+    assert not embeddings._pending
+    # results of the cancelled request are cached nonetheless
+    assert embeddings.embed_documents(["a"]) == [[1.0]]
+    assert embeddings.hits == 1
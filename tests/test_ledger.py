@@ -0,0 +1,75 @@
+from syncialo.ledger import TaskLedger
+
+
+def _ledger(tmp_path, **kwargs) -> TaskLedger:
+    return TaskLedger(tmp_path / "ledger.sqlite", **kwargs)
+
+
+def test_claim_and_complete(tmp_path):
+    ledger = _ledger(tmp_path, worker_id="a")
+    ledger.add_tasks(["t1", "t2"])
+    ledger.add_tasks(["t1"])
+
+    assert ledger.claim() == "t1"
+    assert ledger.claim() == "t2"
+    assert ledger.claim() is None
+    assert ledger.holds_lease("t1")
+    assert ledger.renew("t1")
+    assert ledger.complete("t1")
+    assert not ledger.holds_lease("t1")
+    assert ledger.counts() == {"done": 1, "leased": 1}
+    ledger.close()
+
+
+def test_leases_are_exclusive(tmp_path):
+    ledger_a = _ledger(tmp_path, worker_id="a")
+    ledger_b = _ledger(tmp_path, worker_id="b")
+    ledger_a.add_tasks(["t1"])
+
+    assert ledger_a.claim() == "t1"
+    assert ledger_b.claim() is None
+    assert not ledger_b.renew("t1")
+    assert not ledger_b.complete("t1")
+    assert not ledger_b.release("t1")
+    ledger_a.close()
+    ledger_b.close()
+
+
+def test_release_until_max_attempts(tmp_path):
+    ledger = _ledger(tmp_path, max_attempts=2)
+    ledger.add_tasks(["t1"])
+
+    assert ledger.claim() == "t1"
+    assert ledger.release("t1", failed=True)
+    assert ledger.counts() == {"pending": 1}
+    assert ledger.claim() == "t1"
+    assert ledger.release("t1", failed=True)
+    assert ledger.counts() == {"failed": 1}
+    assert ledger.claim() is None
+    ledger.close()
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    ledger_a = _ledger(tmp_path, worker_id="a", lease_duration=-1.0)
+    ledger_b = _ledger(tmp_path, worker_id="b")
+    ledger_a.add_tasks(["t1"])
+
+    assert ledger_a.claim() == "t1"
+    assert not ledger_a.holds_lease("t1")
+    assert ledger_b.claim() == "t1"
+    assert ledger_b.holds_lease("t1")
+    assert not ledger_a.complete("t1")
+    assert ledger_b.complete("t1")
+    ledger_a.close()
+    ledger_b.close()
+
+
+def test_expired_leases_count_towards_max_attempts(tmp_path):
+    ledger = _ledger(tmp_path, lease_duration=-1.0, max_attempts=2)
+    ledger.add_tasks(["t1"])
+
+    assert ledger.claim() == "t1"
+    assert ledger.claim() == "t1"
+    assert ledger.claim() is None
+    assert ledger.counts() == {"failed": 1}
+    ledger.close()
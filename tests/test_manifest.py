@@ -0,0 +1,71 @@
+import pytest
+import yaml
+
+from syncialo.manifest import CorpusManifest, debate_stage, file_hash
+
+
+def test_debate_stage():
+    assert debate_stage({}) == "config"
+    assert debate_stage({"topic": "t"}) == "topic"
+    assert debate_stage({"topic": "t", "motion": {"claim": "c"}}) == "motion"
+    assert debate_stage({"topic": "t", "motion": {"claim": "c"}}, graph_file="g.json") == "debate"
+
+
+def test_sync(tmp_path, write_debate):
+    d1 = write_debate(tmp_path, "train", "d1")
+    write_debate(tmp_path, "eval", "d2", complete=False)
+    (tmp_path / "train" / "not-a-debate").mkdir()
+
+    with CorpusManifest(tmp_path / "manifest.sqlite") as manifest:
+        manifest.sync(tmp_path)
+        records = manifest.records()
+        assert [record["path"] for record in records] == ["eval/d2", "train/d1"]
+        record = manifest.get("train/d1")
+        assert record["stage"] == "debate"
+        assert record["config"] == yaml.safe_load((d1 / "config.yaml").read_text())
+        assert record["graph_file"] == "node_link_data-d1.json"
+        assert record["graph_hash"] == file_hash(d1 / "node_link_data-d1.json")
+        assert manifest.get("eval/d2")["graph_file"] is None
+        assert manifest.get("train/missing") is None
+
+        # sync drops records of deleted debates
+        (d1 / "config.yaml").unlink()
+        manifest.sync(tmp_path)
+        assert [record["path"] for record in manifest.records()] == ["eval/d2"]
+
+
+def test_put_records_and_counts(tmp_path):
+    with CorpusManifest(tmp_path / "manifest.sqlite") as manifest:
+        manifest.put_many(
+            [
+                {"path": "train/d1", "config": {"split": "train", "debate_uid": "d1"}},
+                {"path": "train/d2", "config": {"split": "train", "debate_uid": "d2", "topic": "t"}},
+                {"path": "eval/d3", "config": {"split": "eval", "debate_uid": "d3", "topic": "t"}},
+            ]
+        )
+        manifest.put("train/d1", {"split": "train", "debate_uid": "d1", "topic": "t", "motion": {"claim": "c"}})
+
+        assert manifest.counts() == {"motion": 1, "topic": 2}
+        assert manifest.counts(split="train") == {"motion": 1, "topic": 1}
+        assert [r["path"] for r in manifest.records(split="train")] == ["train/d1", "train/d2"]
+        assert [r["path"] for r in manifest.records(stage="topic")] == ["eval/d3", "train/d2"]
+        assert [r["path"] for r in manifest.records(split=["eval"], stage=["topic", "motion"])] == ["eval/d3"]
+
+        manifest.put("train/d2", {"split": "train", "debate_uid": "d2", "topic": "t"}, graph_file="g.json")
+        assert manifest.get("train/d2")["stage"] == "debate"
+        assert manifest.counts(split="train") == {"debate": 1, "motion": 1}
+
+
+def test_failed_sync_keeps_previous_records(tmp_path, write_debate):
+    write_debate(tmp_path, "train", "d1")
+    with CorpusManifest(tmp_path / "manifest.sqlite") as manifest:
+        manifest.sync(tmp_path)
+        before = manifest.records()
+
+        broken = write_debate(tmp_path, "train", "d2")
+        (broken / "config.yaml").write_text(yaml.dump({"split": "train"}))
+        with pytest.raises(KeyError):
+            manifest.sync(tmp_path)
+
+        assert manifest.records() == before
+        assert manifest.get("train/d1")["stage"] == "debate"
@@ -0,0 +1,69 @@
+import asyncio
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+import pytest
+
+from syncialo import ratelimit
+from syncialo.ratelimit import (
+    EndpointLimiter,
+    EndpointOverloadedError,
+    RateLimitedChatModel,
+    configure_endpoint_limiter,
+)
+
+
+class _OverloadedModel(BaseChatModel):
+    """stub model that is overloaded for the first `overloads` requests"""
+
+    overloads: int
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        raise NotImplementedError
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self.calls += 1
+        if self.calls <= self.overloads:
+            raise EndpointOverloadedError("overloaded", status=429)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_BACKOFF_BASE", 0.001)
+
+
+def test_overloaded_requests_are_retried_through_limiter():
+    limiter = configure_endpoint_limiter("test-retry", initial_concurrency=8)
+    model = RateLimitedChatModel(model=_OverloadedModel(overloads=2), endpoint="test-retry")
+
+    result = asyncio.run(model.ainvoke([HumanMessage(content="hi")]))
+
+    assert result.content == "ok"
+    assert model.model.calls == 3
+    assert limiter.stats["requests"] == 3
+    assert limiter.stats["overloads"] == 2
+    assert limiter.limit < 8
+
+
+def test_retries_are_limited():
+    configure_endpoint_limiter("test-max-retries")
+    model = RateLimitedChatModel(model=_OverloadedModel(overloads=10), endpoint="test-max-retries", max_retries=2)
+
+    with pytest.raises(EndpointOverloadedError):
+        asyncio.run(model.ainvoke([HumanMessage(content="hi")]))
+    assert model.model.calls == 3
+
+
+def test_latency_does_not_decrease_concurrency():
+    limiter = EndpointLimiter("test-latency", initial_concurrency=8)
+    for latency in [0.01, 0.5, 0.01, 2.0]:
+        limiter.record_success(latency)
+    assert limiter.limit > 8
+    assert limiter.stats["decreases"] == 0
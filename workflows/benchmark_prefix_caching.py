@@ -0,0 +1,175 @@
+"Benchmark of prompt layouts against a local stub server that simulates prefix (KV) caching"
+
+import argparse
+import asyncio
+from collections import OrderedDict
+import hashlib
+import random
+import statistics
+import time
+
+from aiohttp import web
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_openai import ChatOpenAI
+
+from syncialo.chains.argumentation import (
+    GenAttackingArgumentChain,
+    GenSupportingArgumentChain,
+    RankPropsByPlausibilityChain,
+)
+from syncialo.chains.base_chain_builder import PROMPT_LAYOUTS, BaseChainBuilder
+from syncialo.ratelimit import RateLimitedChatModel, configure_endpoint_limiter
+
+_CHARS_PER_TOKEN = 4
+_BLOCK_TOKENS = 16  # tokens per cache block, as in vLLM's paged attention
+
+
+class StubServer:
+    """
+    OpenAI-compatible chat completions endpoint that simulates a server-side
+    prefix cache: prompts are split into blocks, and leading blocks found in an
+    LRU cache need not be prefilled. Time to first token grows with the number
+    of uncached prompt tokens.
+    """
+
+    def __init__(self, cache_blocks: int, base_latency: float, prefill_per_token: float):
+        self.cache_blocks = cache_blocks
+        self.base_latency = base_latency
+        self.prefill_per_token = prefill_per_token
+        self.reset()
+
+    def reset(self):
+        self.cache: OrderedDict[str, None] = OrderedDict()
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def prefill(self, prompt: str) -> tuple[int, int]:
+        """returns number of prompt tokens and of tokens served from cache"""
+        block_chars = _BLOCK_TOKENS * _CHARS_PER_TOKEN
+        block_hash = ""
+        cached_blocks = 0
+        blocks = [prompt[i:i + block_chars] for i in range(0, len(prompt), block_chars)]
+        for block in blocks:
+            # chained hashes: a block can only be cached if all preceding blocks are
+            block_hash = hashlib.sha1(f"{block_hash}{block}".encode("utf-8")).hexdigest()
+            if block_hash in self.cache:
+                self.cache.move_to_end(block_hash)
+                cached_blocks += 1
+            else:
+                self.cache[block_hash] = None
+                if len(self.cache) > self.cache_blocks:
+                    self.cache.popitem(last=False)
+        prompt_tokens = len(prompt) // _CHARS_PER_TOKEN
+        cached_tokens = min(prompt_tokens, cached_blocks * _BLOCK_TOKENS)
+        return prompt_tokens, cached_tokens
+
+    async def chat_completions(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        prompt = "".join(f"{m['role']}: {m['content']}\n" for m in body["messages"])
+        prompt_tokens, cached_tokens = self.prefill(prompt)
+        self.prompt_tokens += prompt_tokens
+        self.cached_tokens += cached_tokens
+        await asyncio.sleep(self.base_latency + (prompt_tokens - cached_tokens) * self.prefill_per_token)
+        return web.json_response(
+            {
+                "id": "stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "**Stub:** This is a stub argument."},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": 8,
+                    "total_tokens": prompt_tokens + 8,
+                    "prompt_tokens_details": {"cached_tokens": cached_tokens},
+                },
+            }
+        )
+
+
+def sample_prompts(num_nodes: int, degree: int) -> list:
+    """renders the persona-specific prompts of `num_nodes` node expansions in the current layout"""
+    personas = [f"a {job} with a keen interest in {topic}" for job, topic in zip(
+        ["teacher", "nurse", "economist", "farmer", "engineer", "historian", "lawyer", "artist"],
+        ["climate policy", "public health", "trade", "land use", "energy", "education", "privacy", "culture"],
+    )]
+    tags = ["ethics", "economy", "technology", "environment", "society", "law", "health", "education"]
+    prompts = []
+    for node in range(num_nodes):
+        premises = [f"Premise {i + 1} of argument {node} states something specific." for i in range(3)]
+        for _ in range(degree):
+            inputs = {
+                "persona": random.choice(personas),
+                "taglist": " - ".join(random.sample(tags, k=4)),
+                "proplist": RankPropsByPlausibilityChain.format_premises(premises),
+                "premiselist": GenSupportingArgumentChain.format_premises(premises),
+                "n": 2,
+                "nth": "first",
+                "target_label": "(P1)",
+            }
+            for chain, name in [
+                (RankPropsByPlausibilityChain, "_assess_prompt_msgs"),
+                (GenSupportingArgumentChain, "_instruction_prompt_msgs"),
+                (GenAttackingArgumentChain, "_instruction_prompt_msgs"),
+            ]:
+                template = ChatPromptTemplate.from_messages(chain.get_prompt_msgs(name))
+                prompts.append(template.format_messages(**inputs))
+    return prompts
+
+
+async def run_benchmark(args: argparse.Namespace):
+    server = StubServer(args.cache_blocks, args.base_latency, args.prefill_per_token)
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", server.chat_completions)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+    base_url = f"http://127.0.0.1:{args.port}/v1"
+
+    try:
+        for layout in PROMPT_LAYOUTS:
+            BaseChainBuilder.set_prompt_layout(layout)
+            server.reset()
+            configure_endpoint_limiter(base_url, initial_concurrency=args.concurrency, max_concurrency=args.concurrency)
+            model = RateLimitedChatModel(
+                model=ChatOpenAI(model="stub", base_url=base_url, api_key="NONE", max_retries=0),
+                endpoint=base_url,
+            )
+            random.seed(args.seed)
+            prompts = sample_prompts(args.nodes, args.degree)
+
+            async def timed_call(messages) -> float:
+                start = time.monotonic()
+                await model.ainvoke(messages, max_tokens=8)
+                return time.monotonic() - start
+
+            ttfts = await asyncio.gather(*[timed_call(messages) for messages in prompts])
+            ttfts = sorted(ttfts)
+            print(
+                f"{layout:>14}: {len(prompts)} requests, "
+                f"prefix hit ratio {server.cached_tokens / max(1, server.prompt_tokens):.2f}, "
+                f"TTFT mean {statistics.mean(ttfts) * 1000:.0f}ms, "
+                f"p50 {ttfts[len(ttfts) // 2] * 1000:.0f}ms, "
+                f"p95 {ttfts[int(len(ttfts) * 0.95)] * 1000:.0f}ms"
+            )
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=20)
+    parser.add_argument("--degree", type=int, default=6)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--cache-blocks", type=int, default=2048)
+    parser.add_argument("--base-latency", type=float, default=0.01, help="seconds")
+    parser.add_argument("--prefill-per-token", type=float, default=0.0002, help="seconds")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run_benchmark(parser.parse_args()))
@@ -1,23 +1,45 @@
 "Script for generating synthetic corpus"
 
 import asyncio
+from collections import deque
+from collections.abc import Awaitable, Callable
 import dotenv
 import enum
+import hashlib
+import multiprocessing
 import os
+import sys
 from pathlib import Path
 import random
 import yaml
 import ujson
 
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.runnables import Runnable
 from langchain_openai import ChatOpenAI
+from loguru import logger
 import networkx as nx
 from prefect import flow, get_run_logger, task
 from pydantic import BaseModel
+from syncialo.chains.base_chain_builder import BaseChainBuilder
+from syncialo.chains.cache import SQLiteResponseCache
+from syncialo.chains.classifier import get_classifier_client
 from syncialo.chains.debate_design import SuggestMotionChain, SuggestTopicsChain
+from syncialo.columnar import export_columnar_corpus
 from syncialo.debate_builder import DebateBuilder
+from syncialo.ledger import TaskLedger
+from syncialo.manifest import MANIFEST_FILE, CorpusManifest, file_hash
+from syncialo.ratelimit import RateLimitedChatModel, configure_endpoint_limiter
+from syncialo.router import ChatModelRouter
 
 
-_BATCH_SIZE = 10
+_MAX_CONCURRENT_DEBATES = 10
+_MAX_CONCURRENT_SUGGESTIONS = 16
+# staged: topics for all debates first, then motions overlapping with tree building
+# streaming: topics, motions, trees and validation of every debate overlap
+_PIPELINE_MODES = ["staged", "streaming"]
+_LEDGER_FILE = "ledger.sqlite"
+_LEASE_DURATION = 600.0  # seconds
 
 _UNIVERSAL_TAGS_PATH = "data/universal_tags.txt"
 _EVAL_TAGS_PATH = "data/eval_tags.txt"
@@ -75,26 +97,118 @@ def check_kwargs(**kwargs):
         raise ValueError("output_dir is required")
     if "model_kwargs" not in kwargs:
         raise ValueError("model_kwargs is required")
+    if kwargs.get("pipeline_mode", "staged") not in _PIPELINE_MODES:
+        raise ValueError(f"pipeline_mode must be one of {_PIPELINE_MODES}")
     if os.getenv("SYNCIALO_API_KEY") is None:
         logger.warning("SYNCIALO_API_KEY is not set. Will try to access inference server with api key.")
 
 
-def init_models(**kwargs) -> tuple[ChatOpenAI, ChatOpenAI]:
+def init_rate_limits(**kwargs):
+    """
+    configures the limiters shared by all requests to an endpoint (see syncialo.ratelimit)
+
+    `rate_limits` maps the roles "model", "formatter_model" and "classifier" to
+    EndpointLimiter kwargs, e.g. {"model": {"requests_per_second": 5, "tokens_per_second": 20000}}.
+    Roles that use the same endpoint share one limiter, replicas of a role
+    (see `base_urls`) have one limiter each.
+    """
+    rate_limits = kwargs.get("rate_limits", {})
+    for role, limiter_kwargs in rate_limits.items():
+        if role == "classifier":
+            endpoints = [get_classifier_client().api_url]
+        else:
+            endpoints = get_model_endpoints(kwargs[f"{role}_kwargs"])
+        for endpoint in endpoints:
+            configure_endpoint_limiter(endpoint, **limiter_kwargs)
+
+
+def get_model_endpoints(model_kwargs: dict) -> list[str]:
+    if "base_urls" in model_kwargs:
+        return list(model_kwargs["base_urls"])
+    return [model_kwargs.get("base_url") or model_kwargs["model"]]
+
+
+def init_chat_model(model_kwargs: dict, api_key: str) -> BaseChatModel:
+    """
+    initializes a chat model whose requests go through the rate limiter of its endpoint
+
+    If `model_kwargs` list several `base_urls` (identical replicas) instead of one
+    `base_url`, requests are spread over the replicas by a ChatModelRouter, using
+    the `routing_strategy` given in `model_kwargs` (default: "least_outstanding").
+
+    Overloaded requests are retried by the rate limiter (up to `max_retries` times),
+    not by the OpenAI client, so that the limiter sees every 429/5xx response.
+    """
+    endpoints = get_model_endpoints(model_kwargs)
+    chat_model_kwargs = {
+        k: v for k, v in model_kwargs.items() if k not in ("base_urls", "routing_strategy", "max_retries")
+    }
+    chat_model_kwargs["api_key"] = api_key
+    chat_model_kwargs["max_retries"] = 0
+    limiter_kwargs = {"max_retries": model_kwargs["max_retries"]} if "max_retries" in model_kwargs else {}
+    models = []
+    for endpoint in endpoints:
+        if "base_urls" in model_kwargs:
+            chat_model_kwargs["base_url"] = endpoint
+        models.append(
+            RateLimitedChatModel(model=ChatOpenAI(**chat_model_kwargs), endpoint=endpoint, **limiter_kwargs)
+        )
+    if len(models) == 1:
+        return models[0]
+    return ChatModelRouter(
+        models=models,
+        endpoints=endpoints,
+        strategy=model_kwargs.get("routing_strategy", "least_outstanding"),
+    )
+
+
+def init_models(**kwargs) -> tuple[BaseChatModel, BaseChatModel]:
     """
     initializes the models
     """
-    model_kwargs = kwargs["model_kwargs"]
-    model_kwargs["api_key"] = os.getenv("SYNCIALO_API_KEY", "NONE")
-    chat_model = ChatOpenAI(**model_kwargs)
+    chat_model = init_chat_model(kwargs["model_kwargs"], api_key=os.getenv("SYNCIALO_API_KEY", "NONE"))
     if "formatter_model_kwargs" in kwargs:
-        formatter_model_kwargs = kwargs["formatter_model_kwargs"]
-        formatter_model_kwargs["api_key"] = os.getenv("SYNCIALO_API_KEY2", "NONE")
-        formatter_model = ChatOpenAI(**formatter_model_kwargs)
+        formatter_model = init_chat_model(
+            kwargs["formatter_model_kwargs"], api_key=os.getenv("SYNCIALO_API_KEY2", "NONE")
+        )
     else:
         formatter_model = chat_model
     return chat_model, formatter_model
 
 
+def init_response_cache(**kwargs) -> SQLiteResponseCache | None:
+    """
+    sets up the (opt-in) persistent LLM response cache shared by all chains,
+    so that a restarted corpus run doesn't pay again for completed LLM calls
+
+    Draft calls (temperature > 0) are cached, too, unless `llm_cache_nondeterministic`
+    is set to False: a formatter call's prompt contains the draft, so if drafts were
+    drawn anew after a restart, cached formatter responses would never match.
+    """
+    if not kwargs.get("llm_cache_path"):
+        return None
+    cache = SQLiteResponseCache(
+        kwargs["llm_cache_path"],
+        ttl=kwargs.get("llm_cache_ttl"),
+        max_entries=kwargs.get("llm_cache_max_entries"),
+    )
+    BaseChainBuilder.set_response_cache(
+        cache, cache_nondeterministic=kwargs.get("llm_cache_nondeterministic", True)
+    )
+    return cache
+
+
+def init_chain_options(**kwargs):
+    """
+    sets how all chains obtain json output: "two_pass" (draft, then formatter call),
+    or "json_object" / "json_schema" (model answers in json right away, formatter
+    is called only if the answer can't be parsed); and how their prompts are laid
+    out: "default", or "static_prefix" (static text first, for prefix caching)
+    """
+    BaseChainBuilder.set_output_mode(kwargs.get("output_mode", "two_pass"))
+    BaseChainBuilder.set_prompt_layout(kwargs.get("prompt_layout", "default"))
+
+
 @task
 def create_corpus_dir(**kwargs) -> Path:
     """
@@ -116,6 +230,10 @@ def create_corpus_dir(**kwargs) -> Path:
                          "inconsistency.")
             raise ValueError("Corpus directory exists, but config file is different")
         logger.info("Found existing corpus directory. Will resume generation.")
+        if not (path / MANIFEST_FILE).exists():
+            logger.info("Corpus manifest missing, rebuilding it from config files.")
+            with CorpusManifest(path / MANIFEST_FILE) as manifest:
+                manifest.sync(path)
     else:
         path.mkdir(parents=True)
         config_path.write_text(yaml.dump(kwargs))
@@ -133,6 +251,9 @@ def add_all_debate_configs(**kwargs):
         SPLIT.EVAL: kwargs["eval_split_size"],
         SPLIT.TEST: kwargs["test_split_size"],
     }
+    manifest = CorpusManifest(kwargs["path"] / MANIFEST_FILE)
+    known_paths = {record["path"] for record in manifest.records()}
+    new_records = []
 
     for split, split_size in split_sizes.items():
         for i in range(split_size):
@@ -157,16 +278,31 @@ def add_all_debate_configs(**kwargs):
                     )
                     logger.error(msg)
                     raise ValueError(msg)
-                continue
+                if str(debate_path.relative_to(kwargs["path"])) in known_paths:
+                    continue
+                # config written, but not recorded in manifest before interruption
+                debate_config = DebateConfig(**yaml.safe_load(config_path.read_text()))
             else:
                 debate_path.mkdir(parents=True)
-            config_path.write_text(yaml.dump(debate_config.model_dump()))
+                config_path.write_text(yaml.dump(debate_config.model_dump()))
+            new_records.append(
+                {"path": str(debate_path.relative_to(kwargs["path"])), "config": debate_config.model_dump()}
+            )
+
+    manifest.put_many(new_records)
+    manifest.close()
 
 
 @task
-def add_all_topics(**kwargs):
+async def add_all_topics(
+    ready: asyncio.Queue | None = None, models: tuple[BaseChatModel, BaseChatModel] | None = None, **kwargs
+):
     """
     adds tags and topics to the corpus' debates
+
+    the manifest records of debates with new topics are put in the `ready` queue
+    (if given), followed by None once all topics have been added; `models` are
+    the (chat and formatter) models shared by all stages, see `init_models`
     """
     logger = get_run_logger()
 
@@ -182,7 +318,7 @@ def add_all_topics(**kwargs):
     test_tags = [tag.rstrip() for tag in test_tags]
     logger.debug(f"Read {len(test_tags)} test tags")
 
-    chat_model, formatter_model = init_models(**kwargs)
+    chat_model, formatter_model = models or init_models(**kwargs)
     suggest_topics_chain = SuggestTopicsChain.build(chat_model, llm_formatting=formatter_model)
 
     def sample_tags(_split: SPLIT) -> list[str]:
@@ -199,113 +335,240 @@ def add_all_topics(**kwargs):
         random.shuffle(tags)
         return tags
 
+    manifest = CorpusManifest(kwargs["path"] / MANIFEST_FILE)
+    pending: list[dict] = []
     for split in [SPLIT.TRAIN, SPLIT.EVAL, SPLIT.TEST]:
         if not (kwargs["path"]/split.value).exists():
             logger.info(f"Will not generate topics for split {split.value}.")
             continue
-        logger.info(f"Adding topics to debates in {split} split...")
-        topic_suggestions = []
-        for debate_path in (kwargs["path"] / split.value).iterdir():
-            if not debate_path.is_dir():
-                continue
-            config_path: Path = debate_path / "config.yaml"
-            if not config_path.exists():
-                logger.warning(f"Config file missing for {str(debate_path)}. Skipping this directory.")
-                continue
-            debate_config = DebateConfig(**yaml.safe_load(config_path.read_text()))
-            if debate_config.topic:
-                continue
-            if not topic_suggestions:
-                tags = sample_tags(split)
-                topic_suggestions = suggest_topics_chain.invoke({
-                    "tags": tags,
-                    "debates_per_tag_cluster": kwargs["debates_per_tag_cluster"]
-                })
-            debate_config.tags = tags
-            debate_config.topic = topic_suggestions.pop()["topic"]
-            config_path.write_text(yaml.dump(debate_config.model_dump()))
+        pending.extend(manifest.records(split=split.value, stage="config"))
+
+    try:
+        await _add_topics(pending, sample_tags, suggest_topics_chain, manifest, ready, **kwargs)
+    finally:
+        manifest.close()
+        if ready is not None:
+            ready.put_nowait(None)
+
+
+async def _add_topics(
+    pending: list[dict],
+    sample_tags: Callable[[SPLIT], list[str]],
+    suggest_topics_chain: Runnable,
+    manifest: CorpusManifest,
+    ready: asyncio.Queue | None,
+    **kwargs,
+):
+    """adds topics to the pending debates, in rounds of tag clusters (see `add_all_topics`)"""
+    logger = get_run_logger()
+    max_concurrency = kwargs.get("max_concurrent_suggestions", _MAX_CONCURRENT_SUGGESTIONS)
+    debates_per_tag_cluster = kwargs["debates_per_tag_cluster"]
+
+    while pending:
+        logger.info(f"Adding topics to {len(pending)} debates...")
+        # one tag cluster (and topic suggestion) per `debates_per_tag_cluster` debates of the same split
+        clusters: list[list[dict]] = []
+        for record in pending:
+            if (
+                clusters
+                and clusters[-1][0]["config"]["split"] == record["config"]["split"]
+                and len(clusters[-1]) < debates_per_tag_cluster
+            ):
+                clusters[-1].append(record)
+            else:
+                clusters.append([record])
+        inputs = [
+            {
+                "tags": sample_tags(SPLIT(cluster[0]["config"]["split"])),
+                "debates_per_tag_cluster": debates_per_tag_cluster,
+            }
+            for cluster in clusters
+        ]
+        # configs are written as soon as the topics of a cluster arrive
+        async for idx, topic_suggestions in suggest_topics_chain.abatch_as_completed(
+            inputs, config={"max_concurrency": max_concurrency}
+        ):
+            for record, topic_suggestion in zip(clusters[idx], reversed(topic_suggestions)):
+                debate_config = DebateConfig(**record["config"])
+                debate_config.tags = inputs[idx]["tags"]
+                debate_config.topic = topic_suggestion["topic"]
+                (kwargs["path"] / record["path"] / "config.yaml").write_text(yaml.dump(debate_config.model_dump()))
+                manifest.put(record["path"], debate_config.model_dump())
+                if ready is not None:
+                    ready.put_nowait({"path": record["path"], "config": debate_config.model_dump()})
+
+        # debates left over if fewer topics than requested have been suggested
+        pending_paths = {record["path"] for record in pending}
+        remaining = [record for record in manifest.records(stage="config") if record["path"] in pending_paths]
+        if len(remaining) == len(pending):
+            msg = "No topics suggested for remaining debates."
+            logger.error(msg)
+            raise ValueError(msg)
+        pending = remaining
+
+
+async def run_stage(inbox: asyncio.Queue, process: Callable[[dict], Awaitable[None]], max_concurrency: int):
+    """
+    processes the items put in `inbox` (until closed by None) as they arrive,
+    with up to `max_concurrency` concurrent calls of `process`
+    """
+    async def worker():
+        while True:
+            item = await inbox.get()
+            if item is None:
+                # let the other workers know that the inbox is closed
+                inbox.put_nowait(None)
+                return
+            await process(item)
+
+    await asyncio.gather(*[worker() for _ in range(max_concurrency)])
 
 
 @task
-def add_all_motions(**kwargs):
+async def add_all_motions(
+    inbox: asyncio.Queue | None = None,
+    ready: asyncio.Queue | None = None,
+    models: tuple[BaseChatModel, BaseChatModel] | None = None,
+    **kwargs,
+):
     """
     adds topics and motions to the corpus' debates
+
+    besides the debates that already have topics, motions are added to the
+    debates whose manifest records are put in the `inbox` queue (if given, closed
+    by None) while adding motions; the paths of debates with new motions are put
+    in the `ready` queue (if given), followed by None once all motions have been added;
+    `models` are the (chat and formatter) models shared by all stages, see `init_models`
     """
     logger = get_run_logger()
 
-    chat_model, formatter_model = init_models(**kwargs)
+    chat_model, formatter_model = models or init_models(**kwargs)
     suggest_motion_chain = SuggestMotionChain.build(chat_model, llm_formatting=formatter_model)
-
-    for split in [SPLIT.TRAIN, SPLIT.EVAL, SPLIT.TEST]:
-        if not (kwargs["path"]/split.value).exists():
-            logger.info(f"Will not generate motions for split {split.value}.")
-            continue
-        logger.info(f"Adding motions to debates in {split} split...")
-        for debate_path in (kwargs["path"] / split.value).iterdir():
-            if not debate_path.is_dir():
-                continue
-            config_path: Path = debate_path / "config.yaml"
-            if not config_path.exists():
-                logger.warning(f"Config file missing for {str(debate_path)}. Skipping this directory.")
-                continue
-            debate_config = DebateConfig(**yaml.safe_load(config_path.read_text()))
-            if debate_config.motion:
-                logger.debug(f"Motion already exists for {str(debate_path)}. Skipping.")
-                continue
-            motion = suggest_motion_chain.invoke({
-                "tags": debate_config.tags,
-                "topic": debate_config.topic,
-            })
-            if not (isinstance(motion, dict) and "title" in motion and "motion" in motion):
-                msg = f"Invalid motion suggestion for {str(debate_path)}: {motion}"
-                logger.error(msg)
-                raise ValueError(msg)
-            debate_config.motion = {"label": motion["title"], "claim": motion["motion"]}
-            config_path.write_text(yaml.dump(debate_config.model_dump()))
+    manifest = CorpusManifest(kwargs["path"] / MANIFEST_FILE)
+    max_concurrency = kwargs.get(
+        "max_concurrent_motions", kwargs.get("max_concurrent_suggestions", _MAX_CONCURRENT_SUGGESTIONS)
+    )
+    seen: set[str] = set()
+
+    async def add_motion(record: dict):
+        if record["path"] in seen:
+            return
+        seen.add(record["path"])
+        debate_path: Path = kwargs["path"] / record["path"]
+        motion = await suggest_motion_chain.ainvoke({
+            "tags": record["config"]["tags"],
+            "topic": record["config"]["topic"],
+        })
+        if not (isinstance(motion, dict) and "title" in motion and "motion" in motion):
+            msg = f"Invalid motion suggestion for {str(debate_path)}: {motion}"
+            logger.error(msg)
+            raise ValueError(msg)
+        debate_config = DebateConfig(**record["config"])
+        debate_config.motion = {"label": motion["title"], "claim": motion["motion"]}
+        (debate_path / "config.yaml").write_text(yaml.dump(debate_config.model_dump()))
+        manifest.put(record["path"], debate_config.model_dump())
+        if ready is not None:
+            ready.put_nowait(debate_path)
+
+    async def forward_inbox(queue: asyncio.Queue):
+        if inbox is not None:
+            while (record := await inbox.get()) is not None:
+                queue.put_nowait(record)
+        queue.put_nowait(None)
+
+    try:
+        queue: asyncio.Queue = asyncio.Queue()
+        records = manifest.records(stage="topic")
+        logger.info(f"Adding motions to {len(records)} debates...")
+        for record in records:
+            queue.put_nowait(record)
+        # configs are written as soon as a debate's motion arrives
+        await asyncio.gather(forward_inbox(queue), run_stage(queue, add_motion, max_concurrency))
+    finally:
+        manifest.close()
+        if ready is not None:
+            ready.put_nowait(None)
 
 
 def get_missing_debates(**kwargs):
     """
-    yields debate paths in the corpus for which debates haven't been generated yet
+    yields debate paths in the corpus for which motions, but no debates have been generated yet
     """
-    logger = get_run_logger()
-
-    for split in [SPLIT.TRAIN, SPLIT.EVAL, SPLIT.TEST]:
-        if not (kwargs["path"]/split.value).exists():
-            logger.info(f"Will not generate debates for split {split.value}.")
-            continue
-        for debate_path in (kwargs["path"] / split.value).iterdir():
-            if not debate_path.is_dir():
-                continue
-            config_path: Path = debate_path / "config.yaml"
-            if config_path.exists() and not any(debate_path.glob("*.json")):
-                yield debate_path
+    with CorpusManifest(kwargs["path"] / MANIFEST_FILE) as manifest:
+        records = manifest.records(stage="motion")
+    for record in records:
+        yield kwargs["path"] / record["path"]
 
 
-@task
-async def generate_single_debate(debate_path: Path, **kwargs) -> nx.DiGraph:
+def init_debate_builder(models: tuple[BaseChatModel, BaseChatModel] | None = None, **kwargs) -> DebateBuilder:
     """
-    generates a debate
+    initializes a DebateBuilder that is shared by all debates of a corpus run:
+    models, chains and persona data are loaded only once
     """
     tags_universal = Path(kwargs["universal_tags_path"]).read_text().split("\n")
-    debate_config = DebateConfig(**yaml.safe_load((debate_path / "config.yaml").read_text()))
-
-    chat_model, formatter_model = init_models(**kwargs)
-    debateBuilder = DebateBuilder(
+    chat_model, formatter_model = models or init_models(**kwargs)
+    return DebateBuilder(
         model=chat_model,
         formatter_model=formatter_model,
         tags_universal=tags_universal,
         tags_per_cluster=kwargs["tags_per_cluster"],
+        expansion_mode=kwargs.get("expansion_mode", "depth_first"),
+        max_concurrent_expansions=kwargs.get("max_concurrent_expansions", 8),
+        ranking_mode=kwargs.get("ranking_mode", "per_persona"),
+        ranking_personas=kwargs.get("ranking_personas", 3),
+        speculative_personas=kwargs.get("speculative_personas", 0),
     )
-    built_debate: nx.DiGraph = await debateBuilder.build_debate(
+
+
+def get_journal_path(debate_path: Path, debate_config: DebateConfig) -> Path:
+    """
+    path of the journal in which a debate is checkpointed while being built,
+    so that an interrupted debate resumes mid-tree
+    """
+    return debate_path / f"journal-{debate_config.debate_uid}.jsonl"
+
+
+@task
+async def generate_single_debate(debate_path: Path, debate_builder: DebateBuilder, **kwargs) -> nx.DiGraph:
+    """
+    generates a debate
+    """
+    debate_config = DebateConfig(**yaml.safe_load((debate_path / "config.yaml").read_text()))
+
+    built_debate: nx.DiGraph = await debate_builder.build_debate(
         motion=debate_config.motion,
         topic=debate_config.topic,
         tag_cluster=debate_config.tags,
         degree_config=debate_config.degree_config,
+        journal_path=get_journal_path(debate_path, debate_config),
     )
     return built_debate
 
 
+def write_debate(corpus_path: Path, debate_path: Path, debate: nx.DiGraph):
+    """
+    writes debate as node-link json (atomically, so that concurrent
+    workers never leave partial or duplicate outputs), and records
+    it in the corpus manifest
+    """
+    debate_config = DebateConfig(**yaml.safe_load((debate_path / "config.yaml").read_text()))
+    node_link_data = nx.node_link_data(debate)
+    json_path = debate_path / f"node_link_data-{debate_config.debate_uid}.json"
+    tmp_path = debate_path / f".{json_path.name}.tmp-{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        ujson.dump(node_link_data, f)
+    os.replace(tmp_path, json_path)
+    with CorpusManifest(corpus_path / MANIFEST_FILE) as manifest:
+        manifest.put(
+            str(debate_path.relative_to(corpus_path)),
+            debate_config.model_dump(),
+            graph_file=json_path.name,
+            graph_hash=file_hash(json_path),
+        )
+    # debate is complete, checkpoint journal no longer needed
+    get_journal_path(debate_path, debate_config).unlink(missing_ok=True)
+
+
 @task
 def save_debates_in_corpus(debate_paths: list[Path], debates: list[nx.DiGraph], **kwargs):
     """
@@ -321,31 +584,253 @@ def save_debates_in_corpus(debate_paths: list[Path], debates: list[nx.DiGraph],
         raise ValueError(msg)
 
     for debate_path, debate in zip(debate_paths, debates):
-        debate_config = DebateConfig(**yaml.safe_load((debate_path / "config.yaml").read_text()))
-        node_link_data = nx.node_link_data(debate)
-        with open(debate_path / f"node_link_data-{debate_config.debate_uid}.json", "w") as f:
-            ujson.dump(node_link_data, f)
+        write_debate(kwargs["path"], debate_path, debate)
 
 
-async def add_all_debates(**kwargs):
+async def run_debates(
+    next_debate_path: Callable[[], Path | None],
+    on_finished: Callable[[Path, nx.DiGraph | None, BaseException | None], None],
+    debate_builder: DebateBuilder,
+    in_flight: dict[asyncio.Task, Path] | None = None,
+    ready: asyncio.Queue | None = None,
+    **kwargs,
+):
     """
-    adds all debates to the corpus
+    keeps up to `max_concurrent_debates` (kwarg) debates in flight, starting the next
+    debate (as returned by `next_debate_path`) as soon as a slot frees up, and
+    hands every finished (or failed) debate to `on_finished`
+
+    `in_flight` (if given) is kept up to date with the debate tasks in flight,
+    so that callers can monitor them
+
+    `ready` (if given) is a queue of further debates that become ready while
+    debates are being generated (e.g., as their motions arrive), closed by None;
+    debates from the queue are started at most once (but debates returned by
+    `next_debate_path` are always started, as they may be retries)
     """
-    logger = get_run_logger()
+    if in_flight is None:
+        in_flight = {}
+    max_concurrent_debates = kwargs.get("max_concurrent_debates", _MAX_CONCURRENT_DEBATES)
+    arrived: deque[Path] = deque()
+    started: set[Path] = set()
+    started_from_queue: set[Path] = set()
+    get_ready: asyncio.Task | None = None
 
     while True:
-        missing_debates = get_missing_debates(**kwargs)
-        debate_paths: list[Path] = [next(missing_debates, None) for _ in range(_BATCH_SIZE)]
-        debate_paths = [p for p in debate_paths if p]
-        logger.debug(f"Next {len(debate_paths)} missing debates: {debate_paths}")
-        if not debate_paths:
+        while len(in_flight) < max_concurrent_debates:
+            if arrived:
+                debate_path = arrived.popleft()
+                if debate_path in started:
+                    continue
+                started_from_queue.add(debate_path)
+            else:
+                debate_path = next_debate_path()
+                if debate_path is None:
+                    break
+                if debate_path in started_from_queue:
+                    continue
+            started.add(debate_path)
+            task = asyncio.ensure_future(
+                generate_single_debate.fn(debate_path=debate_path, debate_builder=debate_builder, **kwargs)
+            )
+            in_flight[task] = debate_path
+        if ready is not None and get_ready is None:
+            get_ready = asyncio.ensure_future(ready.get())
+        if not in_flight and get_ready is None:
             break
-        coros = [generate_single_debate(debate_path=debate_path, **kwargs) for debate_path in debate_paths]
-        save_debates_in_corpus(
-            debate_paths=debate_paths,
-            debates=await asyncio.gather(*coros),
-            **kwargs
+
+        done, _ = await asyncio.wait(
+            [*in_flight, get_ready] if get_ready is not None else in_flight,
+            return_when=asyncio.FIRST_COMPLETED,
         )
+        if get_ready in done:
+            done.discard(get_ready)
+            debate_path = get_ready.result()
+            get_ready = None
+            if debate_path is None:
+                ready = None
+            else:
+                arrived.append(debate_path)
+        for task in done:
+            debate_path = in_flight.pop(task)
+            if task.cancelled():
+                on_finished(debate_path, None, asyncio.CancelledError())
+            elif task.exception() is not None:
+                on_finished(debate_path, None, task.exception())
+            else:
+                on_finished(debate_path, task.result(), None)
+
+
+async def add_all_debates(
+    ready: asyncio.Queue | None = None, models: tuple[BaseChatModel, BaseChatModel] | None = None, **kwargs
+):
+    """
+    adds all debates to the corpus
+
+    keeps up to `max_concurrent_debates` debates in flight, starts the next
+    missing debate as soon as a slot frees up, and saves every debate as soon
+    as it is finished; debates put in the `ready` queue while generating (see
+    `add_all_motions`) are added as well
+
+    with `num_workers` > 1, debates are generated by as many worker processes
+    instead, which pull debates from a shared task ledger (see `run_debate_worker`)
+    and initialize their own models
+    """
+    logger = get_run_logger()
+
+    if kwargs.get("num_workers", 1) > 1:
+        await run_worker_processes(**kwargs)
+        return
+
+    debate_builder = init_debate_builder(models=models, **kwargs)
+
+    # scan corpus once, then keep track of pending debates in memory
+    pending: deque[Path] = deque(get_missing_debates(**kwargs))
+    logger.info(f"Found {len(pending)} missing debates.")
+    in_flight: dict[asyncio.Task, Path] = {}
+
+    def on_finished(debate_path: Path, debate: nx.DiGraph | None, error: BaseException | None):
+        if error is not None:
+            logger.error(f"Failed to generate debate {debate_path}: {error!r}")
+            return
+        save_debates_in_corpus(debate_paths=[debate_path], debates=[debate], **kwargs)
+        logger.info(f"Saved debate {debate_path} ({len(pending) + len(in_flight)} remaining).")
+        if kwargs.get("pipeline_mode") == "streaming":
+            # validate every debate right away, rather than waiting for the final sanity checks
+            with CorpusManifest(kwargs["path"] / MANIFEST_FILE) as manifest:
+                record = manifest.get(str(debate_path.relative_to(kwargs["path"])))
+            try:
+                check_debate(kwargs["path"], record)
+            except ValueError as e:
+                logger.error(str(e))
+
+    await run_debates(
+        next_debate_path=lambda: pending.popleft() if pending else None,
+        on_finished=on_finished,
+        debate_builder=debate_builder,
+        in_flight=in_flight,
+        ready=ready,
+        **kwargs,
+    )
+
+    await get_classifier_client().aclose()
+
+
+async def run_worker_processes(**kwargs):
+    """
+    registers all missing debates in the corpus' task ledger and
+    runs `num_workers` worker processes that generate them
+    """
+    logger = get_run_logger()
+
+    ledger = TaskLedger(kwargs["path"] / _LEDGER_FILE)
+    ledger.add_tasks(
+        str(debate_path.relative_to(kwargs["path"])) for debate_path in get_missing_debates(**kwargs)
+    )
+    logger.info(f"Task ledger: {ledger.counts()}")
+    ledger.close()
+
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=debate_worker_main, kwargs=kwargs, daemon=False)
+        for _ in range(kwargs["num_workers"])
+    ]
+    for worker in workers:
+        worker.start()
+    await asyncio.gather(*[asyncio.to_thread(worker.join) for worker in workers])
+
+    ledger = TaskLedger(kwargs["path"] / _LEDGER_FILE)
+    logger.info(f"All workers finished. Task ledger: {ledger.counts()}")
+    ledger.close()
+
+
+async def run_debate_worker(**kwargs):
+    """
+    generates debates until the corpus' task ledger has no more pending tasks
+
+    Each worker leases debates from the ledger, renews the leases while building
+    the debates, and marks debates as done once they have been saved. Workers may
+    run in several processes, and on several hosts that share the corpus directory.
+    """
+    path = Path(kwargs["path"])
+    ledger = TaskLedger(path / _LEDGER_FILE, lease_duration=kwargs.get("lease_duration", _LEASE_DURATION))
+    logger.info(f"Starting debate worker {ledger.worker_id}")
+
+    init_response_cache(**kwargs)
+    init_chain_options(**kwargs)
+    init_rate_limits(**kwargs)
+    debate_builder = init_debate_builder(**kwargs)
+    in_flight: dict[asyncio.Task, Path] = {}
+
+    def next_debate_path() -> Path | None:
+        task_id = ledger.claim()
+        return path / task_id if task_id is not None else None
+
+    def on_finished(debate_path: Path, debate: nx.DiGraph | None, error: BaseException | None):
+        task_id = str(debate_path.relative_to(path))
+        if error is not None:
+            logger.error(f"Failed to generate debate {debate_path}: {error!r}")
+            ledger.release(task_id, failed=True)
+            return
+        if not ledger.holds_lease(task_id):
+            logger.warning(f"Lost lease on {debate_path}, discarding result.")
+            return
+        write_debate(path, debate_path, debate)
+        ledger.complete(task_id)
+        logger.info(f"Saved debate {debate_path}. Task ledger: {ledger.counts()}")
+
+    async def renew_leases():
+        while True:
+            await asyncio.sleep(ledger.lease_duration / 3)
+            for task, debate_path in list(in_flight.items()):
+                if not ledger.renew(str(debate_path.relative_to(path))):
+                    logger.warning(f"Lost lease on {debate_path}, cancelling.")
+                    task.cancel()
+
+    heartbeat = asyncio.create_task(renew_leases())
+    try:
+        await run_debates(
+            next_debate_path=next_debate_path,
+            on_finished=on_finished,
+            debate_builder=debate_builder,
+            in_flight=in_flight,
+            **kwargs,
+        )
+    finally:
+        heartbeat.cancel()
+        ledger.close()
+        await get_classifier_client().aclose()
+        logger.info(f"Formatter calls (called/avoided) per chain: {BaseChainBuilder.formatter_stats()}")
+
+
+def debate_worker_main(**kwargs):
+    """entry point of worker processes"""
+    dotenv.load_dotenv()
+    asyncio.run(run_debate_worker(**kwargs))
+
+
+def check_debate(corpus_path: Path, record: dict):
+    """
+    checks config and debate json of a debate (as recorded in the corpus manifest),
+    raises ValueError if invalid
+    """
+    debate_path: Path = corpus_path / record["path"]
+    try:
+        DebateConfig(**record["config"])
+    except Exception as e:
+        raise ValueError(f"Invalid config for {str(debate_path)}: {str(e)}")
+
+    if record["stage"] != "debate":
+        raise ValueError(f"Debate json missing for {str(debate_path)}")
+    json_path: Path = debate_path / record["graph_file"]
+    try:
+        content = json_path.read_bytes()
+        if record["graph_hash"] and hashlib.sha1(content).hexdigest() != record["graph_hash"]:
+            raise ValueError("hash does not match corpus manifest")
+        node_link_data = ujson.decode(content)
+        nx.node_link_graph(node_link_data)
+    except Exception as e:
+        raise ValueError(f"Invalid debate json for {str(debate_path)}: {str(e)}")
 
 
 @task
@@ -357,46 +842,22 @@ def perform_sanity_checks(**kwargs):
 
     # check for each split if all debates are generated
     debates_counter = {SPLIT.TRAIN: 0, SPLIT.EVAL: 0, SPLIT.TEST: 0}
+    manifest = CorpusManifest(kwargs["path"] / MANIFEST_FILE)
 
     for split in [SPLIT.TRAIN, SPLIT.EVAL, SPLIT.TEST]:
-        if not (kwargs["path"]/split.value).exists():
-            logger.debug(f"No split directory {split.value}.")
-            continue
-        for debate_path in (kwargs["path"] / split.value).iterdir():
-            if not debate_path.is_dir():
-                continue
-
-            config_path: Path = debate_path / "config.yaml"
-            if not config_path.exists():
-                logger.error(f"Config file missing for {str(debate_path)}.")
-                raise ValueError(f"Config file missing for {str(debate_path)}")
+        for record in manifest.records(split=split.value):
+            debate_path: Path = kwargs["path"] / record["path"]
             try:
-                DebateConfig(**yaml.safe_load(config_path.read_text()))
-            except Exception as e:
-                msg = f"Invalid config file for {str(debate_path)}: {str(e)}"
-                logger.error(msg)
-                raise ValueError(msg)
-
-            json_files: list[Path] = list(debate_path.glob("*.json"))
-            if not json_files:
-                msg = f"Debate json missing for {str(debate_path)}"
-                logger.error(msg)
-                raise ValueError(msg)
-            if len(json_files) > 1:
-                msg = f"Multiple (debate?) json files found for {str(debate_path)}"
-                logger.error(msg)
-                raise ValueError(msg)
-            try:
-                node_link_data = ujson.decode(json_files[0].read_text())
-                nx.node_link_graph(node_link_data)
-            except Exception as e:
-                msg = f"Invalid debate json for {str(debate_path)}: {str(e)}"
-                logger.error(msg)
-                raise ValueError(msg)
+                check_debate(kwargs["path"], record)
+            except ValueError as e:
+                logger.error(str(e))
+                raise
             logger.info(f"✅ Checks passed: {str(debate_path)}")
 
             debates_counter[split] += 1
 
+    manifest.close()
+
     for (split, expected_size) in zip(
         [SPLIT.TRAIN, SPLIT.EVAL, SPLIT.TEST],
         [kwargs["train_split_size"], kwargs["eval_split_size"], kwargs["test_split_size"]],
@@ -411,6 +872,16 @@ def perform_sanity_checks(**kwargs):
             raise ValueError(msg)
 
 
+@task
+def export_columnar(**kwargs):
+    """
+    packs the corpus into sharded columnar tables (alongside the per-debate json files)
+    """
+    logger = get_run_logger()
+    output_dir = export_columnar_corpus(kwargs["path"], format=kwargs["columnar_format"])
+    logger.info(f"Exported corpus as {kwargs['columnar_format']} tables to {output_dir}.")
+
+
 @task
 def upload_to_hf_hub(**kwargs):
     """
@@ -425,51 +896,89 @@ async def synthetic_corpus_generation(**kwargs):
     """
     Workflow for generating a synthetic corpus
     """
+    logger = get_run_logger()
     check_kwargs(**kwargs)
+    response_cache = init_response_cache(**kwargs)
+    init_chain_options(**kwargs)
+    init_rate_limits(**kwargs)
+    # models are shared by all stages, so that their routers balance the stages' joint load
+    models = init_models(**kwargs)
     path = create_corpus_dir(**kwargs)
     add_all_debate_configs(path=path, **kwargs)
-    add_all_topics(path=path, **kwargs)
-    add_all_motions(path=path, **kwargs)
-    await add_all_debates(path=path, **kwargs)
+    if kwargs.get("num_workers", 1) > 1:
+        await add_all_topics(path=path, models=models, **kwargs)
+        await add_all_motions(path=path, models=models, **kwargs)
+        await add_all_debates(path=path, **kwargs)
+    elif kwargs.get("pipeline_mode", "staged") == "streaming":
+        # every debate moves on to the next stage as soon as its previous stage is done
+        topics_ready: asyncio.Queue = asyncio.Queue()
+        motions_ready: asyncio.Queue = asyncio.Queue()
+        await asyncio.gather(
+            add_all_topics(path=path, ready=topics_ready, models=models, **kwargs),
+            add_all_motions(path=path, inbox=topics_ready, ready=motions_ready, models=models, **kwargs),
+            add_all_debates(path=path, ready=motions_ready, models=models, **kwargs),
+        )
+    else:
+        await add_all_topics(path=path, models=models, **kwargs)
+        # debates are built as soon as their motions are available
+        motions_ready: asyncio.Queue = asyncio.Queue()
+        await asyncio.gather(
+            add_all_motions(path=path, ready=motions_ready, models=models, **kwargs),
+            add_all_debates(path=path, ready=motions_ready, models=models, **kwargs),
+        )
     perform_sanity_checks(path=path, **kwargs)
+    if kwargs.get("columnar_format"):
+        export_columnar(path=path, **kwargs)
     if "hf_hub" in kwargs:
         upload_to_hf_hub(path=path, **kwargs)
+    if response_cache is not None:
+        logger.info(f"LLM response cache stats: {response_cache.stats()}")
+    logger.info(f"Formatter calls (called/avoided) per chain: {BaseChainBuilder.formatter_stats()}")
 
 
 if __name__ == "__main__":
 
     dotenv.load_dotenv()
 
-    asyncio.run(
-        synthetic_corpus_generation(
-            corpus_uid="synthetic_corpus-TEST-005",
-            universal_tags_path=_UNIVERSAL_TAGS_PATH,
-            eval_tags_path=_EVAL_TAGS_PATH,
-            test_tags_path=_TEST_TAGS_PATH,
-            tags_per_cluster=8,
-            debates_per_tag_cluster=5,
-            train_split_size=10,
-            eval_split_size=0,
-            test_split_size=0,
-            degree_configs=[
-                # [6, 6, 1, 0],
-                # [5, 5, 2, 0],
-                # [3, 2, 2, 1, 1, 0],
-                [2, 1, 0],
-                [1, 2, 0],
-            ],
-            output_dir="./output",
-            model_kwargs={
-                "model": "meta-llama/Llama-3.1-405B-Instruct-FP8",
-                "base_url": "https://huggingface.co/api/integrations/dgx/v1",
-            },
-            formatter_model_kwargs={
-                "model": "meta-llama/Llama-3.1-8B-Instruct",
-                "base_url": "https://huggingface.co/api/integrations/dgx/v1",
-            },
-        )
+    corpus_kwargs = dict(
+        corpus_uid="synthetic_corpus-TEST-005",
+        universal_tags_path=_UNIVERSAL_TAGS_PATH,
+        eval_tags_path=_EVAL_TAGS_PATH,
+        test_tags_path=_TEST_TAGS_PATH,
+        tags_per_cluster=8,
+        debates_per_tag_cluster=5,
+        train_split_size=10,
+        eval_split_size=0,
+        test_split_size=0,
+        degree_configs=[
+            # [6, 6, 1, 0],
+            # [5, 5, 2, 0],
+            # [3, 2, 2, 1, 1, 0],
+            [2, 1, 0],
+            [1, 2, 0],
+        ],
+        output_dir="./output",
+        model_kwargs={
+            "model": "meta-llama/Llama-3.1-405B-Instruct-FP8",
+            "base_url": "https://huggingface.co/api/integrations/dgx/v1",
+        },
+        formatter_model_kwargs={
+            "model": "meta-llama/Llama-3.1-8B-Instruct",
+            "base_url": "https://huggingface.co/api/integrations/dgx/v1",
+        },
     )
 
+    if "--worker" in sys.argv:
+        # join a multi-worker corpus run (num_workers > 1), e.g. from another
+        # host that shares the output directory
+        asyncio.run(
+            run_debate_worker(
+                path=Path(corpus_kwargs["output_dir"]) / corpus_kwargs["corpus_uid"], **corpus_kwargs
+            )
+        )
+    else:
+        asyncio.run(synthetic_corpus_generation(**corpus_kwargs))
+
 #    asyncio.run(
 #        synthetic_corpus_generation(
 #            corpus_uid="synthetic_corpus-001",
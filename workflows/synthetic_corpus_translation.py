@@ -6,6 +6,7 @@ import asyncio
 import json
 import dotenv
 import enum
+import hashlib
 from pathlib import Path
 import yaml
 import ujson
@@ -14,6 +15,8 @@ from huggingface_hub import HfApi
 from loguru import logger
 import networkx as nx
 from pydantic import BaseModel
+from syncialo.corpus import CorpusReader
+from syncialo.manifest import MANIFEST_FILE, CorpusManifest, file_hash
 from syncialo.translation import Language, translate_argmap
 
 
@@ -86,6 +89,12 @@ def parse_args():
     parser.add_argument(
         "--failed-to-complete-flag", type=str, help="Remove flag after completion"
     )
+    parser.add_argument(
+        "--max-concurrent-translations",
+        type=int,
+        default=16,
+        help="Maximum number of nodes per debate that are translated concurrently",
+    )
     args = parser.parse_args()
     return args
 
@@ -113,6 +122,10 @@ def create_corpus_dir(**kwargs) -> tuple[Path, Path]:
         logger.info(
             f"Found existing corpus directory {target_path} for translation. Will resume."
         )
+        if not (target_path / MANIFEST_FILE).exists():
+            logger.info("Corpus manifest missing, rebuilding it from config files.")
+            with CorpusManifest(target_path / MANIFEST_FILE) as manifest:
+                manifest.sync(target_path)
     else:
         logger.info(f"Creating new corpus directory {target_path} for translation.")
         target_path.mkdir(parents=True)
@@ -130,40 +143,43 @@ def add_all_debate_configs(**kwargs):
     creates the target debate configurations
     """
 
-    for split in SPLIT:
-        for source_config_path in Path(kwargs["source_path"] / split.value).glob("**/config.yaml"):
-            debate_config = DebateConfig(
-                **yaml.safe_load(source_config_path.read_text())
-            )
-            source_debate_uid = debate_config.debate_uid
-            debate_config.corpus_uid = kwargs["target_corpus_uid"]
-            debate_config.debate_uid = f"{source_debate_uid}-{kwargs['target_language']}"
-            relative_path = source_config_path.relative_to(kwargs["source_path"])            
-            target_config_path = Path(kwargs["target_path"] / (str(relative_path)).replace(source_debate_uid, debate_config.debate_uid))
-            if target_config_path.exists():
-                continue
-            target_config_path.parent.mkdir(parents=True, exist_ok=True)
-            target_config_path.write_text(yaml.dump(debate_config.model_dump()))
-            source_json_path = next(source_config_path.parent.glob("*.json"))
-            target_json_path = target_config_path.parent / _TMP_DEBATE_FILE
-            target_json_path.write_text(source_json_path.read_text())
+    manifest = CorpusManifest(kwargs["target_path"] / MANIFEST_FILE)
+    known_paths = {record["path"] for record in manifest.records()}
+    new_records = []
+
+    for source_record in CorpusReader(kwargs["source_path"]).records():
+        debate_config = DebateConfig(**source_record["config"])
+        source_debate_uid = debate_config.debate_uid
+        debate_config.corpus_uid = kwargs["target_corpus_uid"]
+        debate_config.debate_uid = f"{source_debate_uid}-{kwargs['target_language']}"
+        relative_path = source_record["path"].replace(source_debate_uid, debate_config.debate_uid)
+        if relative_path in known_paths:
+            continue
+        if not source_record["graph_file"]:
+            msg = f"Debate json missing for source debate {source_record['path']}"
+            logger.error(msg)
+            raise FileNotFoundError(msg)
+        target_debate_path = Path(kwargs["target_path"]) / relative_path
+        target_debate_path.mkdir(parents=True, exist_ok=True)
+        (target_debate_path / "config.yaml").write_text(yaml.dump(debate_config.model_dump()))
+        source_json_path = Path(kwargs["source_path"]) / source_record["path"] / source_record["graph_file"]
+        target_json_path = target_debate_path / _TMP_DEBATE_FILE
+        target_json_path.write_text(source_json_path.read_text())
+        new_records.append({"path": relative_path, "config": debate_config.model_dump()})
+
+    manifest.put_many(new_records)
+    manifest.close()
 
 
 def get_missing_debates(**kwargs):
     """
     yields debate paths in the corpus for which debates haven't been translated yet
-    as indicated by the presence of a _TMP_DEBATE_FILE file
+    (i.e., the source debate has been copied to a _TMP_DEBATE_FILE file)
     """
-
-    for split in [SPLIT.TRAIN, SPLIT.EVAL, SPLIT.TEST]:
-        if not (kwargs["target_path"] / split.value).exists():
-            continue
-        for debate_path in (kwargs["target_path"] / split.value).iterdir():
-            if not debate_path.is_dir():
-                continue
-            config_path: Path = debate_path / "config.yaml"
-            if config_path.exists() and any(_TMP_DEBATE_FILE in str(p) for p in debate_path.glob("*.json")):
-                yield debate_path
+    with CorpusManifest(kwargs["target_path"] / MANIFEST_FILE) as manifest:
+        records = manifest.records(stage=["config", "topic", "motion"])
+    for record in records:
+        yield kwargs["target_path"] / record["path"]
 
 
 async def translate_single_debate(debate_path: Path, **kwargs) -> nx.DiGraph | None:
@@ -197,6 +213,7 @@ def save_debates_in_corpus(
         logger.error(msg)
         raise ValueError(msg)
 
+    manifest = CorpusManifest(kwargs["target_path"] / MANIFEST_FILE)
     for debate_path, debate in zip(debate_paths, debates):
         if isinstance(debate, Exception):
             logger.error(f"Failed to translate debate {debate_path}: {str(debate)}")
@@ -205,11 +222,17 @@ def save_debates_in_corpus(
             **yaml.safe_load((debate_path / "config.yaml").read_text())
         )
         node_link_data = nx.node_link_data(debate)
-        with open(
-            debate_path / f"node_link_data-{debate_config.debate_uid}.json", "w"
-        ) as f:
+        json_path = debate_path / f"node_link_data-{debate_config.debate_uid}.json"
+        with open(json_path, "w") as f:
             ujson.dump(node_link_data, f)
+        manifest.put(
+            str(debate_path.relative_to(kwargs["target_path"])),
+            debate_config.model_dump(),
+            graph_file=json_path.name,
+            graph_hash=file_hash(json_path),
+        )
         (debate_path / _TMP_DEBATE_FILE).unlink()
+    manifest.close()
 
 
 async def translate_all_debates(**kwargs):
@@ -249,32 +272,43 @@ def perform_sanity_checks(**kwargs) -> bool:
         logger.error("Config file missing for corpus.")
         passed = False
 
+    manifest = CorpusManifest(kwargs["target_path"] / MANIFEST_FILE)
+    source_reader = CorpusReader(kwargs["source_path"])
+
     for split in [SPLIT.TRAIN, SPLIT.EVAL, SPLIT.TEST]:
         if not (kwargs["target_path"] / split.value).exists():
             logger.error(f"No split directory {split.value}.")
             passed = False
             continue
-        if len(list((kwargs["target_path"] / split.value).iterdir())) != len(list((kwargs["source_path"] / split.value).iterdir())):
+        records = manifest.records(split=split.value)
+        num_source_debates = sum(1 for _ in source_reader.records(split=split.value))
+        if len(records) != num_source_debates:
             logger.error(
                 f"Number of debates in {kwargs['target_path'] / split.value} split "
                 f"does not match source {kwargs['source_path'] / split.value}: "
-                f"{len(list((kwargs['target_path'] / split.value).iterdir()))} vs. "
-                f"{len(list((kwargs['source_path'] / split.value).iterdir()))}"
+                f"{len(records)} vs. {num_source_debates}"
             )
             passed = False
 
-    for json_file in Path(kwargs["target_path"]).rglob("*.json"):
-        if json_file.name == _TMP_DEBATE_FILE:
-            logger.error(f"Found temporary debate file {str(json_file)}.")
-            passed = False
-        else:
+        for record in records:
+            debate_path: Path = kwargs["target_path"] / record["path"]
+            if record["stage"] != "debate":
+                logger.error(f"Found untranslated debate {str(debate_path)}.")
+                passed = False
+                continue
+            json_file = debate_path / record["graph_file"]
             try:
-                node_link_data = ujson.decode(json_file.read_text())
+                content = json_file.read_bytes()
+                if record["graph_hash"] and hashlib.sha1(content).hexdigest() != record["graph_hash"]:
+                    raise ValueError("hash does not match corpus manifest")
+                node_link_data = ujson.decode(content)
                 nx.node_link_graph(node_link_data)
             except Exception as e:
                 logger.error(f"Invalid debate json for {str(json_file)}: {str(e)}")
                 passed = False
 
+    manifest.close()
+
     if passed:
         logger.info("✅ All checks passed.")
 